@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Async Conversion Load Test
+
+Runs many PDF -> Base64 -> PDF round trips concurrently on one event loop
+using pdf_base64_async.py, checks that every output matches its input and
+reports throughput and how late the event loop got.
+"""
+
+import argparse
+import asyncio
+import filecmp
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pdf_base64_async
+
+
+async def _round_trip(pdf_path, output_path, semaphore):
+    async with semaphore:
+        chunks = pdf_base64_async.aiter_pdf_base64_chunks(pdf_path)
+        await pdf_base64_async.async_convert_base64_to_pdf(chunks, output_path)
+    return pdf_path, output_path
+
+
+async def _watch_loop_lag(interval, stop):
+    # A healthy loop wakes this task up on time; blocking calls make it late
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run_load_test(pdf_files, conversions, concurrency, output_dir):
+    """
+    Run ``conversions`` round trips over ``pdf_files`` with up to ``concurrency`` in flight.
+
+    Returns:
+        tuple: ``(elapsed seconds, bytes converted, mismatches, worst loop lag in seconds)``
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(_watch_loop_lag(0.01, stop))
+
+    start = time.perf_counter()
+    tasks = [
+        _round_trip(pdf_files[i % len(pdf_files)], Path(output_dir) / f"{i}.pdf", semaphore)
+        for i in range(conversions)
+    ]
+    results = await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    worst_lag = await watcher
+
+    total_bytes = sum(pdf_path.stat().st_size for pdf_path, _ in results)
+    mismatches = [pdf_path for pdf_path, output_path in results
+                  if not filecmp.cmp(pdf_path, output_path, shallow=False)]
+    return elapsed, total_bytes, mismatches, worst_lag
+
+
+def main():
+    """Main function to run the load test and print a summary."""
+    parser = argparse.ArgumentParser(description='Load test the async PDF/Base64 conversion API.')
+    parser.add_argument('directory', nargs='?', default=str(Path(__file__).resolve().parent),
+                        help='Directory of sample PDFs (default: this folder, e.g. test.pdf)')
+    parser.add_argument('-n', '--conversions', type=int, default=1000,
+                        help='Number of round trips to run (default: 1000)')
+    parser.add_argument('-c', '--concurrency', type=int, default=200,
+                        help='Round trips in flight at once (default: 200)')
+
+    args = parser.parse_args()
+
+    pdf_files = sorted(path for path in Path(args.directory).glob('*') if path.suffix.lower() == '.pdf')
+    if not pdf_files:
+        print(f"Error: no PDF files found in {args.directory}", file=sys.stderr)
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        elapsed, total_bytes, mismatches, worst_lag = asyncio.run(
+            run_load_test(pdf_files, args.conversions, args.concurrency, output_dir))
+
+    print(f"{args.conversions} round trips of {len(pdf_files)} PDF(s), {args.concurrency} concurrent")
+    print(f"Elapsed: {elapsed:.2f}s ({args.conversions / elapsed:.1f} conversions/s, "
+          f"{total_bytes / elapsed / (1024 * 1024):.1f} MB/s)")
+    print(f"Worst event loop lag: {worst_lag * 1000:.1f} ms")
+    if mismatches:
+        print(f"Error: {len(mismatches)} output(s) differ from their input", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,16 @@
+import argparse
 import pygame, sys, random
 
+from dirty_rects import DirtyRects
+from frame_profiler import FrameProfiler
+from pygame_hud import Hud
+
+parser = argparse.ArgumentParser(description="Two snakes racing each other for food")
+DirtyRects.add_arguments(parser)
+FrameProfiler.add_arguments(parser)
+args = parser.parse_args()
+profiler = FrameProfiler.from_args(args)
+
 pygame.init()
 
 # Constants
@@ -23,6 +34,7 @@ DIRECTIONS = {
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Autonomous Snake Duel")
 clock = pygame.time.Clock()
+dirty = DirtyRects.from_args(screen, args, BLACK)
 
 # Snake structure
 def create_snake(start_pos, init_direction):
@@ -82,81 +94,93 @@ def choose_direction(snake, other_snake, food):
 game_over = False
 winner_text = ""
 
+# Scores in the corner, and the winner in the middle once the game is over
+hud = Hud(size=24)
+hud.add('score', (10, 10))
+hud.add('winner', (WIDTH//2, HEIGHT//2), anchor='center')
+
 # Game loop
-while True:
+while not profiler.finished:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            profiler.close()
             pygame.quit()
             sys.exit()
 
     if not game_over:
         # Autonomous decision for each snake
-        snake1["direction"] = choose_direction(snake1, snake2, food)
-        snake2["direction"] = choose_direction(snake2, snake1, food)
+        with profiler.phase('update'):
+            snake1["direction"] = choose_direction(snake1, snake2, food)
+            snake2["direction"] = choose_direction(snake2, snake1, food)
         
-        # Calculate new heads
-        new_head1 = (snake1["body"][0][0] + snake1["direction"][0]*CELL_SIZE,
-                     snake1["body"][0][1] + snake1["direction"][1]*CELL_SIZE)
-        new_head2 = (snake2["body"][0][0] + snake2["direction"][0]*CELL_SIZE,
-                     snake2["body"][0][1] + snake2["direction"][1]*CELL_SIZE)
-
-        # Check head-to-head collision
-        if new_head1 == new_head2:
-            game_over = True
-            winner_text = "Both snakes collided head-on!"
-        # Check collisions (walls or body collisions)
-        elif not valid_position(new_head1, snake1, snake2):
-            game_over = True
-            winner_text = "Snake2 wins (Snake1 crashed)!"
-        elif not valid_position(new_head2, snake2, snake1):
-            game_over = True
-            winner_text = "Snake1 wins (Snake2 crashed)!"
-        else:
-            # Move snakes
-            snake1["body"].insert(0, new_head1)
-            snake2["body"].insert(0, new_head2)
-
-            # Check if food eaten by snake1
-            if new_head1 == food:
-                snake1["score"] += 1
-                food = get_random_food()
-            else:
-                snake1["body"].pop()
-
-            # Check if food eaten by snake2
-            if new_head2 == food:
-                snake2["score"] += 1
-                food = get_random_food()
-            else:
-                snake2["body"].pop()
-
-            # Check winning score (10)
-            if snake1["score"] >= 10:
+        with profiler.phase('collision'):
+            # Calculate new heads
+            new_head1 = (snake1["body"][0][0] + snake1["direction"][0]*CELL_SIZE,
+                         snake1["body"][0][1] + snake1["direction"][1]*CELL_SIZE)
+            new_head2 = (snake2["body"][0][0] + snake2["direction"][0]*CELL_SIZE,
+                         snake2["body"][0][1] + snake2["direction"][1]*CELL_SIZE)
+
+            # Check head-to-head collision
+            if new_head1 == new_head2:
+                game_over = True
+                winner_text = "Both snakes collided head-on!"
+            # Check collisions (walls or body collisions)
+            elif not valid_position(new_head1, snake1, snake2):
                 game_over = True
-                winner_text = "Snake1 wins by score!"
-            elif snake2["score"] >= 10:
+                winner_text = "Snake2 wins (Snake1 crashed)!"
+            elif not valid_position(new_head2, snake2, snake1):
                 game_over = True
-                winner_text = "Snake2 wins by score!"
+                winner_text = "Snake1 wins (Snake2 crashed)!"
+
+        if not game_over:
+            with profiler.phase('update'):
+                # Move snakes
+                snake1["body"].insert(0, new_head1)
+                snake2["body"].insert(0, new_head2)
+
+                # Check if food eaten by snake1
+                if new_head1 == food:
+                    snake1["score"] += 1
+                    food = get_random_food()
+                else:
+                    snake1["body"].pop()
+
+                # Check if food eaten by snake2
+                if new_head2 == food:
+                    snake2["score"] += 1
+                    food = get_random_food()
+                else:
+                    snake2["body"].pop()
+
+                # Check winning score (10)
+                if snake1["score"] >= 10:
+                    game_over = True
+                    winner_text = "Snake1 wins by score!"
+                elif snake2["score"] >= 10:
+                    game_over = True
+                    winner_text = "Snake2 wins by score!"
 
     # Draw everything
-    screen.fill(BLACK)
-    # Draw food
-    pygame.draw.rect(screen, RED, (food[0], food[1], CELL_SIZE, CELL_SIZE))
-    # Draw snakes
-    for segment in snake1["body"]:
-        pygame.draw.rect(screen, GREEN, (segment[0], segment[1], CELL_SIZE, CELL_SIZE))
-    for segment in snake2["body"]:
-        pygame.draw.rect(screen, BLUE, (segment[0], segment[1], CELL_SIZE, CELL_SIZE))
-    
-    # Draw scores
-    font = pygame.font.SysFont(None, 24)
-    score_text = font.render(f"Snake1: {snake1['score']}  Snake2: {snake2['score']}", True, WHITE)
-    screen.blit(score_text, (10, 10))
-    
-    # Draw winner message if game over
-    if game_over:
-        win_text = font.render(winner_text, True, WHITE)
-        screen.blit(win_text, (WIDTH//2 - win_text.get_width()//2, HEIGHT//2 - win_text.get_height()//2))
+    with profiler.phase('draw'):
+        dirty.clear()
+        # Draw food
+        dirty.add(pygame.draw.rect(screen, RED, (food[0], food[1], CELL_SIZE, CELL_SIZE)))
+        # Draw snakes
+        for segment in snake1["body"]:
+            dirty.add(pygame.draw.rect(screen, GREEN, (segment[0], segment[1], CELL_SIZE, CELL_SIZE)))
+        for segment in snake2["body"]:
+            dirty.add(pygame.draw.rect(screen, BLUE, (segment[0], segment[1], CELL_SIZE, CELL_SIZE)))
+        
+        # Draw scores, and the winner message if game over
+        hud.set('score', f"Snake1: {snake1['score']}  Snake2: {snake2['score']}")
+        hud.set('winner', winner_text)
+        dirty.add(*hud.draw(screen))
+        dirty.add(*profiler.draw_hud(screen))
     
-    pygame.display.flip()
+    with profiler.phase('flip'):
+        dirty.update()
     clock.tick(FPS)
+    profiler.end_frame()
+
+profiler.close()
+pygame.quit()
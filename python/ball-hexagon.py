@@ -1,7 +1,12 @@
+import argparse
 import pygame
 import math
 import numpy as np
 
+from dirty_rects import DirtyRects
+from frame_profiler import FrameProfiler
+from hexagon_engine import bounce_in_polygon_frame
+
 # Initialize Pygame
 pygame.init()
 WIDTH, HEIGHT = 800, 600
@@ -15,7 +20,7 @@ class Hexagon:
         self.size = size
         self.angle = 0
         self.rotation_speed = 0.5
-        self.points = self._calculate_points()
+        self._points = None
 
     def _calculate_points(self):
         points = []
@@ -26,12 +31,19 @@ class Hexagon:
             points.append((x, y))
         return points
 
+    # The corners are only worked out again when something asks for them after a rotation
+    @property
+    def points(self):
+        if self._points is None:
+            self._points = self._calculate_points()
+        return self._points
+
     def rotate(self):
         self.angle += self.rotation_speed
-        self.points = self._calculate_points()
+        self._points = None
 
     def draw(self, screen):
-        pygame.draw.polygon(screen, (255, 255, 255), self.points, 2)
+        return pygame.draw.polygon(screen, (255, 255, 255), self.points, 2)
 
 class Ball:
     def __init__(self, x, y):
@@ -54,7 +66,7 @@ class Ball:
         self.pos += self.vel
 
     def draw(self, screen):
-        pygame.draw.circle(screen, (255, 0, 0), self.pos.astype(int), self.radius)
+        return pygame.draw.circle(screen, (255, 0, 0), self.pos.astype(int), self.radius)
 
 def line_intersection(p1, p2, circle_pos, radius):
     # Vector from p1 to p2
@@ -73,6 +85,17 @@ def line_intersection(p1, p2, circle_pos, radius):
     return distance <= radius
 
 def main():
+    parser = argparse.ArgumentParser(description="Ball in a spinning hexagon; hold SPACE to charge a jump")
+    parser.add_argument('--collision', choices=('segments', 'rotating'), default='segments',
+                        help="Test the ball against the six rebuilt sides, or against fixed sides in "
+                             "the hexagon's rotating frame, bouncing off the moving walls "
+                             "(default: segments)")
+    DirtyRects.add_arguments(parser)
+    FrameProfiler.add_arguments(parser)
+    args = parser.parse_args()
+    profiler = FrameProfiler.from_args(args)
+    dirty = DirtyRects.from_args(screen, args)
+
     hexagon = Hexagon((WIDTH//2, HEIGHT//2), 200)
     ball = Ball(WIDTH//2, HEIGHT//2)
     
@@ -80,7 +103,7 @@ def main():
     space_press_time = 0
     
     running = True
-    while running:
+    while running and not profiler.finished:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
@@ -94,42 +117,56 @@ def main():
                     ball.jump(charge_time)
                     space_pressed = False
 
-        screen.fill((0, 0, 0))
-        hexagon.rotate()
-        ball.update()
-
-        # Show charging indicator when space is pressed
-        if space_pressed:
-            charge_time = pygame.time.get_ticks() - space_press_time
-            charge_percent = min(charge_time / 1000.0, 1.0)
-            indicator_height = 50 * charge_percent
-            pygame.draw.rect(screen, (0, 255, 0), (10, HEIGHT - 60, 20, indicator_height))
+        with profiler.phase('update'):
+            hexagon.rotate()
+            ball.update()
 
         # Check collisions with all hexagon sides
-        for i in range(6):
-            p1 = np.array(hexagon.points[i])
-            p2 = np.array(hexagon.points[(i + 1) % 6])
-            
-            if line_intersection(p1, p2, ball.pos, ball.radius):
-                # Calculate normal vector of the wall
-                wall_vec = p2 - p1
-                wall_normal = np.array([-wall_vec[1], wall_vec[0]])
-                wall_normal = wall_normal / np.linalg.norm(wall_normal)
-                
-                # Reflect velocity vector
-                ball.vel = ball.vel - 2 * np.dot(ball.vel, wall_normal) * wall_normal
-                ball.vel *= ball.bounce_damping
-                
-                # Move ball away from wall to prevent sticking
-                overlap = ball.radius - np.abs(np.dot(ball.pos - p1, wall_normal))
-                if overlap > 0:
-                    ball.pos += wall_normal * overlap
-
-        hexagon.draw(screen)
-        ball.draw(screen)
-        pygame.display.flip()
+        with profiler.phase('collision'):
+            if args.collision == 'rotating':
+                ball.pos, ball.vel, _ = bounce_in_polygon_frame(
+                    ball.pos, ball.vel, ball.radius, hexagon.center, hexagon.size, hexagon.angle,
+                    hexagon.rotation_speed, elasticity=ball.bounce_damping, clearance=0.0)
+            else:
+                for i in range(6):
+                    p1 = np.array(hexagon.points[i])
+                    p2 = np.array(hexagon.points[(i + 1) % 6])
+                    
+                    if line_intersection(p1, p2, ball.pos, ball.radius):
+                        # Calculate normal vector of the wall
+                        wall_vec = p2 - p1
+                        wall_normal = np.array([-wall_vec[1], wall_vec[0]])
+                        wall_normal = wall_normal / np.linalg.norm(wall_normal)
+                        
+                        # Reflect velocity vector
+                        ball.vel = ball.vel - 2 * np.dot(ball.vel, wall_normal) * wall_normal
+                        ball.vel *= ball.bounce_damping
+                        
+                        # Move ball away from wall to prevent sticking
+                        overlap = ball.radius - np.abs(np.dot(ball.pos - p1, wall_normal))
+                        if overlap > 0:
+                            ball.pos += wall_normal * overlap
+
+        with profiler.phase('draw'):
+            dirty.clear()
+
+            # Show charging indicator when space is pressed
+            if space_pressed:
+                charge_time = pygame.time.get_ticks() - space_press_time
+                charge_percent = min(charge_time / 1000.0, 1.0)
+                indicator_height = 50 * charge_percent
+                dirty.add(pygame.draw.rect(screen, (0, 255, 0), (10, HEIGHT - 60, 20, indicator_height)))
+
+            dirty.add(hexagon.draw(screen))
+            dirty.add(ball.draw(screen))
+            dirty.add(*profiler.draw_hud(screen))
+
+        with profiler.phase('flip'):
+            dirty.update()
         clock.tick(60)
+        profiler.end_frame()
 
+    profiler.close()
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,424 @@
+"""
+Batched physics engine for physics-ball.py.
+
+All balls live in contiguous arrays (positions and velocities are (N, 3),
+radii and masses are (N,)), and every step is a handful of vectorized NumPy
+operations instead of a Python loop per ball and per pair.
+
+The physics are the same as the original per-ball code: the container
+rotation nudges each ball, positions are integrated with explicit Euler,
+balls that poke out of their container are pushed back in and reflected
+with damping, and overlapping balls are separated and exchange momentum
+along the contact normal with a coefficient of restitution. Ball-ball
+contacts are resolved all at once from the same positions rather than one
+ball after the other; where a ball touches several others at the same time,
+each of its pairs is scaled down by the contact count of the busier ball of
+the pair. That keeps dense clusters stable and every exchange equal and
+opposite, so elastic collisions (restitution 1) conserve momentum, but it
+ends up differently than the sequential loop did.
+
+Fast balls or a large dt would let balls jump through each other within a
+single step. Each step is therefore split into enough substeps that no ball
+moves more than half the smallest radius per substep (up to max_substeps),
+and with continuous collision detection (ccd) on, wall and ball-ball hits
+are found with swept-sphere time-of-impact tests: a ball bounces off the
+wall at the point where it touched it, and balls that met during a substep
+are moved back to where they first touched before they exchange momentum.
+With ccd off and max_substeps=1, motion and wall bounces match the per-ball
+code exactly. The tunnelled counter reports pairs that overlapped during a
+substep but started and ended it apart, i.e. collisions that were missed.
+
+Candidate pairs come from a broad phase that hashes every ball into a
+uniform grid per container, with cells as wide as the largest ball, so only
+balls in the same or neighbouring cells of the same container are ever
+compared. The cells are widened by the distance balls travel in a substep so
+that swept contacts are found too. Balls in different containers can never
+touch and are never paired.
+"""
+
+import numpy as np
+
+
+WALL_DAMPING = 0.8  # Energy kept when bouncing off a container wall
+WALL_PUSH = 1.01  # Push balls a bit further inside to avoid floating-point issues
+RESTITUTION = 0.9  # Bounciness of ball-ball collisions
+ROTATION_EFFECT = 0.01  # How strongly a container's spin drags its balls
+
+# Substeps are chosen so no ball moves more than this fraction of the smallest radius per substep
+SUBSTEP_TRAVEL = 0.5
+DEFAULT_MAX_SUBSTEPS = 16
+
+# The brute-force broad phase tests pairs in blocks of this many balls to
+# bound temporary memory
+PAIR_BLOCK_SIZE = 1024
+
+# Grid cell offsets that pair a cell with each of its 26 neighbours once
+_FORWARD_NEIGHBORS = [
+    (dx, dy, dz)
+    for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+    if (dx, dy, dz) > (0, 0, 0)
+]
+
+
+class BallEngine:
+    """Balls bouncing inside spinning container spheres, stored as arrays."""
+
+    def __init__(self, container_centers, container_radii, container_rotation_speeds, broad_phase='grid',
+                 ccd=True, max_substeps=DEFAULT_MAX_SUBSTEPS):
+        """
+        broad_phase is 'grid' (spatial hash per container) or 'all', which
+        tests every pair of balls and is only meant for comparisons. ccd
+        turns the swept time-of-impact tests on, and max_substeps=1 turns
+        substepping off.
+        """
+        if broad_phase not in ('grid', 'all'):
+            raise ValueError(f"Unknown broad phase {broad_phase!r}")
+        if max_substeps < 1:
+            raise ValueError("max_substeps must be at least 1")
+        self.broad_phase = broad_phase
+        self.ccd = ccd
+        self.max_substeps = max_substeps
+        self.restitution = RESTITUTION  # 1 keeps ball-ball collisions elastic, conserving momentum
+
+        self.container_centers = np.array(container_centers, dtype=float).reshape(-1, 3)
+        self.container_radii = np.array(container_radii, dtype=float).reshape(-1)
+        self.container_rotation_speeds = np.array(container_rotation_speeds, dtype=float).reshape(-1, 3)
+        self.container_rotations = np.zeros_like(self.container_rotation_speeds)  # Degrees
+
+        # Velocity change per second that each container's spin applies to its balls
+        speeds = self.container_rotation_speeds
+        self._container_drift = np.stack([
+            speeds[:, 1] * ROTATION_EFFECT,
+            speeds[:, 0] * -ROTATION_EFFECT,
+            speeds[:, 2] * ROTATION_EFFECT,
+        ], axis=1)
+
+        self.positions = np.empty((0, 3))
+        self.velocities = np.empty((0, 3))
+        self.radii = np.empty(0)
+        self.masses = np.empty(0)
+        self.containers = np.empty(0, dtype=np.intp)  # Container index of each ball
+        self.colors = np.empty((0, 3))
+        self._drift = np.empty((0, 3))
+
+        # Counters for the last step, summed over its substeps
+        self.candidate_pairs = 0
+        self.contacts = 0
+        self.swept_contacts = 0  # Contacts found by the time-of-impact test
+        self.tunnelled = 0  # Pairs that met during a substep without a contact
+        self.substeps = 0
+
+    @property
+    def count(self):
+        return len(self.radii)
+
+    def add_balls(self, positions, velocities, radii, containers, colors=None):
+        """Add balls; any that start outside their container are moved inside."""
+        positions = np.array(positions, dtype=float).reshape(-1, 3)
+        velocities = np.array(velocities, dtype=float).reshape(-1, 3)
+        radii = np.array(radii, dtype=float).reshape(-1)
+        containers = np.array(containers, dtype=np.intp).reshape(-1)
+        if colors is None:
+            colors = np.ones((len(radii), 3))
+        colors = np.array(colors, dtype=float).reshape(-1, 3)
+
+        # Ensure balls start inside their container
+        centers = self.container_centers[containers]
+        offsets = positions - centers
+        distances = np.linalg.norm(offsets, axis=1)
+        outside = distances + radii > self.container_radii[containers]
+        if outside.any():
+            directions = offsets[outside] / distances[outside, None]
+            limits = self.container_radii[containers[outside]] - radii[outside] - 0.01
+            positions[outside] = centers[outside] + directions * limits[:, None]
+
+        self.set_balls(
+            np.concatenate([self.positions, positions]),
+            np.concatenate([self.velocities, velocities]),
+            np.concatenate([self.radii, radii]),
+            np.concatenate([self.containers, containers]),
+            np.concatenate([self.colors, colors])
+        )
+
+    def set_balls(self, positions, velocities, radii, containers, colors):
+        """
+        Use the given arrays as the ball state without copying them.
+
+        step() only ever updates positions and velocities in place, so they
+        can be views into memory shared with other processes.
+        """
+        self.positions = positions
+        self.velocities = velocities
+        self.radii = radii
+        self.masses = radii ** 3  # Mass proportional to volume
+        self.containers = containers
+        self.colors = colors
+        self._drift = self._container_drift[containers]
+
+    def step(self, dt):
+        """Advance the simulation by dt seconds, in as many substeps as the fastest ball needs."""
+        self.substeps = self.substeps_for(dt)
+        self.candidate_pairs = self.contacts = self.swept_contacts = self.tunnelled = 0
+        for substep in range(self.substeps):
+            self._substep(dt / self.substeps)
+
+    def substeps_for(self, dt):
+        """Return the number of substeps that keeps every ball within SUBSTEP_TRAVEL radii per substep."""
+        if self.max_substeps == 1 or not self.count:
+            return 1
+        speed = np.sqrt(np.einsum('ij,ij->i', self.velocities, self.velocities).max())
+        substeps = np.ceil(speed * dt / (SUBSTEP_TRAVEL * self.radii.min()))
+        return int(min(max(substeps, 1), self.max_substeps))
+
+    def _substep(self, dt):
+        self.container_rotations += self.container_rotation_speeds * dt
+        self.container_rotations %= 360
+
+        # Apply container rotation effect, then update positions
+        self.velocities += self._drift * dt
+        starts = self.positions.copy()
+        self.positions += self.velocities * dt
+
+        self._collide_with_containers(starts, dt)
+
+        # Pairs that may have met anywhere along their paths, not just where they ended up
+        moves = self.positions - starts
+        margin = 2 * np.sqrt(np.einsum('ij,ij->i', moves, moves).max()) if self.count else 0.0
+        first, second = self._candidate_pairs(margin)
+        self.candidate_pairs += len(first)
+
+        if self.ccd:
+            swept = self._resolve_swept_contacts(first, second, starts)
+            self.swept_contacts += int(np.count_nonzero(swept))
+            first, second = first[~swept], second[~swept]
+        self.contacts += self._resolve_contacts(first, second)
+        self.tunnelled += self._count_tunnelled(first, second, starts)
+
+    def _collide_with_containers(self, starts, dt):
+        offsets = self.positions - self.container_centers[self.containers]
+        distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+        penetrations = distances + self.radii - self.container_radii[self.containers]
+        hit = np.flatnonzero(penetrations > 0)
+        if not len(hit):
+            return
+        if self.ccd:
+            self._bounce_swept(hit, starts, dt)
+            return
+
+        # Move the balls back inside and reflect their velocity with damping
+        normals = offsets[hit] / distances[hit, None]
+        self.positions[hit] -= normals * (penetrations[hit] * WALL_PUSH)[:, None]
+        velocities = self.velocities[hit]
+        along = np.einsum('ij,ij->i', velocities, normals)
+        self.velocities[hit] = (velocities - 2 * along[:, None] * normals) * WALL_DAMPING
+
+    def _bounce_swept(self, hit, starts, dt):
+        """Bounce the hit balls off the wall at the point where they touched it."""
+        centers = self.container_centers[self.containers[hit]]
+        limits = self.container_radii[self.containers[hit]] - self.radii[hit]
+        starts = starts[hit] - centers
+        velocities = self.velocities[hit]
+
+        # Time of impact: |start + velocity * t| = limit, for a ball that starts inside
+        a = np.einsum('ij,ij->i', velocities, velocities)
+        b = np.einsum('ij,ij->i', starts, velocities)
+        c = np.minimum(np.einsum('ij,ij->i', starts, starts) - limits * limits, 0)
+        times = np.divide(-b + np.sqrt(b * b - a * c), a, out=np.zeros_like(a), where=a > 0)
+        times = np.clip(times, 0, dt)
+
+        contacts = starts + velocities * times[:, None]
+        lengths = np.sqrt(np.einsum('ij,ij->i', contacts, contacts))
+        normals = np.divide(contacts, lengths[:, None], out=np.zeros_like(contacts), where=lengths[:, None] > 0)
+
+        # Reflect with damping, but only balls that are moving out through the wall
+        along = np.einsum('ij,ij->i', velocities, normals)
+        outward = along > 0
+        velocities[outward] = (velocities[outward] - 2 * along[outward, None] * normals[outward]) * WALL_DAMPING
+        positions = contacts + velocities * (dt - times)[:, None]
+
+        # A second wall hit in the rest of the substep just stops the ball on the wall
+        distances = np.sqrt(np.einsum('ij,ij->i', positions, positions))
+        outside = distances > limits
+        positions[outside] *= (limits[outside] / distances[outside])[:, None]
+
+        self.positions[hit] = centers + positions
+        self.velocities[hit] = velocities
+
+    def collide_balls(self):
+        """Separate the balls that overlap now and exchange momentum without moving on; return the contact count."""
+        first, second = self._candidate_pairs()
+        return self._resolve_contacts(first, second)
+
+    def _candidate_pairs(self, margin=0.0):
+        if self.broad_phase == 'grid':
+            return self._grid_pairs(margin)
+        return self._all_pairs(margin)
+
+    def _grid_pairs(self, margin=0.0):
+        """Return index arrays (i, j) of the pairs in the same or neighbouring grid cells."""
+        count = self.count
+        if count < 2:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+        # Any two balls within margin of touching are at most one cell apart on every axis
+        cell_size = 2 * self.radii.max() + margin
+        grid = int(np.ceil(2 * self.container_radii.max() / cell_size)) + 3
+        corners = self.container_centers[self.containers] - self.container_radii[self.containers, None]
+        cells = np.floor((self.positions - corners) / cell_size).astype(np.int64) + 1
+        # Keep a free cell on both sides so neighbour keys never wrap around
+        np.clip(cells, 1, grid - 2, out=cells)
+        keys = ((self.containers.astype(np.int64) * grid + cells[:, 0]) * grid + cells[:, 1]) * grid + cells[:, 2]
+
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        # Pairs within a cell: each ball with the balls after it in sorted order
+        firsts = [order]
+        lows = [np.arange(1, count + 1)]
+        highs = [np.searchsorted(sorted_keys, sorted_keys, 'right')]
+
+        # Pairs between a cell and its forward neighbours
+        balls = np.arange(count)
+        for dx, dy, dz in _FORWARD_NEIGHBORS:
+            neighbor_keys = keys + ((dx * grid + dy) * grid + dz)
+            firsts.append(balls)
+            lows.append(np.searchsorted(sorted_keys, neighbor_keys, 'left'))
+            highs.append(np.searchsorted(sorted_keys, neighbor_keys, 'right'))
+
+        owners = np.concatenate(firsts)
+        lows = np.concatenate(lows)
+        counts = np.concatenate(highs) - lows
+        total = counts.sum()
+        if not total:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+        # Expand every (owner, [low, high)) range into one entry per pair
+        group_starts = np.cumsum(counts) - counts
+        slots = np.arange(total) + np.repeat(lows - group_starts, counts)
+        return np.repeat(owners, counts), order[slots]
+
+    def _all_pairs(self, margin=0.0):
+        """Return index arrays (i, j) with i < j of every pair within margin of touching."""
+        count = self.count
+        firsts = []
+        seconds = []
+        for start in range(0, count, PAIR_BLOCK_SIZE):
+            stop = min(start + PAIR_BLOCK_SIZE, count)
+            deltas = self.positions[start:stop, None, :] - self.positions[None, start:, :]
+            squared = np.einsum('ijk,ijk->ij', deltas, deltas)
+            reach = self.radii[start:stop, None] + self.radii[None, start:] + margin
+            touching = squared < reach * reach
+            # Keep each pair once, with the first index below the second
+            touching &= np.arange(start, stop)[:, None] < np.arange(start, count)[None, :]
+            first, second = np.nonzero(touching)
+            firsts.append(first + start)
+            seconds.append(second + start)
+        if not firsts:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        return np.concatenate(firsts), np.concatenate(seconds)
+
+    def _resolve_contacts(self, first, second):
+        """Separate overlapping pairs and exchange momentum along their normals; return the contact count."""
+        offsets = self.positions[first] - self.positions[second]
+        distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+        overlaps = self.radii[first] + self.radii[second] - distances
+        touching = overlaps > 0
+        if not touching.all():
+            first, second = first[touching], second[touching]
+            offsets, distances, overlaps = offsets[touching], distances[touching], overlaps[touching]
+        if not len(first):
+            return 0
+
+        normals = np.empty_like(offsets)
+        apart = distances > 0
+        normals[apart] = offsets[apart] / distances[apart, None]
+        normals[~apart] = (1.0, 0.0, 0.0)
+
+        self._scatter(self.positions, first, second, normals * (overlaps * 0.5)[:, None],
+                      -normals * (overlaps * 0.5)[:, None])
+        self._exchange_momentum(first, second, normals)
+        return len(first)
+
+    def _resolve_swept_contacts(self, first, second, starts):
+        """
+        Find the pairs that started the substep apart and touched during it,
+        move their balls back to where they first touched, and exchange
+        momentum there. Return a mask of the pairs that were handled.
+        """
+        start_offsets = starts[first] - starts[second]
+        moves = (self.positions[first] - starts[first]) - (self.positions[second] - starts[second])
+        reach = self.radii[first] + self.radii[second]
+
+        # Time of impact as a fraction of the substep: |start_offset + move * s| = reach
+        a = np.einsum('ij,ij->i', moves, moves)
+        b = np.einsum('ij,ij->i', start_offsets, moves)
+        c = np.einsum('ij,ij->i', start_offsets, start_offsets) - reach * reach
+        discriminants = b * b - a * c
+        hit = (c > 0) & (b < 0) & (discriminants >= 0)
+        fractions = np.ones_like(a)
+        fractions[hit] = (-b[hit] - np.sqrt(discriminants[hit])) / a[hit]
+        hit &= fractions <= 1
+        if not hit.any():
+            return hit
+
+        # Move every ball back to its earliest impact
+        earliest = np.ones(self.count)
+        np.minimum.at(earliest, first[hit], fractions[hit])
+        np.minimum.at(earliest, second[hit], fractions[hit])
+        balls = np.flatnonzero(earliest < 1)
+        self.positions[balls] = starts[balls] + (self.positions[balls] - starts[balls]) * earliest[balls, None]
+
+        # Bounce the pairs that are still approaching each other there
+        pairs = np.flatnonzero(hit)
+        offsets = self.positions[first[pairs]] - self.positions[second[pairs]]
+        distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+        normals = np.divide(offsets, distances[:, None], out=np.zeros_like(offsets), where=distances[:, None] > 0)
+        closing = np.einsum('ij,ij->i', self.velocities[first[pairs]] - self.velocities[second[pairs]], normals) < 0
+        pairs = pairs[closing]
+        self._exchange_momentum(first[pairs], second[pairs], normals[closing])
+        return hit
+
+    def _exchange_momentum(self, first, second, normals):
+        v1 = np.einsum('ij,ij->i', self.velocities[first], normals)
+        v2 = np.einsum('ij,ij->i', self.velocities[second], normals)
+        m1 = self.masses[first]
+        m2 = self.masses[second]
+        total = m1 + m2
+
+        # Elastic collision along the normal, scaled by the restitution
+        new_v1 = ((m1 - m2) * v1 + 2 * m2 * v2) / total * self.restitution
+        new_v2 = ((m2 - m1) * v2 + 2 * m1 * v1) / total * self.restitution
+
+        self._scatter(self.velocities, first, second, normals * (new_v1 - v1)[:, None],
+                      normals * (new_v2 - v2)[:, None])
+
+    def _count_tunnelled(self, first, second, starts):
+        """Count the pairs that overlapped during the substep but start and end it apart."""
+        start_offsets = starts[first] - starts[second]
+        end_offsets = self.positions[first] - self.positions[second]
+        moves = end_offsets - start_offsets
+        reach = self.radii[first] + self.radii[second]
+        squared_reach = reach * reach
+
+        # Closest approach along the straight path between the start and end offsets
+        a = np.einsum('ij,ij->i', moves, moves)
+        b = np.einsum('ij,ij->i', start_offsets, moves)
+        closest = np.clip(np.divide(-b, a, out=np.zeros_like(a), where=a > 0), 0, 1)
+        nearest = start_offsets + moves * closest[:, None]
+
+        missed = ((np.einsum('ij,ij->i', start_offsets, start_offsets) > squared_reach)
+                  & (np.einsum('ij,ij->i', end_offsets, end_offsets) > squared_reach)
+                  & (np.einsum('ij,ij->i', nearest, nearest) < squared_reach))
+        return int(np.count_nonzero(missed))
+
+    def _scatter(self, target, first, second, first_delta, second_delta):
+        # A ball can be part of several contacts at once, and the sum of their
+        # changes overshoots in dense clusters. Every pair is scaled down by the
+        # contact count of its busier ball, on both sides alike, so the balls
+        # of a pair still get equal and opposite changes
+        count = self.count
+        shares = np.bincount(first, minlength=count) + np.bincount(second, minlength=count)
+        scale = 1.0 / np.maximum(shares[first], shares[second])
+        for axis in range(3):
+            target[:, axis] += (np.bincount(first, first_delta[:, axis] * scale, count)
+                                + np.bincount(second, second_delta[:, axis] * scale, count))
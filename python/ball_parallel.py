@@ -0,0 +1,235 @@
+"""
+Parallel stepping for ball_engine.BallEngine.
+
+Balls never leave their container, so containers can be stepped
+independently of each other. ParallelBallEngine sorts the balls by
+container, splits the containers into contiguous groups with about the same
+number of balls, and steps every group in its own worker process. All ball
+and container state lives in one shared memory block that the workers update
+in place, so only a tiny command and the collision counters cross the
+process boundary on each step.
+
+step() returns only once every worker has finished, so between steps the
+arrays hold one consistent snapshot that a renderer or recorder can read.
+"""
+
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ball_engine import BallEngine
+
+
+# Per-step counters of BallEngine that are summed over the workers
+_COUNTERS = ('candidate_pairs', 'contacts', 'swept_contacts', 'tunnelled')
+
+
+def _layout(ball_count, container_count):
+    """Return (name, shape, dtype, offset) for every shared array, and the total size."""
+    arrays = [
+        ('positions', (ball_count, 3), np.float64),
+        ('velocities', (ball_count, 3), np.float64),
+        ('radii', (ball_count,), np.float64),
+        ('colors', (ball_count, 3), np.float64),
+        ('containers', (ball_count,), np.intp),
+        ('container_centers', (container_count, 3), np.float64),
+        ('container_radii', (container_count,), np.float64),
+        ('container_rotation_speeds', (container_count, 3), np.float64),
+        ('container_rotations', (container_count, 3), np.float64),
+    ]
+    layout = []
+    offset = 0
+    for name, shape, dtype in arrays:
+        layout.append((name, shape, dtype, offset))
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, max(offset, 1)
+
+
+def _views(buffer, layout):
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        for name, shape, dtype, offset in layout
+    }
+
+
+def _split_containers(ball_starts, workers):
+    """Split the containers into up to `workers` contiguous groups of similar cost."""
+    container_count = len(ball_starts) - 1
+    # Count every container as one extra ball, since empty ones still have to rotate
+    costs = np.diff(ball_starts) + 1
+    cumulative = np.concatenate([[0], np.cumsum(costs)])
+    targets = cumulative[-1] * np.arange(1, workers) / workers
+    cuts = np.searchsorted(cumulative, targets)
+    bounds = np.unique(np.concatenate([[0], cuts, [container_count]]))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _run_worker(connection, memory_name, layout, first_container, last_container,
+                first_ball, last_ball, options):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    arrays = _views(memory.buf, layout)
+    try:
+        # A BallEngine that works directly on this worker's slice of the shared arrays
+        engine = BallEngine(
+            arrays['container_centers'][first_container:last_container],
+            arrays['container_radii'][first_container:last_container],
+            arrays['container_rotation_speeds'][first_container:last_container],
+            **options
+        )
+        engine.container_rotations = arrays['container_rotations'][first_container:last_container]
+        engine.set_balls(
+            arrays['positions'][first_ball:last_ball],
+            arrays['velocities'][first_ball:last_ball],
+            arrays['radii'][first_ball:last_ball],
+            arrays['containers'][first_ball:last_ball] - first_container,
+            arrays['colors'][first_ball:last_ball]
+        )
+        connection.send('ready')
+
+        # None asks the worker to stop
+        while (command := connection.recv()) is not None:
+            dt, steps = command
+            totals = [0] * len(_COUNTERS)
+            for step in range(steps):
+                engine.step(dt)
+                for index, name in enumerate(_COUNTERS):
+                    totals[index] += getattr(engine, name)
+            last = [getattr(engine, name) for name in _COUNTERS]
+            connection.send((totals, last, engine.substeps))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        # The views must be gone before the shared memory can be closed
+        engine = arrays = None
+        memory.close()
+        connection.close()
+
+
+class ParallelBallEngine:
+    """
+    A BallEngine whose containers are stepped by a pool of worker processes.
+
+    It exposes the same arrays and counters as BallEngine, with the balls
+    reordered by container, but the set of balls is fixed once it is built.
+    Call close() (or use it as a context manager) to stop the workers and
+    free the shared memory.
+    """
+
+    def __init__(self, engine, workers=None):
+        """Take over the containers and balls of engine; workers defaults to the CPU count."""
+        self.broad_phase = engine.broad_phase
+        self.ccd = engine.ccd
+        self.max_substeps = engine.max_substeps
+        options = {'broad_phase': engine.broad_phase, 'ccd': engine.ccd, 'max_substeps': engine.max_substeps}
+        ball_count = engine.count
+        container_count = len(engine.container_radii)
+
+        layout, size = _layout(ball_count, container_count)
+        self._memory = shared_memory.SharedMemory(create=True, size=size)
+        self._arrays = _views(self._memory.buf, layout)
+        self._workers = []
+        try:
+            order = np.argsort(engine.containers, kind='stable')
+            self._arrays['positions'][:] = engine.positions[order]
+            self._arrays['velocities'][:] = engine.velocities[order]
+            self._arrays['radii'][:] = engine.radii[order]
+            self._arrays['colors'][:] = engine.colors[order]
+            self._arrays['containers'][:] = engine.containers[order]
+            self._arrays['container_centers'][:] = engine.container_centers
+            self._arrays['container_radii'][:] = engine.container_radii
+            self._arrays['container_rotation_speeds'][:] = engine.container_rotation_speeds
+            self._arrays['container_rotations'][:] = engine.container_rotations
+            self.__dict__.update(self._arrays)
+            self.masses = self.radii ** 3
+
+            ball_starts = np.searchsorted(self.containers, np.arange(container_count + 1))
+            groups = _split_containers(ball_starts, min(workers or os.cpu_count() or 1, container_count))
+            for first_container, last_container in groups:
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(
+                    target=_run_worker,
+                    args=(child, self._memory.name, layout, first_container, last_container,
+                          ball_starts[first_container], ball_starts[last_container], options),
+                    daemon=True
+                )
+                process.start()
+                child.close()
+                self._workers.append((process, parent))
+            for process, connection in self._workers:
+                self._receive(connection)
+        except BaseException:
+            self.close()
+            raise
+
+        # Counters for the last step, summed over all workers
+        for name in _COUNTERS:
+            setattr(self, name, 0)
+        self.substeps = 0  # The most substeps any worker needed
+
+    @property
+    def count(self):
+        return len(self.radii)
+
+    @property
+    def workers(self):
+        return len(self._workers)
+
+    def step(self, dt, steps=1):
+        """
+        Advance the simulation by `steps` steps of dt seconds and wait for all workers.
+
+        Running several steps per call saves a round trip to the workers for
+        every step; the return value maps every counter to its total over
+        all of them.
+        """
+        for process, connection in self._workers:
+            connection.send((dt, steps))
+        totals = dict.fromkeys(_COUNTERS, 0)
+        last = dict.fromkeys(_COUNTERS, 0)
+        self.substeps = 0
+        for process, connection in self._workers:
+            worker_totals, worker_last, substeps = self._receive(connection)
+            for name, total, value in zip(_COUNTERS, worker_totals, worker_last):
+                totals[name] += total
+                last[name] += value
+            self.substeps = max(self.substeps, substeps)
+        self.__dict__.update(last)
+        return totals
+
+    def _receive(self, connection):
+        try:
+            return connection.recv()
+        except EOFError:
+            raise RuntimeError("A ball engine worker exited unexpectedly") from None
+
+    def close(self):
+        """Stop the workers and free the shared memory, keeping a private copy of the state."""
+        for process, connection in self._workers:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process, connection in self._workers:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+            connection.close()
+        self._workers = []
+
+        if self._memory is None:
+            return
+        for name, array in self._arrays.items():
+            if name in self.__dict__:
+                setattr(self, name, array.copy())
+        self._arrays = None
+        self._memory.close()
+        self._memory.unlink()
+        self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
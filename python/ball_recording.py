@@ -0,0 +1,261 @@
+"""
+Snapshots and recordings of a ball_engine.BallEngine.
+
+A recording is one binary file: a fixed header, the parts of the scene that
+never change (container geometry and colors, ball radii, colors and
+containers, and the engine options), and a ring of fixed-size frames. Every
+frame holds the complete changing state after one step (container
+rotations, ball positions and velocities, all in float64) plus the dt, the
+wall time and the collision counters of that step. The file is memory
+mapped, so appending a frame is a copy into the map, and any frame can be
+read or restored in O(1) without re-simulating. Once the ring is full, the
+oldest frames are overwritten.
+
+A snapshot is simply a recording with room for one frame. Restoring a frame
+and stepping it with the recorded dt of the next frame reproduces the next
+frame exactly, as long as the recording was made with a serial BallEngine.
+A ball_parallel.ParallelBallEngine picks the number of substeps in every
+worker separately, while a restored engine picks one for all containers,
+so a recording made with workers restores every frame exactly but stepping
+on from it can take different substeps. The worker count isn't recorded.
+
+All numbers are little-endian, so files can be moved between machines.
+"""
+
+import numpy as np
+
+from ball_engine import BallEngine
+
+
+MAGIC = b'BALLREC1'
+VERSION = 1
+
+# Per-step counters kept with every frame
+COUNTERS = ('candidate_pairs', 'contacts', 'swept_contacts', 'tunnelled', 'substeps')
+
+_BROAD_PHASES = ('grid', 'all')
+
+_HEADER = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('broad_phase', '<u4'),
+    ('ccd', '<u4'),
+    ('max_substeps', '<u4'),
+    ('ball_count', '<u8'),
+    ('container_count', '<u8'),
+    ('capacity', '<u8'),
+    ('frames', '<u8'),  # Frames appended so far, including overwritten ones
+])
+
+
+def _static_dtype(ball_count, container_count):
+    return np.dtype([
+        ('container_centers', '<f8', (container_count, 3)),
+        ('container_radii', '<f8', (container_count,)),
+        ('container_rotation_speeds', '<f8', (container_count, 3)),
+        ('container_colors', '<f8', (container_count, 3)),
+        ('radii', '<f8', (ball_count,)),
+        ('containers', '<i8', (ball_count,)),
+        ('colors', '<f8', (ball_count, 3)),
+    ])
+
+
+def _frame_dtype(ball_count, container_count):
+    return np.dtype([
+        ('step', '<i8'),
+        ('dt', '<f8'),
+        ('step_seconds', '<f8'),  # Wall time the step took
+        ('counters', '<i8', (len(COUNTERS),)),
+        ('container_rotations', '<f8', (container_count, 3)),
+        ('positions', '<f8', (ball_count, 3)),
+        ('velocities', '<f8', (ball_count, 3)),
+    ])
+
+
+class Recorder:
+    """Appends the state of an engine to a memory-mapped ring of frames."""
+
+    def __init__(self, path, engine, capacity, container_colors=None):
+        """
+        Create (or overwrite) a recording at path with room for capacity frames.
+
+        container_colors (one RGB triple per container) is only kept for
+        replays; it defaults to light grey. engine can be a BallEngine or a
+        ParallelBallEngine, but only serial recordings step on from a
+        restored frame bit for bit (see the module docstring).
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        ball_count = engine.count
+        container_count = len(engine.container_radii)
+
+        header = np.zeros((), dtype=_HEADER)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['broad_phase'] = _BROAD_PHASES.index(engine.broad_phase)
+        header['ccd'] = engine.ccd
+        header['max_substeps'] = engine.max_substeps
+        header['ball_count'] = ball_count
+        header['container_count'] = container_count
+        header['capacity'] = capacity
+
+        static = np.zeros((), dtype=_static_dtype(ball_count, container_count))
+        static['container_centers'] = engine.container_centers
+        static['container_radii'] = engine.container_radii
+        static['container_rotation_speeds'] = engine.container_rotation_speeds
+        static['container_colors'] = 0.8 if container_colors is None else container_colors
+        static['radii'] = engine.radii
+        static['containers'] = engine.containers
+        static['colors'] = engine.colors
+
+        frame_dtype = _frame_dtype(ball_count, container_count)
+        frames_offset = _HEADER.itemsize + static.dtype.itemsize
+        with open(path, 'wb') as file:
+            file.write(header.tobytes())
+            file.write(static.tobytes())
+            # Reserve the frames without writing them; the file stays sparse until they are used
+            file.truncate(frames_offset + capacity * frame_dtype.itemsize)
+
+        self.path = path
+        self.capacity = capacity
+        self._header = np.memmap(path, dtype=_HEADER, mode='r+', shape=())
+        self._frames = np.memmap(path, dtype=frame_dtype, mode='r+', offset=frames_offset, shape=(capacity,))
+
+    @property
+    def frames(self):
+        return int(self._header['frames'])
+
+    def append(self, engine, step, dt, step_seconds=0.0):
+        """Write the current state of engine as the frame after `step` steps of dt seconds."""
+        frame = self._frames[self.frames % self.capacity]
+        frame['step'] = step
+        frame['dt'] = dt
+        frame['step_seconds'] = step_seconds
+        frame['counters'] = [getattr(engine, name, 0) for name in COUNTERS]
+        frame['container_rotations'] = engine.container_rotations
+        frame['positions'] = engine.positions
+        frame['velocities'] = engine.velocities
+        self._header['frames'] += 1
+
+    def flush(self):
+        self._frames.flush()
+        self._header.flush()
+
+    def close(self):
+        if self._frames is None:
+            return
+        self.flush()
+        self._frames = self._header = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Recording:
+    """A recording opened for reading; frames are numbered from the first one ever appended."""
+
+    def __init__(self, path):
+        """
+        Raises:
+            ValueError: If the file is not a recording this version can read
+        """
+        header = np.fromfile(path, dtype=_HEADER, count=1)
+        if not len(header) or header[0]['magic'] != MAGIC:
+            raise ValueError(f"{path} is not a ball recording")
+        header = header[0]
+        if header['version'] != VERSION:
+            raise ValueError(f"{path} has unsupported recording version {header['version']}")
+
+        ball_count = int(header['ball_count'])
+        container_count = int(header['container_count'])
+        static_dtype = _static_dtype(ball_count, container_count)
+        self.path = path
+        self.broad_phase = _BROAD_PHASES[header['broad_phase']]
+        self.ccd = bool(header['ccd'])
+        self.max_substeps = int(header['max_substeps'])
+        self.capacity = int(header['capacity'])
+        self.total_frames = int(header['frames'])
+        self.static = np.fromfile(path, dtype=static_dtype, count=1, offset=_HEADER.itemsize)[0]
+        self.frames = np.memmap(path, dtype=_frame_dtype(ball_count, container_count), mode='r',
+                                offset=_HEADER.itemsize + static_dtype.itemsize, shape=(self.capacity,))
+
+    def __len__(self):
+        """Return the number of frames still in the ring."""
+        return min(self.total_frames, self.capacity)
+
+    @property
+    def first_frame(self):
+        return self.total_frames - len(self)
+
+    def frame(self, index):
+        """
+        Return frame number index as a record of memory-mapped fields.
+
+        Raises:
+            IndexError: If the frame was never written or has been overwritten
+        """
+        if not self.first_frame <= index < self.total_frames:
+            raise IndexError(f"Frame {index} is not in the recording "
+                             f"(frames {self.first_frame} to {self.total_frames - 1})")
+        return self.frames[index % self.capacity]
+
+    def frame_numbers(self):
+        """Return the numbers of the frames in the ring, oldest first."""
+        return np.arange(self.first_frame, self.total_frames)
+
+    def slots(self):
+        """Return the ring slots of the frames, oldest first, for reading a field of all of them."""
+        return self.frame_numbers() % self.capacity
+
+    def restore(self, index, engine=None):
+        """
+        Return an engine in the state of frame number index.
+
+        With engine, its state is overwritten in place, which is how a
+        viewer moves between frames without building a new engine; it must
+        have been restored from the same recording before.
+        """
+        frame = self.frame(index)
+        if engine is None:
+            engine = BallEngine(self.static['container_centers'], self.static['container_radii'],
+                                self.static['container_rotation_speeds'], self.broad_phase,
+                                self.ccd, self.max_substeps)
+            engine.set_balls(np.array(frame['positions']), np.array(frame['velocities']),
+                             self.static['radii'].copy(), self.static['containers'].astype(np.intp),
+                             self.static['colors'].copy())
+        else:
+            engine.positions[:] = frame['positions']
+            engine.velocities[:] = frame['velocities']
+        engine.container_rotations[:] = frame['container_rotations']
+        for name, value in zip(COUNTERS, frame['counters']):
+            setattr(engine, name, int(value))
+        return engine
+
+
+def save_snapshot(path, engine, step=0, dt=0.0, container_colors=None):
+    """Save the complete state of engine as a single-frame recording."""
+    with Recorder(path, engine, 1, container_colors) as recorder:
+        recorder.append(engine, step, dt)
+
+
+def load_snapshot(path):
+    """
+    Restore an engine from a snapshot, or from the last frame of a recording.
+
+    Returns:
+        tuple: (BallEngine, step, container colors) with the number of steps
+            the state was saved after and the (M, 3) colors kept for replays
+
+    Raises:
+        OSError: If the file can't be read
+        ValueError: If the file isn't a recording or has no frames
+    """
+    recording = Recording(path)
+    if not len(recording):
+        raise ValueError(f"{path} has no frames")
+    index = recording.total_frames - 1
+    return (recording.restore(index), int(recording.frame(index)['step']),
+            np.array(recording.static['container_colors']))
@@ -0,0 +1,169 @@
+"""
+Batched ball renderer for physics-ball.py.
+
+Instead of a translate, material change and sphere per ball, the positions,
+radii and colors of every ball are packed into one NumPy vertex buffer each
+frame and drawn with a single glDrawArrays call as point sprites. A small
+GLSL 1.20 shader sizes each point to the ball's projected radius, shades it
+as a sphere with the same light and material as the fixed-function path, and
+writes the depth of the sphere surface so balls still intersect correctly
+with each other and the container wireframes.
+
+Only OpenGL 2.1 features are used, so it runs on Mesa's llvmpipe software
+rasterizer in an offscreen context as well as on real hardware.
+"""
+
+import ctypes
+
+import numpy as np
+from OpenGL.GL import *
+
+
+VERTEX_SHADER = """
+#version 120
+
+attribute vec3 position;
+attribute float radius;
+attribute vec3 color;
+
+uniform float pixel_scale;  // Pixels per unit at distance 1 from the eye
+
+varying vec3 ball_color;
+varying vec3 eye_center;
+varying float eye_radius;
+
+void main()
+{
+    vec4 eye = gl_ModelViewMatrix * vec4(position, 1.0);
+    gl_Position = gl_ProjectionMatrix * eye;
+    gl_PointSize = 2.0 * radius * pixel_scale / max(-eye.z, 0.001);
+    ball_color = color;
+    eye_center = eye.xyz;
+    eye_radius = radius;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+
+uniform vec3 light_position;  // Eye space
+uniform vec3 light_ambient;
+uniform vec3 scene_ambient;
+uniform float shininess;
+
+varying vec3 ball_color;
+varying vec3 eye_center;
+varying float eye_radius;
+
+void main()
+{
+    // Turn the square point into a sphere facing the viewer
+    vec2 offset = gl_PointCoord * 2.0 - 1.0;
+    offset.y = -offset.y;
+    float squared = dot(offset, offset);
+    if (squared > 1.0)
+        discard;
+    vec3 normal = vec3(offset, sqrt(1.0 - squared));
+    vec3 surface = eye_center + normal * eye_radius;
+
+    vec3 to_light = normalize(light_position - surface);
+    vec3 to_eye = normalize(-surface);
+    float diffuse = max(dot(normal, to_light), 0.0);
+    float specular = diffuse > 0.0 ? pow(max(dot(normal, normalize(to_light + to_eye)), 0.0), shininess) : 0.0;
+
+    // Same terms as the fixed-function material: ambient, diffuse, emission and specular
+    vec3 lit = ball_color * (scene_ambient + light_ambient + diffuse + 0.3) + specular;
+    gl_FragColor = vec4(min(lit, 1.0), 1.0);
+
+    vec4 clip = gl_ProjectionMatrix * vec4(surface, 1.0);
+    gl_FragDepth = clip.z / clip.w * 0.5 + 0.5;
+}
+"""
+
+# Floats per ball in the vertex buffer: position (3), radius (1), color (3)
+_VERTEX_FLOATS = 7
+_ATTRIBUTES = (('position', 3, 0), ('radius', 1, 3), ('color', 3, 4))
+
+
+def _compile_program():
+    program = glCreateProgram()
+    shaders = []
+    for kind, source in ((GL_VERTEX_SHADER, VERTEX_SHADER), (GL_FRAGMENT_SHADER, FRAGMENT_SHADER)):
+        shader = glCreateShader(kind)
+        glShaderSource(shader, source)
+        glCompileShader(shader)
+        if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+            raise RuntimeError(f"Shader compilation failed: {glGetShaderInfoLog(shader).decode()}")
+        glAttachShader(program, shader)
+        shaders.append(shader)
+
+    for location, (name, size, offset) in enumerate(_ATTRIBUTES):
+        glBindAttribLocation(program, location, name)
+    glLinkProgram(program)
+    for shader in shaders:
+        glDeleteShader(shader)
+    if not glGetProgramiv(program, GL_LINK_STATUS):
+        raise RuntimeError(f"Shader linking failed: {glGetProgramInfoLog(program).decode()}")
+    return program
+
+
+class SpriteBallRenderer:
+    """Draws all balls of a BallEngine as shaded point sprites in one draw call."""
+
+    def __init__(self):
+        self.program = _compile_program()
+        self.buffer = glGenBuffers(1)
+        self.vertices = np.empty((0, _VERTEX_FLOATS), dtype=np.float32)
+        self.draw_calls = 0  # Draw calls since the counter was last reset
+        self._uniforms = {
+            name: glGetUniformLocation(self.program, name)
+            for name in ('pixel_scale', 'light_position', 'light_ambient', 'scene_ambient', 'shininess')
+        }
+
+    def draw(self, engine):
+        count = engine.count
+        if not count:
+            return
+
+        # Pack the balls into the vertex buffer, reusing the array between frames
+        if len(self.vertices) != count:
+            self.vertices = np.empty((count, _VERTEX_FLOATS), dtype=np.float32)
+        self.vertices[:, 0:3] = engine.positions
+        self.vertices[:, 3] = engine.radii
+        self.vertices[:, 4:7] = engine.colors
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        # Respecify the whole buffer so the driver doesn't wait for the previous frame
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STREAM_DRAW)
+        stride = _VERTEX_FLOATS * 4
+        for location, (name, size, offset) in enumerate(_ATTRIBUTES):
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(offset * 4))
+
+        glUseProgram(self.program)
+        self._set_uniforms()
+        glEnable(GL_VERTEX_PROGRAM_POINT_SIZE)
+        glEnable(GL_POINT_SPRITE)
+        glDrawArrays(GL_POINTS, 0, count)
+        self.draw_calls += 1
+        glDisable(GL_POINT_SPRITE)
+        glDisable(GL_VERTEX_PROGRAM_POINT_SIZE)
+        glUseProgram(0)
+
+        for location in range(len(_ATTRIBUTES)):
+            glDisableVertexAttribArray(location)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _set_uniforms(self):
+        # Match the fixed-function light and the current projection
+        projection = glGetFloatv(GL_PROJECTION_MATRIX)
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        glUniform1f(self._uniforms['pixel_scale'], projection[1][1] * viewport[3] / 2)
+        glUniform3fv(self._uniforms['light_position'], 1, glGetLightfv(GL_LIGHT0, GL_POSITION)[:3])
+        glUniform3fv(self._uniforms['light_ambient'], 1, glGetLightfv(GL_LIGHT0, GL_AMBIENT)[:3])
+        glUniform3fv(self._uniforms['scene_ambient'], 1, glGetFloatv(GL_LIGHT_MODEL_AMBIENT)[:3])
+        glUniform1f(self._uniforms['shininess'], float(glGetMaterialfv(GL_FRONT, GL_SHININESS)))
+
+    def release(self):
+        glDeleteBuffers(1, [self.buffer])
+        glDeleteProgram(self.program)
@@ -0,0 +1,155 @@
+"""
+Scene generator for ball_engine.BallEngine.
+
+generate_scene() builds an engine with any number of containers and balls,
+so engine changes can be measured on scenes of every size instead of only
+the two small containers of the physics-ball.py demo. Every parameter that
+changes how much work a step takes can be set:
+
+- container_count: containers of random size and spin, laid out on a square
+  grid far enough apart not to overlap (None gives the two demo containers)
+- balls_per_container: a fixed number, or a (low, high) range to draw from
+- ball_radius and radius_distribution: 'uniform' draws radii evenly from the
+  range, 'lognormal' clusters them around its geometric mean, and 'bimodal'
+  makes about half of the balls the smallest size and half the largest,
+  which is the worst case for a grid whose cells fit the largest ball
+- velocity_spread: every velocity component is drawn from
+  [-velocity_spread, velocity_spread], and fast balls need more substeps
+
+Everything is drawn with NumPy in one go, so scenes with millions of balls
+are built in well under a second. The same seed and parameters always give
+the same scene.
+"""
+
+import math
+
+import numpy as np
+
+from ball_engine import BallEngine
+
+
+# Ball colors to pick from
+BALL_COLORS = np.array([
+    [1.0, 0.0, 0.0],  # Red
+    [0.0, 1.0, 0.0],  # Green
+    [0.0, 0.0, 1.0],  # Blue
+    [1.0, 1.0, 0.0],  # Yellow
+    [1.0, 0.0, 1.0],  # Magenta
+    [0.0, 1.0, 1.0],  # Cyan
+    [1.0, 0.5, 0.0],  # Orange
+    [0.5, 0.0, 1.0]   # Purple
+])
+
+# The containers of the physics-ball.py demo: center, radius, rotation speed and color
+DEMO_CONTAINERS = [
+    ([0, 0, 0], 5.0, [0.1, 0.2, 0.05], [0.5, 0.5, 1.0]),  # Brighter blue
+    ([8, 0, 0], 3.0, [0.15, -0.1, 0.1], [0.5, 1.0, 0.5])  # Brighter green, moved to the side
+]
+
+RADIUS_DISTRIBUTIONS = ('uniform', 'lognormal', 'bimodal')
+
+# Generated containers
+CONTAINER_RADIUS = (3.0, 5.0)
+CONTAINER_SPACING = 11.0  # More than twice the largest container radius
+MAX_ROTATION_SPEED = 0.2
+
+# Balls start within this fraction of the container radius less WALL_MARGIN
+START_FRACTION = 0.7
+WALL_MARGIN = 0.5
+
+
+def ball_radii(rng, count, ball_radius=(0.2, 0.4), distribution='uniform'):
+    """
+    Draw count radii between ball_radius[0] and ball_radius[1].
+
+    Raises:
+        ValueError: If the distribution is unknown
+    """
+    low, high = ball_radius
+    if distribution == 'uniform':
+        return rng.uniform(low, high, count)
+    if distribution == 'lognormal':
+        # Median at the geometric mean, with the range about two standard deviations either side
+        sigma = math.log(high / low) / 4
+        return np.clip(rng.lognormal(math.log(math.sqrt(low * high)), sigma, count), low, high)
+    if distribution == 'bimodal':
+        return np.where(rng.random(count) < 0.5, low, high)
+    raise ValueError(f"Unknown radius distribution {distribution!r}")
+
+
+def generate_scene(container_count=None, balls_per_container=(5, 8), ball_radius=(0.2, 0.4),
+                   radius_distribution='uniform', velocity_spread=1.0, seed=None, **engine_options):
+    """
+    Build a BallEngine filled with random balls.
+
+    Args:
+        container_count (int, optional): Number of generated containers, or None for the demo ones
+        balls_per_container (int or tuple): Balls in every container, or an inclusive (low, high) range
+        ball_radius (tuple): Smallest and largest ball radius
+        radius_distribution (str): One of RADIUS_DISTRIBUTIONS
+        velocity_spread (float): Largest initial speed along each axis
+        seed (int, optional): Seed for the random numbers
+        **engine_options: Passed on to BallEngine (broad_phase, ccd, max_substeps)
+
+    Returns:
+        tuple: (BallEngine, container colors as an (M, 3) array)
+
+    Raises:
+        ValueError: If a parameter is out of range
+    """
+    if container_count is not None and container_count < 1:
+        raise ValueError("container_count must be at least 1")
+    if not 0 < ball_radius[0] <= ball_radius[1]:
+        raise ValueError("ball_radius must be a positive (smallest, largest) pair")
+    if np.min(balls_per_container) < 0:
+        raise ValueError("balls_per_container must not be negative")
+    if velocity_spread < 0:
+        raise ValueError("velocity_spread must not be negative")
+    if radius_distribution not in RADIUS_DISTRIBUTIONS:
+        raise ValueError(f"Unknown radius distribution {radius_distribution!r}")
+    rng = np.random.default_rng(seed)
+
+    if container_count is None:
+        centers, radii, rotation_speeds, colors = (
+            np.array(values, dtype=float) for values in zip(*DEMO_CONTAINERS)
+        )
+        container_count = len(radii)
+    else:
+        columns = math.ceil(math.sqrt(container_count))
+        rows, cells = np.divmod(np.arange(container_count), columns)
+        centers = np.column_stack([cells, rows, np.zeros(container_count)]) * CONTAINER_SPACING
+        radii = rng.uniform(*CONTAINER_RADIUS, container_count)
+        rotation_speeds = rng.uniform(-MAX_ROTATION_SPEED, MAX_ROTATION_SPEED, (container_count, 3))
+        colors = 0.5 + 0.5 * BALL_COLORS[rng.integers(len(BALL_COLORS), size=container_count)]
+
+    if np.ndim(balls_per_container) == 0:
+        counts = np.full(container_count, balls_per_container)
+    else:
+        counts = rng.integers(balls_per_container[0], balls_per_container[1] + 1, container_count)
+    containers = np.repeat(np.arange(container_count), counts)
+    count = len(containers)
+
+    # Uniform directions and volume-uniform distances, not too close to the wall
+    directions = rng.normal(size=(count, 3))
+    directions /= np.maximum(np.linalg.norm(directions, axis=1, keepdims=True), 1e-12)
+    distances = (radii[containers] - WALL_MARGIN) * START_FRACTION * np.cbrt(rng.random(count))
+    positions = centers[containers] + directions * distances[:, None]
+    velocities = rng.uniform(-velocity_spread, velocity_spread, (count, 3))
+
+    engine = BallEngine(centers, radii, rotation_speeds, **engine_options)
+    engine.add_balls(positions, velocities, ball_radii(rng, count, ball_radius, radius_distribution),
+                     containers, BALL_COLORS[rng.integers(len(BALL_COLORS), size=count)])
+    return engine, colors
+
+
+def packing_fraction(engine):
+    """Return the largest share of a container's volume taken up by its balls."""
+    if not engine.count:
+        return 0.0
+    ball_volume = np.bincount(engine.containers, engine.radii ** 3, len(engine.container_radii))
+    return float(np.max(ball_volume / engine.container_radii ** 3))
+
+
+def engine_bytes(engine):
+    """Return the memory held by the engine's NumPy arrays."""
+    return sum(value.nbytes for value in vars(engine).values() if isinstance(value, np.ndarray))
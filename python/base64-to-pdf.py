@@ -6,16 +6,47 @@ A simple utility to convert Base64 encoded strings back to PDF files.
 """
 
 import base64
+import binascii
 import argparse
+import hashlib
+import io
+import json
 import os
+import re
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
 
+# Read size for streaming mode, in encoded characters
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+_BASE64_ALPHABET = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+# Every byte that b64decode silently discards (anything but the alphabet and '=')
+_NON_BASE64 = bytes(c for c in range(256) if c not in _BASE64_ALPHABET + b'=')
+_WHITESPACE = b' \t\r\n\v\f'
+
+# PDF readers accept the header and the end-of-file marker this far from the ends
+PDF_MARKER_WINDOW = 1024
+
+# Longest "data:<media type>;base64," header accepted before the payload
+_MAX_DATA_URI_HEADER = 256
+# A JSON string escape, or the quote that ends the string
+_JSON_TOKEN = re.compile(rb'\\(?:u[0-9A-Fa-f]{4}|[^u])|"')
+_JSON_ESCAPES = {
+    b'/': b'/', b'\\': b'\\', b'"': b'"',
+    b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+}
+
+
 def convert_base64_to_pdf(base64_string, output_path):
     """
     Convert a Base64 encoded string back to a PDF file.
     
+    Line-wrapped (MIME), data URI and JSON string forms are accepted as well
+    as plain Base64.
+    
     Args:
         base64_string (str): Base64 encoded string of PDF data
         output_path (str): Path where to save the PDF file
@@ -25,7 +56,11 @@ def convert_base64_to_pdf(base64_string, output_path):
     """
     try:
         # Decode the base64 string to binary data
-        pdf_data = base64.b64decode(base64_string)
+        if _Base64Envelope.is_wrapped(base64_string):
+            decoder = Base64StreamDecoder()
+            pdf_data = decoder.decode(base64_string) + decoder.finish()
+        else:
+            pdf_data = base64.b64decode(base64_string)
         
         # Write binary data to file
         output_path = Path(output_path)
@@ -37,6 +72,342 @@ def convert_base64_to_pdf(base64_string, output_path):
         raise ValueError("Invalid base64 string provided")
 
 
+class _Base64Envelope:
+    """
+    Removes a data URI header or JSON string quoting from streamed Base64 text.
+    
+    The form is detected from the start of the input: a leading ``"`` means a
+    JSON string, whose escapes are undone and which ends at the closing
+    quote, and ``data:`` means a data URI, whose header is dropped up to
+    the first comma. Anything else is passed through unchanged.
+    """
+    
+    def __init__(self, strict=False):
+        self._strict = strict
+        self._form = None  # None until detected, then 'plain', 'json' or 'closed'
+        self._buffer = b''  # Undetected start, or an incomplete JSON escape
+    
+    @staticmethod
+    def is_wrapped(text):
+        """Return True if text starts like a data URI or a JSON string."""
+        start = text[:_MAX_DATA_URI_HEADER].lstrip()
+        if isinstance(start, str):
+            start = start.encode('ascii', 'replace')
+        return start[:1] == b'"' or start[:5].lower() == b'data:'
+    
+    def strip(self, chunk):
+        """Return the Base64 text contained in the next chunk of input."""
+        if self._form is None:
+            chunk = self._detect(chunk)
+        if self._form == 'json':
+            return self._unescape(chunk)
+        if self._form == 'closed':
+            if self._strict and chunk.strip(_WHITESPACE):
+                raise ValueError("Invalid base64: data after the JSON string")
+            return b''
+        return chunk
+    
+    def finish(self):
+        """Return any text still held back and check the envelope was complete."""
+        if self._form is None:
+            self._form = 'plain'
+            return self._buffer
+        if self._form == 'json':
+            raise ValueError("Invalid base64: unterminated JSON string")
+        return b''
+    
+    def _detect(self, chunk):
+        self._buffer += chunk
+        start = self._buffer.lstrip(_WHITESPACE)
+        if not start:
+            return b''
+        
+        if start[:1] == b'"':
+            self._form = 'json'
+            self._buffer = b''
+            return start[1:]
+        
+        if b'data:'.startswith(start[:5].lower()):
+            if len(start) < 5:
+                return b''  # Wait for enough text to decide
+            comma = start.find(b',')
+            if comma < 0:
+                if len(start) > _MAX_DATA_URI_HEADER:
+                    raise ValueError("Invalid data URI: no ',' after the header")
+                return b''
+            if not start[:comma].lower().endswith(b';base64'):
+                raise ValueError("Invalid data URI: not base64 encoded")
+            self._form = 'plain'
+            self._buffer = b''
+            return start[comma + 1:]
+        
+        self._form = 'plain'
+        chunk, self._buffer = self._buffer, b''
+        return chunk
+    
+    def _unescape(self, chunk):
+        text = self._buffer + chunk if self._buffer else chunk
+        self._buffer = b''
+        parts = []
+        position = 0
+        for match in _JSON_TOKEN.finditer(text):
+            parts.append(text[position:match.start()])
+            position = match.end()
+            token = match.group()
+            if token == b'"':
+                self._form = 'closed'
+                self.strip(text[position:])
+                return b''.join(parts)
+            if token[1:2] == b'u':
+                code = int(token[2:], 16)
+                if code > 0x7F:
+                    raise ValueError("Invalid base64 string provided")
+                parts.append(bytes([code]))
+            elif token[1:] in _JSON_ESCAPES:
+                parts.append(_JSON_ESCAPES[token[1:]])
+            else:
+                raise ValueError(f"Invalid JSON escape {token.decode('ascii')!r}")
+        
+        rest = text[position:]
+        backslash = rest.rfind(b'\\', max(len(rest) - 6, 0))
+        if backslash >= 0:
+            # Possibly the start of an escape that continues in the next chunk
+            if len(rest) - backslash >= 6:
+                raise ValueError("Invalid JSON escape")
+            self._buffer = rest[backslash:]
+            rest = rest[:backslash]
+        parts.append(rest)
+        return b''.join(parts)
+
+
+class Base64StreamDecoder:
+    """
+    Incremental Base64 decoder that matches ``base64.b64decode`` exactly.
+    
+    Input can be split at any point, including in the middle of a line
+    break or a padding sequence. Characters outside the Base64 alphabet
+    are discarded and decoding stops after the first complete padding
+    sequence, just like the non-validating ``b64decode``. Base64 wrapped
+    in a data URI or a JSON string is unwrapped first.
+    
+    With ``strict=True`` only whitespace is skipped: any other character
+    outside the alphabet, data after the padding or wrong padding is an
+    error.
+    """
+    
+    def __init__(self, strict=False):
+        self._strict = strict
+        self._envelope = _Base64Envelope(strict)
+        self._pending = b''  # Data characters not yet forming a full quantum
+        self._pads = 0  # Consecutive padding characters seen so far
+        self._done = False
+    
+    def decode(self, chunk):
+        """
+        Decode the next piece of input.
+        
+        Args:
+            chunk (bytes or str): Next piece of the Base64 text
+            
+        Returns:
+            bytes: Decoded data that is complete so far
+        
+        Raises:
+            ValueError: If the chunk contains non-ASCII characters
+        """
+        if not chunk.isascii():
+            raise ValueError("Invalid base64 string provided")
+        if isinstance(chunk, str):
+            chunk = chunk.encode('ascii')
+        return self._decode(self._envelope.strip(chunk))
+    
+    def _decode(self, chunk):
+        if self._done:
+            return b''
+        
+        if self._strict:
+            data = self._pending + self._strip_strict(chunk)
+            aligned = len(data) - len(data) % 4
+            self._pending = data[aligned:]
+            return self._a2b(data[:aligned])
+        
+        cleaned = chunk.translate(None, _NON_BASE64)
+        if b'=' not in cleaned:
+            if cleaned:
+                self._pads = 0
+            data = self._pending + cleaned
+        else:
+            data = self._consume_padding(cleaned)
+            if self._done:
+                # Complete the final quantum and ignore everything after it
+                data += b'=' * (-len(data) % 4)
+                self._pending = b''
+                return self._a2b(data)
+        
+        aligned = len(data) - len(data) % 4
+        self._pending = data[aligned:]
+        return self._a2b(data[:aligned])
+    
+    def finish(self):
+        """
+        Check that the input ended on a complete quantum.
+        
+        Raises:
+            ValueError: If the Base64 input was truncated or badly padded
+        """
+        data = self._decode(self._envelope.finish())
+        
+        if self._strict:
+            if len(self._pending) + self._pads not in (0, 4) or len(self._pending) == 1:
+                raise ValueError("Incorrect base64 padding")
+            return data + self._a2b(self._pending + b'=' * self._pads)
+        
+        if self._pending and not self._done:
+            raise ValueError("Invalid base64 string provided")
+        return data
+    
+    def _strip_strict(self, chunk):
+        cleaned = chunk.translate(None, _WHITESPACE)
+        invalid = cleaned.translate(None, _BASE64_ALPHABET + b'=')
+        if invalid:
+            raise ValueError(f"Invalid base64 character {chr(invalid[0])!r}")
+        
+        pad_at = cleaned.find(b'=')
+        if self._pads and pad_at != 0 and cleaned:
+            raise ValueError("Invalid base64: data after padding")
+        if pad_at < 0:
+            return cleaned
+        
+        padding = cleaned[pad_at:]
+        if padding.count(b'=') != len(padding):
+            raise ValueError("Invalid base64: data after padding")
+        self._pads += len(padding)
+        if self._pads > 2:
+            raise ValueError("Incorrect base64 padding")
+        return cleaned[:pad_at]
+    
+    def _consume_padding(self, cleaned):
+        # Mirror binascii: '=' only counts as padding once at least two data
+        # characters of the current quantum have been seen
+        parts = cleaned.split(b'=')
+        data = [self._pending]
+        length = len(self._pending)
+        for index, part in enumerate(parts):
+            if index and length % 4 >= 2:
+                self._pads += 1
+                if length % 4 + self._pads >= 4:
+                    self._done = True
+                    break
+            if part:
+                self._pads = 0
+                data.append(part)
+                length += len(part)
+        return b''.join(data)
+    
+    @staticmethod
+    def _a2b(data):
+        try:
+            return binascii.a2b_base64(data)
+        except binascii.Error:
+            raise ValueError("Invalid base64 string provided")
+
+
+def stream_base64_to_pdf(input_stream, output_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Decode Base64 text from a stream and write the PDF bytes as they are produced.
+    
+    Only one chunk of input and its decoded bytes are held in memory at a
+    time. The output is byte-identical to ``convert_base64_to_pdf``.
+    
+    Args:
+        input_stream: Binary or text file-like object with the Base64 text
+        output_path (str): Path where to save the PDF file
+        chunk_size (int): Characters to read per chunk
+        
+    Returns:
+        Path: The path of the written PDF file
+    
+    Raises:
+        ValueError: If the base64 input is invalid
+    """
+    output_path = Path(output_path)
+    decoder = Base64StreamDecoder()
+    
+    try:
+        with open(output_path, 'wb') as file:
+            while True:
+                chunk = input_stream.read(chunk_size)
+                if not chunk:
+                    break
+                file.write(decoder.decode(chunk))
+            file.write(decoder.finish())
+    except ValueError:
+        # Don't leave a truncated PDF behind
+        output_path.unlink(missing_ok=True)
+        raise
+    
+    return output_path
+
+
+def verify_base64_pdf(input_stream, compute_sha256=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Check that Base64 text decodes to a plausible PDF without writing it anywhere.
+    
+    The input is read in chunks and the decoded bytes are dropped as soon as
+    they have been checked, so memory use is flat. The Base64 alphabet and
+    padding are validated strictly, the decoded data must start with a
+    ``%PDF-`` header and end with a ``%%EOF`` marker. A missing header is
+    reported as soon as the first kilobyte has been decoded.
+    
+    Args:
+        input_stream: Binary or text file-like object with the Base64 text
+        compute_sha256 (bool): Also compute the SHA-256 of the decoded bytes
+        chunk_size (int): Characters to read per chunk
+        
+    Returns:
+        dict: ``valid`` (bool), ``error`` (str or None), ``size`` (decoded
+        bytes checked) and ``sha256`` (hex digest, or None)
+    """
+    decoder = Base64StreamDecoder(strict=True)
+    digest = hashlib.sha256() if compute_sha256 else None
+    head = b''
+    tail = b''
+    size = 0
+    
+    def result(error=None):
+        return {
+            'valid': error is None,
+            'error': error,
+            'size': size,
+            'sha256': digest.hexdigest() if digest is not None and error is None else None,
+        }
+    
+    try:
+        while True:
+            chunk = input_stream.read(chunk_size)
+            data = decoder.decode(chunk) if chunk else decoder.finish()
+            
+            size += len(data)
+            if digest is not None:
+                digest.update(data)
+            if len(head) < PDF_MARKER_WINDOW:
+                head += data[:PDF_MARKER_WINDOW - len(head)]
+                if len(head) == PDF_MARKER_WINDOW and b'%PDF-' not in head:
+                    return result("Missing %PDF- header")
+            tail = (tail + data[-PDF_MARKER_WINDOW:])[-PDF_MARKER_WINDOW:]
+            
+            if not chunk:
+                break
+    except ValueError as e:
+        return result(str(e))
+    
+    if b'%PDF-' not in head:
+        return result("Missing %PDF- header")
+    if b'%%EOF' not in tail:
+        return result("Missing %%EOF trailer")
+    return result()
+
+
 def create_sample_base64(output_file=None):
     """
     Create a sample base64 encoded PDF for demonstration purposes.
@@ -76,6 +447,179 @@ def create_sample_base64(output_file=None):
     return base64_string
 
 
+def iter_manifest(manifest_path):
+    """
+    Read Base64 documents from a newline-delimited JSON manifest one at a time.
+    
+    Each non-blank line is an object with an ``output`` path and the
+    Base64 encoded ``data`` of the PDF.
+    
+    Args:
+        manifest_path (str): Path to the JSONL manifest
+        
+    Yields:
+        tuple: ``(line_number, record)``, where record is the parsed object
+        or the error message if the line could not be used
+    """
+    with open(manifest_path, 'r') as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict) or 'output' not in record or 'data' not in record:
+                    raise ValueError("record needs 'output' and 'data' fields")
+                if not isinstance(record['output'], str) or not record['output']:
+                    raise ValueError("'output' must be a non-empty path string")
+                if not isinstance(record['data'], str):
+                    raise ValueError("'data' must be a Base64 string")
+            except ValueError as e:
+                yield line_number, str(e)
+                continue
+            yield line_number, record
+
+
+def _manifest_output_path(output, output_dir=None):
+    """
+    Resolve a manifest ``output`` path against the base directory.
+    
+    Raises:
+        ValueError: If the path doesn't name a file inside the base directory
+    """
+    base_dir = Path(output_dir or '.').resolve()
+    output_path = (base_dir / output).resolve()
+    try:
+        relative = output_path.relative_to(base_dir)
+    except ValueError:
+        relative = None
+    if relative is None or relative == Path('.'):
+        raise ValueError(f"output path {output!r} is not a file inside the output directory {str(base_dir)!r}")
+    return output_path
+
+
+def _restore_record(base64_string, output_path):
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    convert_base64_to_pdf(base64_string, output_path)
+    return output_path.stat().st_size
+
+
+def restore_manifest(manifest_path, output_dir=None, jobs=None, max_in_flight=None):
+    """
+    Restore every document in a JSONL manifest to its PDF file using a thread pool.
+    
+    Records are read lazily and at most ``max_in_flight`` of them are held
+    at any time, so memory stays flat however long the manifest is. A bad
+    record, including one whose output path leads outside ``output_dir``,
+    is reported and skipped; the rest of the manifest carries on. A record
+    whose output path was already used by an earlier record fails too, since
+    both would be written at the same time; only the output paths seen so
+    far are remembered.
+    
+    Args:
+        manifest_path (str): Path to the JSONL manifest
+        output_dir (str, optional): Base directory every output path must
+            stay inside (default: the current directory)
+        jobs (int, optional): Number of writer threads (default: CPU count)
+        max_in_flight (int, optional): Records queued or being decoded at once
+            (default: twice the number of threads)
+        
+    Returns:
+        tuple: ``(restored, failures, bytes_written)`` where failures is a list
+        of ``(line_number, error message)`` tuples
+    """
+    jobs = jobs or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * jobs
+    restored = 0
+    failures = []
+    bytes_written = 0
+    
+    def collect(done):
+        nonlocal restored, bytes_written
+        for future in done:
+            line_number = in_flight.pop(future)
+            try:
+                bytes_written += future.result()
+                restored += 1
+            except Exception as e:
+                failures.append((line_number, str(e)))
+                print(f"Error: {manifest_path}:{line_number}: {str(e)}", file=sys.stderr)
+    
+    in_flight = {}
+    seen_outputs = {}  # Resolved output path -> line number of the record writing it
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for line_number, record in iter_manifest(manifest_path):
+            if isinstance(record, str):
+                failures.append((line_number, record))
+                print(f"Error: {manifest_path}:{line_number}: {record}", file=sys.stderr)
+                continue
+            
+            # Wait for a slot before reading further into the manifest
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            
+            try:
+                output_path = _manifest_output_path(record['output'], output_dir)
+                if output_path in seen_outputs:
+                    raise ValueError(f"output path {record['output']!r} is already written by line "
+                                     f"{seen_outputs[output_path]}")
+                seen_outputs[output_path] = line_number
+            except ValueError as e:
+                failures.append((line_number, str(e)))
+                print(f"Error: {manifest_path}:{line_number}: {str(e)}", file=sys.stderr)
+                continue
+            in_flight[executor.submit(_restore_record, record['data'], output_path)] = line_number
+        
+        collect(list(in_flight))
+    
+    return restored, failures, bytes_written
+
+
+def run_manifest(args):
+    """Restore a JSONL manifest and print a throughput summary."""
+    start = time.perf_counter()
+    restored, failures, bytes_written = restore_manifest(args.manifest, args.output, args.jobs,
+                                                         args.max_in_flight)
+    elapsed = time.perf_counter() - start
+    
+    print(f"Restored {restored} documents in {elapsed:.2f}s "
+          f"({restored / elapsed:.1f} documents/s, {bytes_written / elapsed / (1024 * 1024):.1f} MB/s)")
+    if failures:
+        print(f"Failed to restore {len(failures)} document(s)", file=sys.stderr)
+        sys.exit(1)
+
+
+def run_verify(args):
+    """Verify a single Base64 payload and exit non-zero if it is rejected."""
+    try:
+        if args.file:
+            with open(args.file, 'rb') as file:
+                result = verify_base64_pdf(file, args.sha256)
+        else:
+            base64_string = create_sample_base64() if args.sample else args.string
+            result = verify_base64_pdf(io.StringIO(base64_string), args.sha256)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    
+    if not result['valid']:
+        print(f"Invalid: {result['error']}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Valid PDF payload ({result['size']} bytes)")
+    if result['sha256']:
+        print(f"SHA-256: {result['sha256']}")
+
+
+def _positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+
 def main():
     """Main function to handle command-line arguments and convert base64 to PDF."""
     parser = argparse.ArgumentParser(description='Convert Base64 encoded string back to a PDF file.')
@@ -84,18 +628,43 @@ def main():
     input_group.add_argument('-s', '--string', help='Base64 encoded string')
     input_group.add_argument('-f', '--file', help='File containing the Base64 encoded string')
     input_group.add_argument('--sample', action='store_true', help='Create a sample base64 string for demo purposes')
+    input_group.add_argument('-m', '--manifest',
+                             help='JSONL file with one {"output": path, "data": base64} record per line')
     
-    parser.add_argument('-o', '--output', required=True, help='Output path for the PDF file')
+    parser.add_argument('-o', '--output',
+                        help='Output path for the PDF file (with --manifest: directory all output paths must stay inside)')
+    parser.add_argument('-j', '--jobs', type=_positive_int, default=None,
+                        help='Manifest mode: number of writer threads (default: CPU count)')
+    parser.add_argument('--max-in-flight', type=_positive_int, default=None,
+                        help='Manifest mode: records held in memory at once (default: 2 x jobs)')
+    parser.add_argument('--verify', action='store_true',
+                        help='Only check the Base64 alphabet, padding and PDF header/trailer; write nothing')
+    parser.add_argument('--sha256', action='store_true',
+                        help='With --verify: also print the SHA-256 of the decoded PDF')
     
     args = parser.parse_args()
     
+    if args.verify:
+        if args.manifest:
+            parser.error('--verify works with -s, -f or --sample')
+        run_verify(args)
+        return
+    if args.manifest:
+        run_manifest(args)
+        return
+    if not args.output:
+        parser.error('the following arguments are required: -o/--output')
+    
     try:
         if args.sample:
             print("Creating a sample base64 encoded PDF...")
             base64_string = create_sample_base64()
         elif args.file:
-            with open(args.file, 'r') as file:
-                base64_string = file.read().strip()
+            # Decode incrementally so large payloads never sit in memory whole
+            with open(args.file, 'rb') as file:
+                output_path = stream_base64_to_pdf(file, args.output)
+            print(f"PDF file successfully saved to {output_path}")
+            return
         else:
             base64_string = args.string
         
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Ball Rendering Benchmark
+
+Renders the physics-ball.py scene with thousands of balls into an offscreen
+OpenGL context and compares the ways of drawing the balls: tessellating
+every sphere on every frame, replaying cached display lists, and drawing
+all balls at once as point sprites. No window or GPU is needed; on a Linux
+box without one, Mesa's llvmpipe software rasterizer is used through EGL.
+
+Only rendering is timed. The camera turns a little every frame so that no
+two frames are identical, and every frame is finished with glFinish so the
+time includes the rasterization, not just queueing the calls.
+"""
+
+import os
+
+# Pick EGL before PyOpenGL is first imported, and let Mesa run without a display server
+os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+import argparse
+import ctypes
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from OpenGL import EGL
+from OpenGL.GL import *
+
+from script_utils import load_script
+
+
+RENDERERS = ('immediate', 'cached', 'sprites')
+
+
+def create_offscreen_context(width, height):
+    """
+    Make a desktop OpenGL context current without a window.
+
+    Uses EGL without a surface and renders into a framebuffer object with a
+    color and a depth renderbuffer.
+
+    Returns:
+        str: The GL_RENDERER string of the context
+
+    Raises:
+        RuntimeError: If no EGL display or OpenGL context is available
+    """
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not display or not EGL.eglInitialize(display, None, None):
+        raise RuntimeError("No EGL display is available")
+
+    attributes = (EGL.EGLint * 5)(EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                                  EGL.EGL_SURFACE_TYPE, 0, EGL.EGL_NONE)
+    config = EGL.EGLConfig()
+    count = EGL.EGLint()
+    if not EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(count)) or not count.value:
+        raise RuntimeError("No EGL config supports desktop OpenGL")
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not context or not EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, context):
+        raise RuntimeError("Could not create an OpenGL context without a surface")
+
+    framebuffer = glGenFramebuffers(1)
+    glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+    color, depth = glGenRenderbuffers(2)
+    for renderbuffer, storage, attachment in ((color, GL_RGBA8, GL_COLOR_ATTACHMENT0),
+                                              (depth, GL_DEPTH_COMPONENT24, GL_DEPTH_ATTACHMENT)):
+        glBindRenderbuffer(GL_RENDERBUFFER, renderbuffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, storage, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, renderbuffer)
+    if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+        raise RuntimeError("The offscreen framebuffer is incomplete")
+    glViewport(0, 0, width, height)
+    return glGetString(GL_RENDERER).decode()
+
+
+def read_frame(width, height):
+    """Return the current framebuffer as a (height, width, 3) array, top row first."""
+    pixels = glReadPixels(0, 0, width, height, GL_RGB, GL_UNSIGNED_BYTE)
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 3)[::-1]
+
+
+def benchmark(scene, containers, engine, renderer, frames):
+    """Render frames with one renderer and return its timings."""
+    meshes = scene.MeshCache(renderer != 'immediate')
+    sprites = scene.SpriteBallRenderer() if renderer == 'sprites' else None
+    camera_rotation = [20, 30]
+    try:
+        # The first frame builds the display lists and compiles the shaders
+        scene.render_scene(containers, engine, meshes, camera_rotation, sprites)
+        glFinish()
+
+        meshes.draw_calls = 0
+        if sprites is not None:
+            sprites.draw_calls = 0
+        start = time.perf_counter()
+        for frame in range(frames):
+            camera_rotation[1] += 0.5
+            scene.render_scene(containers, engine, meshes, camera_rotation, sprites)
+            glFinish()
+        elapsed = time.perf_counter() - start
+
+        draw_calls = meshes.draw_calls + (sprites.draw_calls if sprites is not None else 0)
+        error = glGetError()
+        if error != GL_NO_ERROR:
+            raise RuntimeError(f"OpenGL error {error:#x} while rendering with {renderer}")
+        return {
+            'renderer': renderer,
+            'frames': frames,
+            'frame_ms': elapsed / frames * 1000,
+            'fps': frames / elapsed,
+            'draw_calls': draw_calls / frames,
+        }
+    finally:
+        meshes.release()
+        if sprites is not None:
+            sprites.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ball renderers of physics-ball.py offscreen')
+    parser.add_argument('--balls', type=int, default=5000,
+                        help='Total number of balls, split over the containers (default: 5000)')
+    parser.add_argument('--frames', type=int, default=10, help='Frames to time per renderer (default: 10)')
+    parser.add_argument('--renderers', nargs='+', choices=RENDERERS, default=list(RENDERERS),
+                        help='Renderers to compare (default: all)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the scene (default: 0)')
+    parser.add_argument('--save', metavar='DIR', help='Save the last frame of each renderer as a PNG')
+    args = parser.parse_args()
+
+    if args.balls < 2 or args.frames <= 0:
+        parser.error('--balls must be at least 2 and --frames must be positive')
+
+    scene = load_script('physics-ball.py')
+    try:
+        gl_renderer = create_offscreen_context(scene.width, scene.height)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    scene.setup_gl()
+
+    containers, engine = scene.create_scene(args.seed, args.balls // 2)
+    print(f"{engine.count} balls, {scene.width}x{scene.height} on {gl_renderer}")
+    print(f"{'renderer':<10} {'draw calls':>10} {'ms/frame':>10} {'fps':>8} {'speedup':>8}")
+
+    first = None
+    for renderer in args.renderers:
+        result = benchmark(scene, containers, engine, renderer, args.frames)
+        first = first or result
+        print(f"{renderer:<10} {result['draw_calls']:>10.0f} {result['frame_ms']:>10.2f} "
+              f"{result['fps']:>8.1f} {first['frame_ms'] / result['frame_ms']:>7.1f}x")
+
+        if args.save:
+            import pygame
+            output_dir = Path(args.save)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            image = pygame.surfarray.make_surface(read_frame(scene.width, scene.height).swapaxes(0, 1))
+            pygame.image.save(image, str(output_dir / f"{renderer}.png"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Dirty Rect Benchmark
+
+Runs the 2D pygame demos for a fixed number of frames, once drawing and
+flipping the whole screen and once with --dirty-rects, and compares their
+frame times from the frame profiler: the draw phase (clearing and drawing)
+and the flip phase (copying to the display).
+
+The demos run in subprocesses on whatever display SDL picks, so run this on
+the display you care about. Headless drivers don't show the difference:
+'dummy' copies nothing and 'offscreen' copies the whole frame for any
+update.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEMOS = {
+    'ball-hexagon': ['ball-hexagon.py'],
+    'spinning-hexagon': ['spinning-hexagon-physics.py'],
+    'spinning-hexagon-trail': ['spinning-hexagon-physics.py', '--trail-length', '500'],
+    'auto-snake': ['auto-snake.py'],
+}
+
+
+def run_demo(command, frames, dirty_rects):
+    """Run a demo for frames frames and return its per-frame samples in milliseconds."""
+    with tempfile.TemporaryDirectory() as directory:
+        output = Path(directory) / 'profile.json'
+        arguments = [sys.executable, str(SCRIPT_DIR / command[0]), *command[1:],
+                     '--profile-frames', str(frames), '--profile-out', str(output)]
+        if dirty_rects:
+            arguments.append('--dirty-rects')
+        completed = subprocess.run(arguments, capture_output=True, text=True)
+        if completed.returncode:
+            raise RuntimeError(f"{command[0]} failed: {completed.stderr.strip()}")
+        with open(output) as file:
+            samples = json.load(file)['samples_ms']
+    return {name: np.array([np.nan if value is None else value for value in values])
+            for name, values in samples.items()}
+
+
+def summarize(samples, skip):
+    """Return p50 draw, flip and draw + flip times, and p95 draw + flip, over the frames after skip."""
+    draw = samples['draw'][skip:]
+    flip = samples['flip'][skip:]
+    drawn = ~np.isnan(draw) & ~np.isnan(flip)  # Frames that were drawn at all
+    draw, flip = draw[drawn], flip[drawn]
+    total = draw + flip
+    return {
+        'frames': int(np.count_nonzero(drawn)),
+        'draw_ms': float(np.median(draw)),
+        'flip_ms': float(np.median(flip)),
+        'render_ms': float(np.median(total)),
+        'render_p95_ms': float(np.percentile(total, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare full-frame and dirty-rect drawing in the pygame demos')
+    parser.add_argument('--demos', nargs='+', choices=list(DEMOS), default=list(DEMOS),
+                        help='Demos to run (default: all)')
+    parser.add_argument('--frames', type=int, default=120,
+                        help='Frames to run each demo for; auto-snake runs at 10 fps (default: 120)')
+    parser.add_argument('--skip', type=int, default=10,
+                        help='Frames left out at the start, while the window settles (default: 10)')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    if args.frames <= args.skip or args.skip < 0:
+        parser.error('--frames must be larger than --skip, and --skip not negative')
+
+    print(f"{'demo':<24} {'mode':<6} {'draw ms':>8} {'flip ms':>8} {'total ms':>9} {'p95 ms':>8} {'speedup':>8}")
+    results = []
+    for demo in args.demos:
+        full = None
+        for dirty_rects in (False, True):
+            try:
+                summary = summarize(run_demo(DEMOS[demo], args.frames, dirty_rects), args.skip)
+            except RuntimeError as e:
+                print(f"Error: {str(e)}", file=sys.stderr)
+                sys.exit(1)
+            mode = 'dirty' if dirty_rects else 'full'
+            full = full or summary
+            speedup = full['render_ms'] / summary['render_ms'] if summary['render_ms'] > 0 else float('inf')
+            print(f"{demo:<24} {mode:<6} {summary['draw_ms']:>8.2f} {summary['flip_ms']:>8.2f} "
+                  f"{summary['render_ms']:>9.2f} {summary['render_p95_ms']:>8.2f} {speedup:>7.2f}x")
+            results.append({'demo': demo, 'mode': mode, **summary})
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Results saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
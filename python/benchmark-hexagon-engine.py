@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Hexagon Engine Benchmark
+
+Steps N balls inside a spinning hexagon two ways: with the Ball and Hexagon
+classes of spinning-hexagon-physics.py, one ball and one side at a time,
+and with hexagon_engine.PolygonEngine, all balls and sides in one
+vectorized pass. Only the physics are timed; nothing is drawn. The per-ball
+loop is slow, so it is skipped above --loop-limit balls.
+"""
+
+import os
+
+# spinning-hexagon-physics.py opens its window on import; make that a no-op
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from hexagon_engine import PolygonEngine
+from script_utils import load_script
+
+
+DEFAULT_BALLS = [1, 100, 1000, 10000, 50000]
+
+
+def starting_balls(count, center, size, radius, seed):
+    """Random positions inside the circle that fits in the hexagon, and random velocities."""
+    rng = np.random.default_rng(seed)
+    angles = rng.uniform(0, 2 * math.pi, count)
+    distances = (size * math.cos(math.pi / 6) - radius) * np.sqrt(rng.random(count))
+    positions = np.array(center) + np.column_stack([np.cos(angles), np.sin(angles)]) * distances[:, None]
+    return positions, rng.uniform(-2.0, 2.0, (count, 2))
+
+
+def time_loop(demo, positions, velocities, radius, steps):
+    """Return seconds per step for the per-ball Ball/Hexagon code."""
+    hexagon = demo.Hexagon((400, 300), 200)
+    balls = []
+    for position, velocity in zip(positions, velocities):
+        ball = demo.Ball(*position)
+        ball.vel = velocity.copy()
+        ball.radius = radius
+        balls.append(ball)
+
+    start = time.perf_counter()
+    for step in range(steps):
+        hexagon.rotate()
+        for ball in balls:
+            ball.update()
+            for p1, p2 in hexagon.line_segments:
+                ball.collide_with_segment(p1, p2)
+    return (time.perf_counter() - start) / steps
+
+
+def time_engine(positions, velocities, radius, steps):
+    """Return seconds per step for PolygonEngine, and how many balls ended up outside the hexagon."""
+    engine = PolygonEngine([(400, 300)], 200, 6, 0.5)
+    engine.add_balls(positions, velocities, radius)
+
+    start = time.perf_counter()
+    for step in range(steps):
+        engine.step()
+    elapsed = (time.perf_counter() - start) / steps
+    escaped = np.linalg.norm(engine.positions - engine.polygon_centers[0], axis=1) > engine.polygon_sizes[0]
+    return elapsed, int(np.count_nonzero(escaped))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the per-ball hexagon physics with hexagon_engine')
+    parser.add_argument('--balls', type=int, nargs='+', default=DEFAULT_BALLS,
+                        help=f"Ball counts to time (default: {' '.join(map(str, DEFAULT_BALLS))})")
+    parser.add_argument('--steps', type=int, default=100, help='Steps to time per run (default: 100)')
+    parser.add_argument('--radius', type=float, default=4.0, help='Ball radius in pixels (default: 4)')
+    parser.add_argument('--loop-limit', type=int, default=1000,
+                        help='Largest ball count to time the per-ball loop with (default: 1000)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the balls (default: 0)')
+    args = parser.parse_args()
+
+    if min(args.balls) < 1 or args.steps < 1 or args.radius <= 0:
+        parser.error('--balls, --steps and --radius must be positive')
+
+    demo = load_script('spinning-hexagon-physics.py')
+    print(f"{'balls':>8} {'loop ms/step':>13} {'engine ms/step':>15} {'speedup':>8} {'escaped':>8}")
+    for count in args.balls:
+        positions, velocities = starting_balls(count, (400, 300), 200, args.radius, args.seed)
+        engine_time, escaped = time_engine(positions, velocities, args.radius, args.steps)
+        if count <= args.loop_limit:
+            loop_time = time_loop(demo, positions, velocities, args.radius, args.steps)
+            loop_text = f"{loop_time * 1000:>13.3f}"
+            speedup = f"{loop_time / engine_time:>7.1f}x"
+        else:
+            loop_text, speedup = f"{'-':>13}", f"{'-':>8}"
+        print(f"{count:>8} {loop_text} {engine_time * 1000:>15.3f} {speedup} {escaped:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+"""
+PDF/Base64 Benchmark Suite
+
+Measures encode and decode round trips of pdf-to-base64.py and
+base64-to-pdf.py on synthetic PDFs from 1 KB up to 1 GB. For every size and
+mode it records throughput, wall time and peak RSS, checks that the round
+trip reproduces the input, and can write the results as JSON and compare
+them with a stored baseline.
+
+Every measurement runs in a fresh subprocess so that its peak RSS is not
+polluted by earlier runs.
+"""
+
+import argparse
+import base64
+import filecmp
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from script_utils import format_mb, load_script, peak_rss_bytes
+
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+
+DEFAULT_SIZES = ['1K', '16K', '256K', '4M', '64M']
+ALL_SIZES = DEFAULT_SIZES + ['1G']
+
+# Small inputs are repeated until a run takes at least this long
+MIN_RUN_SECONDS = 0.2
+
+
+def parse_size(text):
+    """Parse a size such as ``512``, ``16K``, ``4M`` or ``1G`` into bytes."""
+    units = {'K': KB, 'M': MB, 'G': GB}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit, factor in (('G', GB), ('M', MB), ('K', KB)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+def make_synthetic_pdf(path, size):
+    """
+    Write a PDF of roughly ``size`` bytes based on the minimal sample PDF.
+
+    The sample from ``create_sample_base64`` is padded with a random binary
+    comment after its header, so nothing downstream can take shortcuts on
+    repetitive content and the header and trailer stay intact.
+    """
+    decoder = load_script('base64-to-pdf.py')
+    sample = base64.b64decode(decoder.create_sample_base64())
+    header, body = sample.split(b'\n', 1)
+
+    with open(path, 'wb') as file:
+        file.write(header + b'\n%')
+        remaining = max(size - len(sample) - 2, 0)
+        while remaining:
+            block = os.urandom(min(remaining, MB))
+            file.write(block)
+            remaining -= len(block)
+        file.write(b'\n' + body)
+
+
+def _encode_read(encoder, pdf_path, output_path):
+    with open(output_path, 'w') as output_file:
+        output_file.write(encoder.convert_pdf_to_base64(pdf_path))
+
+
+def _encode_stream(encoder, pdf_path, output_path):
+    with open(output_path, 'wb') as output_file:
+        encoder.stream_pdf_to_base64(pdf_path, output_file)
+
+
+def _encode_mmap(encoder, pdf_path, output_path):
+    with open(output_path, 'w') as output_file:
+        output_file.write(encoder.convert_pdf_to_base64(pdf_path, use_mmap=True))
+
+
+def _encode_mmap_stream(encoder, pdf_path, output_path):
+    with open(output_path, 'wb') as output_file:
+        encoder.stream_pdf_to_base64(pdf_path, output_file, use_mmap=True)
+
+
+def _decode_read(decoder, base64_path, output_path):
+    with open(base64_path, 'r') as file:
+        decoder.convert_base64_to_pdf(file.read().strip(), output_path)
+
+
+def _decode_stream(decoder, base64_path, output_path):
+    with open(base64_path, 'rb') as file:
+        decoder.stream_base64_to_pdf(file, output_path)
+
+
+def _decode_verify(decoder, base64_path, output_path):
+    with open(base64_path, 'rb') as file:
+        result = decoder.verify_base64_pdf(file, compute_sha256=True)
+    if not result['valid']:
+        raise ValueError(result['error'])
+
+
+# operation -> (script, {mode: function})
+OPERATIONS = {
+    'encode': ('pdf-to-base64.py', {
+        'read': _encode_read,
+        'stream': _encode_stream,
+        'mmap': _encode_mmap,
+        'mmap-stream': _encode_mmap_stream,
+    }),
+    'decode': ('base64-to-pdf.py', {
+        'read': _decode_read,
+        'stream': _decode_stream,
+        'verify': _decode_verify,
+    }),
+}
+
+
+def run_worker(operation, mode, input_path, output_path):
+    """Run one measurement in this process and print it as JSON."""
+    script, modes = OPERATIONS[operation]
+    module = load_script(script)
+    function = modes[mode]
+    base_rss = peak_rss_bytes()
+
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        function(module, input_path, output_path)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_RUN_SECONDS:
+            break
+
+    print(json.dumps({
+        'seconds': elapsed / runs,
+        'runs': runs,
+        'peak_rss': peak_rss_bytes(),
+        'base_rss': base_rss,
+    }))
+
+
+def measure(operation, mode, input_path, output_path, size):
+    """Run one measurement in a subprocess and return it as a result record."""
+    completed = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), '--worker',
+         operation, mode, str(input_path), str(output_path)],
+        capture_output=True, text=True,
+    )
+    if completed.returncode:
+        raise RuntimeError(f"{operation}/{mode} failed: {completed.stderr.strip()}")
+
+    result = json.loads(completed.stdout)
+    growth = None
+    if result['peak_rss'] is not None:
+        growth = result['peak_rss'] - result['base_rss']
+    return {
+        'operation': operation,
+        'mode': mode,
+        'size': size,
+        'seconds': result['seconds'],
+        'runs': result['runs'],
+        'mb_per_s': size / MB / result['seconds'],
+        'peak_rss': result['peak_rss'],
+        'rss_growth': growth,
+    }
+
+
+def run_suite(sizes, encode_modes, decode_modes, pdf=None, report=print):
+    """
+    Run encode and decode round trips for every size and mode.
+
+    Args:
+        sizes (list): Synthetic PDF sizes in bytes (ignored if pdf is given)
+        encode_modes (list): Modes of the encode operation to measure
+        decode_modes (list): Modes of the decode operation to measure
+        pdf (str, optional): Benchmark this PDF instead of synthetic ones
+        report (callable): Called with each result record as it is produced
+
+    Returns:
+        list: Result records
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        inputs = [Path(pdf)] if pdf else [temp_dir / f"synthetic-{format_size(size)}.pdf" for size in sizes]
+
+        for index, pdf_path in enumerate(inputs):
+            if not pdf:
+                make_synthetic_pdf(pdf_path, sizes[index])
+            size = pdf_path.stat().st_size
+            base64_path = temp_dir / 'encoded.b64'
+            restored_path = temp_dir / 'restored.pdf'
+
+            for mode in encode_modes:
+                results.append(measure('encode', mode, pdf_path, base64_path, size))
+                report(results[-1])
+            if not encode_modes:
+                with open(base64_path, 'wb') as output_file:
+                    load_script('pdf-to-base64.py').stream_pdf_to_base64(pdf_path, output_file)
+
+            for mode in decode_modes:
+                results.append(measure('decode', mode, base64_path, restored_path, size))
+                report(results[-1])
+                if mode != 'verify' and not filecmp.cmp(pdf_path, restored_path, shallow=False):
+                    raise RuntimeError(f"decode/{mode} did not reproduce {pdf_path}")
+
+            # Free disk space before generating the next, larger input
+            if not pdf:
+                pdf_path.unlink()
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Compare results with a stored baseline run.
+
+    A result regresses if its throughput dropped, or its peak RSS grew, by
+    more than ``tolerance`` (a fraction) relative to the matching baseline
+    result. Results without a baseline counterpart are skipped.
+
+    Returns:
+        list: ``(result, baseline result, reason)`` tuples for each regression
+    """
+    def key(result):
+        return result['operation'], result['mode'], result['size']
+
+    baseline_results = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get(key(result))
+        if previous is None:
+            continue
+        if result['mb_per_s'] < previous['mb_per_s'] * (1 - tolerance):
+            regressions.append((result, previous, 'throughput'))
+        if (result['peak_rss'] is not None and previous.get('peak_rss') is not None
+                and result['peak_rss'] > previous['peak_rss'] * (1 + tolerance)):
+            regressions.append((result, previous, 'peak RSS'))
+    return regressions
+
+
+def print_result(result):
+    print(f"{result['operation']:<8}{result['mode']:<13}{format_size(result['size']):>8}"
+          f"{result['mb_per_s']:>10.1f}{result['seconds']:>12.5f}"
+          f"{format_mb(result['peak_rss']):>14}{format_mb(result['rss_growth']):>16}")
+
+
+def main():
+    """Main function to run the benchmark suite."""
+    parser = argparse.ArgumentParser(description='Benchmark PDF/Base64 encode and decode round trips.')
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES,
+                        help=f"Synthetic PDF sizes, e.g. 1K 4M 1G (default: {' '.join(DEFAULT_SIZES)})")
+    parser.add_argument('--all-sizes', action='store_true',
+                        help=f"Run every size from 1K to 1G ({' '.join(ALL_SIZES)})")
+    parser.add_argument('--pdf', help='Benchmark this PDF instead of synthetic ones')
+    parser.add_argument('--encode-modes', nargs='*', choices=sorted(OPERATIONS['encode'][1]),
+                        default=list(OPERATIONS['encode'][1]), help='Encode modes to measure (default: all)')
+    parser.add_argument('--decode-modes', nargs='*', choices=sorted(OPERATIONS['decode'][1]),
+                        default=list(OPERATIONS['decode'][1]), help='Decode modes to measure (default: all)')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against results previously written with --json')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Allowed relative slowdown or RSS growth against the baseline (default: 0.15)')
+    parser.add_argument('--worker', nargs=4, metavar=('OPERATION', 'MODE', 'INPUT', 'OUTPUT'),
+                        help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    sizes = [parse_size(size) for size in (ALL_SIZES if args.all_sizes else args.sizes)]
+
+    print(f"{'op':<8}{'mode':<13}{'size':>8}{'MB/s':>10}{'wall s':>12}{'peak RSS MB':>14}{'RSS growth MB':>16}")
+    try:
+        results = run_suite(sizes, args.encode_modes, args.decode_modes, args.pdf, print_result)
+    except RuntimeError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({
+                'created': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'results': results,
+            }, file, indent=2)
+        print(f"Results saved to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for result, previous, reason in regressions:
+            if reason == 'throughput':
+                change = f"{previous['mb_per_s']:.1f} -> {result['mb_per_s']:.1f} MB/s"
+            else:
+                change = f"{format_mb(previous['peak_rss'])} -> {format_mb(result['peak_rss'])} MB"
+            print(f"Regression: {result['operation']}/{result['mode']} at {format_size(result['size'])} "
+                  f"{reason}: {change}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+"""
+Ball Engine Scaling Benchmark
+
+Sweeps the scene parameters of ball_scenes.generate_scene() and steps each
+scene headlessly, so engine changes can be judged on how they scale rather
+than on the demo-sized scene of physics-ball.py. For every combination of
+ball count, balls per container, radius distribution and velocity spread it
+reports steps/s, ball-steps/s, peak RSS and the memory held by the engine's
+arrays, together with the collision work per step and the number of
+tunnelled (missed) contacts. A log-log fit of the step time against the
+ball count summarizes the scaling of every sweep.
+
+Every measurement runs in a fresh subprocess so that its peak RSS is not
+polluted by earlier runs.
+
+--check-momentum instead resolves the contacts of one dense scene with
+elastic collisions and checks that they leave the total momentum unchanged.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from ball_engine import DEFAULT_MAX_SUBSTEPS
+from ball_scenes import RADIUS_DISTRIBUTIONS, engine_bytes, generate_scene, packing_fraction
+from script_utils import format_mb, peak_rss_bytes
+
+
+DEFAULT_BALLS = [100, 1000, 10000]
+DEFAULT_DT = 1.0 / 60.0
+
+# Largest change of the total momentum allowed by --check-momentum, relative to the sum of |m v|
+MOMENTUM_TOLERANCE = 1e-9
+
+
+def run_worker(config):
+    """Build one scene, step it in this process and print the measurement as JSON."""
+    base_rss = peak_rss_bytes()
+    engine, container_colors = generate_scene(
+        config['containers'], config['balls_per_container'], tuple(config['ball_radius']),
+        config['distribution'], config['velocity_spread'], config['seed'],
+        broad_phase=config['broad_phase'], ccd=config['ccd'], max_substeps=config['max_substeps'])
+
+    # Let the initial overlaps settle before timing
+    for step in range(config['warmup']):
+        engine.step(config['dt'])
+
+    totals = dict.fromkeys(('candidate_pairs', 'contacts', 'swept_contacts', 'tunnelled', 'substeps'), 0)
+    slowest = 0.0
+    start = time.perf_counter()
+    for step in range(config['steps']):
+        step_start = time.perf_counter()
+        engine.step(config['dt'])
+        slowest = max(slowest, time.perf_counter() - step_start)
+        for name in totals:
+            totals[name] += getattr(engine, name)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'balls': engine.count,
+        'seconds': elapsed,
+        'slowest_step': slowest,
+        'packing': packing_fraction(engine),
+        'engine_bytes': engine_bytes(engine),
+        'peak_rss': peak_rss_bytes(),
+        'base_rss': base_rss,
+        **totals,
+    }))
+
+
+def measure(config):
+    """Run one measurement in a subprocess and return it as a result record."""
+    completed = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), '--worker', json.dumps(config)],
+        capture_output=True, text=True,
+    )
+    if completed.returncode:
+        raise RuntimeError(f"{config['balls']} balls failed: {completed.stderr.strip()}")
+
+    result = json.loads(completed.stdout)
+    steps = config['steps']
+    seconds = result['seconds']
+    growth = None
+    if result['peak_rss'] is not None:
+        growth = result['peak_rss'] - result['base_rss']
+    return {
+        **config,
+        'requested_balls': config['balls'],
+        'balls': result['balls'],
+        'steps_per_s': steps / seconds if seconds > 0 else float('inf'),
+        'ball_steps_per_s': result['balls'] * steps / seconds if seconds > 0 else float('inf'),
+        'ms_per_step': seconds / steps * 1000,
+        'slowest_ms': result['slowest_step'] * 1000,
+        'packing': result['packing'],
+        'candidate_pairs': result['candidate_pairs'] / steps,
+        'contacts': result['contacts'] / steps,
+        'swept_contacts': result['swept_contacts'] / steps,
+        'substeps': result['substeps'] / steps,
+        'tunnelled': result['tunnelled'],
+        'engine_bytes': result['engine_bytes'],
+        'peak_rss': result['peak_rss'],
+        'rss_growth': growth,
+    }
+
+
+def sweep(balls, balls_per_container, distributions, velocity_spreads, options, report=print):
+    """
+    Measure every combination of the swept parameters.
+
+    Every total ball count is reached with as many containers as it takes
+    at the given number of balls per container, so the density of the
+    containers stays the same as the scene grows.
+
+    Args:
+        balls (list): Total ball counts
+        balls_per_container (list): Balls in every container
+        distributions (list): Radius distributions
+        velocity_spreads (list): Largest initial speeds along each axis
+        options (dict): Settings shared by all measurements (ball_radius,
+            steps, warmup, dt, seed, broad_phase, ccd, max_substeps)
+        report (callable): Called with each result record as it is produced
+
+    Returns:
+        list: Result records
+    """
+    results = []
+    for per_container, distribution, spread, total in itertools.product(
+            balls_per_container, distributions, velocity_spreads, balls):
+        config = {
+            'balls': total,
+            'containers': max(1, math.ceil(total / per_container)),
+            'balls_per_container': per_container,
+            'distribution': distribution,
+            'velocity_spread': spread,
+            **options,
+        }
+        results.append(measure(config))
+        report(results[-1])
+    return results
+
+
+def scaling_exponents(results):
+    """
+    Fit ms per step against the ball count on a log-log scale for every sweep.
+
+    An exponent of 1 means the step time grows linearly with the number of
+    balls; 2 means it grows with the number of pairs.
+
+    Returns:
+        list: ((balls per container, distribution, velocity spread), exponent) tuples
+    """
+    groups = {}
+    for result in results:
+        key = (result['balls_per_container'], result['distribution'], result['velocity_spread'])
+        groups.setdefault(key, []).append(result)
+
+    exponents = []
+    for key, group in groups.items():
+        balls = np.array([result['balls'] for result in group], dtype=float)
+        times = np.array([result['ms_per_step'] for result in group])
+        if len(np.unique(balls)) < 2:
+            continue
+        slope, intercept = np.polyfit(np.log(balls), np.log(times), 1)
+        exponents.append((key, slope))
+    return exponents
+
+
+def check_momentum(balls, seed, rounds=10):
+    """
+    Resolve the ball-ball contacts of a dense scene with elastic collisions.
+
+    All balls go into one container, about three times over its volume, with
+    radii of two sizes, so most balls touch several others at once.
+
+    Returns:
+        tuple: (contacts resolved, largest change of the total momentum in a
+            round relative to the sum of |m v|)
+    """
+    engine, container_colors = generate_scene(1, balls, (0.3, 0.6), 'bimodal', 1.0, seed)
+    engine.restitution = 1.0
+    contacts = 0
+    drift = 0.0
+    for round_number in range(rounds):
+        scale = np.sum(engine.masses * np.linalg.norm(engine.velocities, axis=1))
+        before = engine.masses @ engine.velocities
+        contacts += engine.collide_balls()
+        drift = max(drift, float(np.linalg.norm(engine.masses @ engine.velocities - before) / scale))
+    return contacts, drift
+
+
+def print_header():
+    print(f"{'balls':>8} {'per box':>7} {'radii':<9} {'spread':>6} {'fill':>5} {'steps/s':>9} "
+          f"{'ball-steps/s':>13} {'ms/step':>9} {'max ms':>8} {'pairs':>10} {'contacts':>9} "
+          f"{'substeps':>8} {'tunnelled':>9} {'arrays MB':>9} {'peak MB':>8} {'growth MB':>9}")
+
+
+def print_result(result):
+    print(f"{result['balls']:>8} {result['balls_per_container']:>7} {result['distribution']:<9} "
+          f"{result['velocity_spread']:>6g} {result['packing']:>5.2f} {result['steps_per_s']:>9.1f} "
+          f"{result['ball_steps_per_s']:>13,.0f} {result['ms_per_step']:>9.2f} {result['slowest_ms']:>8.2f} "
+          f"{result['candidate_pairs']:>10.0f} {result['contacts'] + result['swept_contacts']:>9.1f} "
+          f"{result['substeps']:>8.1f} {result['tunnelled']:>9} {format_mb(result['engine_bytes']):>9} "
+          f"{format_mb(result['peak_rss']):>8} {format_mb(result['rss_growth']):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how the ball engine scales with the scene size')
+    parser.add_argument('--balls', type=int, nargs='+', default=DEFAULT_BALLS,
+                        help=f"Total ball counts to sweep (default: {' '.join(map(str, DEFAULT_BALLS))})")
+    parser.add_argument('--balls-per-container', type=int, nargs='+', default=[50],
+                        help='Balls in every container; the container count follows from the total (default: 50)')
+    parser.add_argument('--distributions', nargs='+', choices=RADIUS_DISTRIBUTIONS, default=['uniform'],
+                        help='Ball radius distributions to sweep (default: uniform)')
+    parser.add_argument('--velocity-spreads', type=float, nargs='+', default=[1.0],
+                        help='Largest initial ball speeds along each axis to sweep (default: 1.0)')
+    parser.add_argument('--ball-radius', type=float, nargs=2, metavar=('MIN', 'MAX'), default=(0.2, 0.4),
+                        help='Smallest and largest ball radius (default: 0.2 0.4)')
+    parser.add_argument('--steps', type=int, default=50, help='Steps to time per scene (default: 50)')
+    parser.add_argument('--warmup', type=int, default=5,
+                        help='Untimed steps first, to let the initial overlaps settle (default: 5)')
+    parser.add_argument('--dt', type=float, default=DEFAULT_DT,
+                        help=f'Time step in seconds (default: {DEFAULT_DT:.4f})')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the scenes (default: 0)')
+    parser.add_argument('--broad-phase', choices=('grid', 'all'), default='grid',
+                        help='Broad phase of the engine (default: grid)')
+    parser.add_argument('--no-ccd', action='store_true', help='Turn off the swept time-of-impact tests')
+    parser.add_argument('--max-substeps', type=int, default=DEFAULT_MAX_SUBSTEPS,
+                        help=f'Most substeps per step, 1 turns substepping off (default: {DEFAULT_MAX_SUBSTEPS})')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    parser.add_argument('--check-momentum', action='store_true',
+                        help='Only check that ball-ball contacts conserve momentum in a dense scene '
+                             'of the largest --balls count, and exit non-zero if they do not')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(json.loads(args.worker))
+        return
+
+    if args.check_momentum:
+        balls = max(args.balls)
+        contacts, drift = check_momentum(balls, args.seed)
+        result = 'OK' if drift <= MOMENTUM_TOLERANCE else 'FAILED'
+        print(f"Momentum check, {balls} balls in one container: {contacts} contacts, "
+              f"largest relative change {drift:.2e} (tolerance {MOMENTUM_TOLERANCE:.0e}): {result}")
+        if result != 'OK':
+            sys.exit(1)
+        return
+
+    if min(args.balls) < 1 or min(args.balls_per_container) < 1:
+        parser.error('--balls and --balls-per-container must be positive')
+    if args.steps < 1 or args.warmup < 0 or args.dt <= 0 or args.max_substeps < 1:
+        parser.error('--steps, --dt and --max-substeps must be positive and --warmup not negative')
+    if not 0 < args.ball_radius[0] <= args.ball_radius[1]:
+        parser.error('--ball-radius must be positive, smallest first')
+    if min(args.velocity_spreads) < 0:
+        parser.error('--velocity-spreads must not be negative')
+
+    options = {
+        'ball_radius': args.ball_radius,
+        'steps': args.steps,
+        'warmup': args.warmup,
+        'dt': args.dt,
+        'seed': args.seed,
+        'broad_phase': args.broad_phase,
+        'ccd': not args.no_ccd,
+        'max_substeps': args.max_substeps,
+    }
+
+    print_header()
+    try:
+        results = sweep(args.balls, args.balls_per_container, args.distributions, args.velocity_spreads,
+                        options, print_result)
+    except RuntimeError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    exponents = scaling_exponents(results)
+    if exponents:
+        print()
+        print("Step time ~ balls^k:")
+        for (per_container, distribution, spread), exponent in exponents:
+            print(f"  {per_container} per container, {distribution} radii, spread {spread:g}: k = {exponent:.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({
+                'created': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'results': results,
+                'scaling_exponents': [
+                    {'balls_per_container': key[0], 'distribution': key[1], 'velocity_spread': key[2],
+                     'exponent': exponent}
+                    for key, exponent in exponents
+                ],
+            }, file, indent=2)
+        print(f"Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Dirty Rectangles
+
+Partial screen updates for the pygame demos. Normally a demo fills the
+whole screen and flips all of it to the display every frame, even though
+only a ball, a hexagon and a few lines of text change. In dirty-rect mode
+it clears only the rectangles it drew to in the last frame, draws the
+frame as before while collecting the rectangles it draws to, and passes
+those and the cleared ones to pygame.display.update(), so only the parts of
+the frame that changed are copied to the display.
+
+Everything is still drawn every frame; only the clearing and the copy to
+the display shrink. With the mode off, clear() and update() fall back to
+filling the whole screen and pygame.display.flip().
+"""
+
+import pygame
+
+
+class DirtyRects:
+    """The rectangles drawn to in the current and the last frame."""
+
+    def __init__(self, surface, background=(0, 0, 0), enabled=True):
+        """
+        Args:
+            surface (pygame.Surface): The display surface
+            background (tuple): Color the screen is cleared to
+            enabled (bool): Whether to update only the dirty rectangles
+        """
+        self.surface = surface
+        self.background = background
+        self.enabled = enabled
+        self.rects = []  # Drawn to in this frame
+        self._previous = []  # Drawn to in the last frame, to be cleared
+        self._full_frame = True  # The first frame clears and updates the whole screen
+
+    @staticmethod
+    def add_arguments(parser):
+        """Add the --dirty-rects option to an argparse parser."""
+        parser.add_argument('--dirty-rects', action='store_true',
+                            help="Clear and update only the parts of the screen drawn to, "
+                                 "instead of the whole frame")
+
+    @classmethod
+    def from_args(cls, surface, args, background=(0, 0, 0)):
+        return cls(surface, background, enabled=args.dirty_rects)
+
+    def clear(self):
+        """Clear what was drawn in the last frame, or the whole screen."""
+        if not self.enabled or self._full_frame:
+            self.surface.fill(self.background)
+            return
+        for rect in self._previous:
+            self.surface.fill(self.background, rect)
+
+    def add(self, *rects):
+        """Mark rectangles as drawn to in this frame; None stands for nothing drawn."""
+        if self.enabled:
+            self.rects.extend(rect for rect in rects if rect is not None)
+
+    def update(self):
+        """Copy the rectangles cleared or drawn to in this frame to the display, or all of it."""
+        if not self.enabled or self._full_frame:
+            pygame.display.flip()
+            self._full_frame = False
+        else:
+            # Static things like text are drawn in the same place every frame; copy them once
+            cleared = {tuple(rect) for rect in self._previous}
+            pygame.display.update(self._previous + [rect for rect in self.rects if tuple(rect) not in cleared])
+        self._previous = self.rects
+        self.rects = []
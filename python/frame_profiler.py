@@ -0,0 +1,231 @@
+"""
+Frame Profiler
+
+Lightweight per-frame timing for the pygame demos. Wrap the phases of a
+frame in ``with profiler.phase('update'):`` blocks and call ``end_frame()``
+once per frame. The profiler keeps the last frames of every phase in ring
+buffers, reports rolling p50/p95/p99 times, can draw them as a HUD and can
+export them to CSV or JSON.
+
+A disabled profiler hands out one shared no-op context manager, so the
+calls can stay in the game loops at next to no cost.
+"""
+
+import argparse
+import csv
+import json
+import math
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+
+from pygame_hud import get_font
+
+
+DEFAULT_HISTORY = 3600  # Frames kept per phase: one minute at 60 fps
+PERCENTILES = (50, 95, 99)
+HUD_INTERVAL = 0.5  # Seconds between HUD text updates
+
+# The time from one end_frame() to the next, including waiting for the frame rate
+FRAME = 'frame'
+
+_DISABLED = nullcontext()
+
+
+def _output_path(path):
+    if Path(path).suffix.lower() not in ('.csv', '.json'):
+        raise argparse.ArgumentTypeError("the profile output must be a .csv or .json file")
+    return path
+
+
+class _PhaseTimer:
+    __slots__ = ('totals', 'name', 'start')
+
+    def __init__(self, totals, name):
+        self.totals = totals
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        # A phase can run more than once per frame; its times add up
+        self.totals[self.name] = self.totals.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+class FrameProfiler:
+    """Named phase timers with rolling percentiles, a HUD and CSV/JSON export."""
+
+    def __init__(self, enabled=True, history=DEFAULT_HISTORY, output=None, max_frames=None):
+        """
+        Args:
+            enabled (bool): Whether to time anything at all
+            history (int): Number of frames kept for the percentiles and the export
+            output (str, optional): CSV or JSON file written by close()
+            max_frames (int, optional): Frames after which finished turns true, for benchmark runs
+        """
+        if output is not None and Path(output).suffix.lower() not in ('.csv', '.json'):
+            raise ValueError("The profile output must be a .csv or .json file")
+        self.enabled = enabled
+        self.history = history
+        self.output = output
+        self.max_frames = max_frames
+        self.frames = 0  # Frames ended so far
+        self._timers = {}
+        self._totals = {}  # Seconds per phase in the current frame
+        self._samples = {FRAME: np.full(history, np.nan)}  # Rings of seconds, NaN where a phase didn't run
+        self._last_frame_end = None
+        self._hud_lines = []
+        self._hud_surfaces = []
+        self._hud_updated = -math.inf
+
+    @staticmethod
+    def add_arguments(parser):
+        """Add the --profile and --profile-out options to an argparse parser."""
+        parser.add_argument('--profile', action='store_true',
+                            help="Time the phases of every frame and show p50/p95/p99 on screen")
+        parser.add_argument('--profile-out', metavar='PATH', type=_output_path,
+                            help="Write the frame timings to a .csv or .json file on exit "
+                                 "(implies --profile)")
+        parser.add_argument('--profile-frames', metavar='N', type=int,
+                            help="Quit after N frames (implies --profile)")
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(enabled=args.profile or bool(args.profile_out) or args.profile_frames is not None,
+                   output=args.profile_out, max_frames=args.profile_frames)
+
+    @property
+    def finished(self):
+        """Whether max_frames frames have been profiled."""
+        return self.max_frames is not None and self.frames >= self.max_frames
+
+    def phase(self, name):
+        """Return a context manager that adds the time spent in it to phase name."""
+        if not self.enabled:
+            return _DISABLED
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _PhaseTimer(self._totals, name)
+        return timer
+
+    def end_frame(self):
+        """Store the phase times of the frame that just ended and start a new one."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._last_frame_end is not None:
+            self._totals[FRAME] = now - self._last_frame_end
+        self._last_frame_end = now
+
+        slot = self.frames % self.history
+        for name, ring in self._samples.items():
+            ring[slot] = self._totals.pop(name, np.nan)
+        # Phases seen for the first time
+        for name, seconds in self._totals.items():
+            self._samples[name] = np.full(self.history, np.nan)
+            self._samples[name][slot] = seconds
+        self._totals.clear()
+        self.frames += 1
+
+    def _ordered(self, ring):
+        # The kept samples of a ring, oldest first
+        if self.frames <= self.history:
+            return ring[:self.frames]
+        return np.roll(ring, -(self.frames % self.history))
+
+    def percentiles(self):
+        """Return {phase: (p50, p95, p99)} in milliseconds over the kept frames."""
+        result = {}
+        for name, ring in self._samples.items():
+            values = ring[:min(self.frames, self.history)]
+            values = values[~np.isnan(values)]
+            if len(values):
+                result[name] = tuple(float(value) * 1000 for value in np.percentile(values, PERCENTILES))
+        return result
+
+    def hud_lines(self):
+        """Return the HUD text, one line per phase, refreshed every HUD_INTERVAL seconds."""
+        now = time.perf_counter()
+        if self.enabled and now - self._hud_updated >= HUD_INTERVAL:
+            self._hud_updated = now
+            self._hud_lines = [
+                f"{name}: " + "  ".join(f"p{percentile} {value:.2f}" for percentile, value in zip(PERCENTILES, values))
+                + " ms"
+                for name, values in self.percentiles().items()
+            ]
+            self._hud_surfaces = []
+        return self._hud_lines
+
+    def draw_hud(self, surface, color=(255, 255, 0), margin=10):
+        """Draw the HUD in the bottom right corner of a pygame surface and return the rectangles drawn to."""
+        if not self.enabled:
+            return []
+        lines = self.hud_lines()
+        if not self._hud_surfaces:
+            font = get_font(None, 20)
+            self._hud_surfaces = [font.render(line, True, color, (0, 0, 0)) for line in lines]
+        rects = []
+        y = surface.get_height() - margin - sum(text.get_height() for text in self._hud_surfaces)
+        for text in self._hud_surfaces:
+            rects.append(surface.blit(text, (surface.get_width() - margin - text.get_width(), y)))
+            y += text.get_height()
+        return rects
+
+    def export(self, path):
+        """
+        Write the kept frames to a CSV file (one row per frame, one column per
+        phase, in milliseconds) or a JSON file (percentiles and samples).
+
+        Raises:
+            ValueError: If the file name doesn't end in .csv or .json
+        """
+        path = Path(path)
+        names = list(self._samples)
+        columns = [self._ordered(self._samples[name]) * 1000 for name in names]
+        first_frame = self.frames - len(columns[0])
+        suffix = path.suffix.lower()
+
+        if suffix == '.csv':
+            with open(path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['frame'] + [f"{name}_ms" for name in names if name != FRAME]
+                                + [f"{FRAME}_ms"])
+                order = [index for index, name in enumerate(names) if name != FRAME] + [names.index(FRAME)]
+                for row in range(len(columns[0])):
+                    values = [columns[index][row] for index in order]
+                    writer.writerow([first_frame + row] + ['' if np.isnan(value) else f"{value:.4f}"
+                                                           for value in values])
+        elif suffix == '.json':
+            report = {
+                'frames': self.frames,
+                'first_frame': first_frame,
+                'percentiles_ms': {
+                    name: dict(zip((f"p{percentile}" for percentile in PERCENTILES), values))
+                    for name, values in self.percentiles().items()
+                },
+                'samples_ms': {
+                    name: [None if np.isnan(value) else round(float(value), 4) for value in column]
+                    for name, column in zip(names, columns)
+                },
+            }
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=2)
+        else:
+            raise ValueError("The profile output must be a .csv or .json file")
+
+    def close(self):
+        """Print the percentiles and write the output file, if any."""
+        if not self.enabled or not self.frames:
+            return
+        print(f"{'phase':<12} " + " ".join(f"{f'p{percentile} ms':>8}" for percentile in PERCENTILES)
+              + f"   over the last {min(self.frames, self.history)} frames")
+        for name, values in self.percentiles().items():
+            print(f"{name:<12} " + " ".join(f"{value:>8.2f}" for value in values))
+        if self.output:
+            self.export(self.output)
+            print(f"Frame timings written to {self.output}")
@@ -0,0 +1,247 @@
+"""
+Batched engine for balls bouncing inside spinning polygons, after
+spinning-hexagon-physics.py.
+
+The polygons (centers, sizes, side counts, angles and spin) and the balls
+(positions, velocities, radii and the polygon each one is in) live in flat
+NumPy arrays. Every step rotates all polygons, integrates all balls and
+then tests every ball against every side of its polygon in one vectorized
+pass: closest points, penetration depths and wall normals are computed as
+(N, S) arrays for N balls in polygons of up to S sides, with no Python loop
+per ball or per side.
+
+Units are those of the demo: pixels and one step per frame, with rotation
+speeds in degrees per step. The physics follow Ball.update and
+Ball.collide_with_segment: gravity, then friction, then integration, then a
+bounce off every side a ball touches, reflecting its velocity about the
+wall normal, scaling it by the elasticity and pushing the ball clear of the
+wall. Three things differ: a ball touching two sides at once (in a corner)
+is pushed out of both and reflected about their average normal, a ball
+already moving away from a wall is not reflected back into it, and a ball
+whose center got past a wall in one step is pushed back inside rather than
+further out, so no ball can leave its polygon. Balls don't collide with
+each other.
+
+Like the demo, the engine treats the walls as standing still when a ball
+bounces off them by default. With moving_walls, the ball bounces relative
+to the wall, which moves with the spin of its polygon, so a spinning
+polygon throws its balls around.
+
+bounce_in_polygon_frame() is the same moving-wall bounce for one ball,
+worked out in the polygon's rotating frame, where the sides stand still
+and never have to be rebuilt. The demos use it for their rotating
+collision mode.
+"""
+
+import math
+from functools import lru_cache
+
+import numpy as np
+
+
+GRAVITY = (0.0, 0.2)  # Pixels per step squared, y pointing down
+FRICTION = 0.99  # Velocity kept per step
+ELASTICITY = 0.8  # Velocity kept when bouncing off a wall
+WALL_CLEARANCE = 0.1  # Extra distance a ball is pushed away from a wall to avoid sticking
+
+
+def _per_polygon(values, count, dtype=float):
+    # One value per polygon, from either a sequence or a single value for all of them
+    return np.broadcast_to(np.asarray(values, dtype=dtype), (count,)).copy()
+
+
+class PolygonEngine:
+    """Balls bouncing inside spinning regular polygons, stored as arrays."""
+
+    def __init__(self, centers, sizes, sides=6, rotation_speeds=0.5, angles=0.0,
+                 gravity=GRAVITY, friction=FRICTION, elasticity=ELASTICITY, moving_walls=False):
+        """
+        centers is (M, 2). sizes (center-to-vertex distances), sides,
+        rotation_speeds (degrees per step) and angles (degrees) are either
+        one value per polygon or one value for all of them. moving_walls
+        adds the speed of the spinning wall to every bounce.
+        """
+        self.polygon_centers = np.array(centers, dtype=float).reshape(-1, 2)
+        polygon_count = len(self.polygon_centers)
+        self.polygon_sizes = _per_polygon(sizes, polygon_count)
+        self.polygon_sides = _per_polygon(sides, polygon_count, np.intp)
+        self.polygon_rotation_speeds = _per_polygon(rotation_speeds, polygon_count)
+        self.polygon_angles = _per_polygon(angles, polygon_count)
+        if (self.polygon_sides < 3).any():
+            raise ValueError("Polygons need at least 3 sides")
+        self.gravity = np.array(gravity, dtype=float)
+        self.friction = friction
+        self.elasticity = elasticity
+        self.moving_walls = moving_walls
+
+        # Vertex k of a polygon sits at its angle + k * 360 / sides; polygons
+        # with fewer sides than the largest one are padded with masked sides
+        corners = np.arange(self.polygon_sides.max() if polygon_count else 0)
+        sides_column = self.polygon_sides[:, None]
+        self._vertex_angles = corners * 360.0 / sides_column
+        self._next_vertex = (corners + 1) % sides_column
+        self._real_sides = corners < sides_column
+
+        self.positions = np.empty((0, 2))
+        self.velocities = np.empty((0, 2))
+        self.radii = np.empty(0)
+        self.polygons = np.empty(0, dtype=np.intp)  # Polygon index of each ball
+
+        self.contacts = 0  # Ball-side contacts in the last step
+
+    @property
+    def count(self):
+        return len(self.radii)
+
+    def add_balls(self, positions, velocities, radii, polygons=0):
+        """Add balls; radii and polygons are one value per ball or one for all of them."""
+        positions = np.array(positions, dtype=float).reshape(-1, 2)
+        count = len(positions)
+        self.positions = np.concatenate([self.positions, positions])
+        self.velocities = np.concatenate([self.velocities, np.array(velocities, dtype=float).reshape(-1, 2)])
+        self.radii = np.concatenate([self.radii, _per_polygon(radii, count)])
+        self.polygons = np.concatenate([self.polygons, _per_polygon(polygons, count, np.intp)])
+
+    def vertices(self):
+        """Return the (M, S, 2) vertices of all polygons; only the first sides of each row are real."""
+        angles = np.radians(self.polygon_angles[:, None] + self._vertex_angles)
+        return self.polygon_centers[:, None, :] + self.polygon_sizes[:, None, None] * np.stack(
+            [np.cos(angles), np.sin(angles)], axis=-1)
+
+    def polygon_points(self, index):
+        """Return the vertices of one polygon as a list of (x, y) tuples, for drawing."""
+        return [tuple(point) for point in self.vertices()[index, :self.polygon_sides[index]]]
+
+    def step(self):
+        """Advance every polygon and ball by one step and bounce the balls off the walls."""
+        self.advance()
+        self.collide()
+
+    def advance(self):
+        """Rotate the polygons and move the balls, without collisions."""
+        self.polygon_angles += self.polygon_rotation_speeds
+        self.velocities += self.gravity
+        self.velocities *= self.friction
+        self.positions += self.velocities
+
+    def collide(self):
+        """Bounce every ball off the sides of its polygon that it touches."""
+        self.contacts = 0
+        if not self.count:
+            return
+
+        # Sides of every polygon: start points, directions and unit normals.
+        # The vertices go counterclockwise, so the left normals point inwards.
+        starts = self.vertices()
+        walls = np.take_along_axis(starts, self._next_vertex[:, :, None], axis=1) - starts
+        squared_lengths = np.einsum('msi,msi->ms', walls, walls)
+        normals = np.stack([-walls[..., 1], walls[..., 0]], axis=-1) / np.sqrt(squared_lengths)[..., None]
+
+        # Closest point on every side of its polygon to every ball, as (N, S) arrays
+        polygons = self.polygons
+        to_balls = self.positions[:, None, :] - starts[polygons]
+        walls = walls[polygons]
+        normals = normals[polygons]
+        along = np.clip(np.einsum('nsi,nsi->ns', to_balls, walls) / squared_lengths[polygons], 0.0, 1.0)
+        offsets = to_balls - walls * along[..., None]
+        distances = np.sqrt(np.einsum('nsi,nsi->ns', offsets, offsets))
+        # Negative where the center is outside the side
+        inside = np.einsum('nsi,nsi->ns', to_balls, normals)
+        touching = self._real_sides[polygons] & ((distances <= self.radii[:, None]) | (inside < 0))
+        self.contacts = int(np.count_nonzero(touching))
+        if not self.contacts:
+            return
+
+        # Only the balls touching a wall from here on, with zero normals for the sides they don't touch
+        hit = np.flatnonzero(touching.any(axis=1))
+        touching = touching[hit]
+        normals = normals[hit] * touching[..., None]
+
+        # Push the ball clear of every side it touches
+        depths = self.radii[hit, None] - np.where(inside[hit] < 0, inside[hit], distances[hit]) + WALL_CLEARANCE
+        self.positions[hit] += np.einsum('nsi,ns->ni', normals, depths * touching)
+
+        # Velocity of the wall where the ball touches it: the spin times the arm from the center
+        wall_velocities = np.zeros((len(hit), 2))
+        if self.moving_walls:
+            arms = self.positions[hit] - self.polygon_centers[polygons[hit]]
+            spin = np.radians(self.polygon_rotation_speeds[polygons[hit]])
+            wall_velocities = spin[:, None] * np.stack([-arms[:, 1], arms[:, 0]], axis=1)
+
+        # Reflect the velocity relative to the wall about the (average) normal if the ball moves into the wall
+        normal = normals.sum(axis=1)
+        normal /= np.maximum(np.linalg.norm(normal, axis=1, keepdims=True), 1e-12)
+        velocities = self.velocities[hit] - wall_velocities
+        approach = np.einsum('ni,ni->n', velocities, normal)
+        into_wall = approach < 0
+        reflected = velocities[into_wall] - 2 * approach[into_wall, None] * normal[into_wall]
+        self.velocities[hit[into_wall]] = reflected * self.elasticity + wall_velocities[into_wall]
+
+
+@lru_cache(maxsize=None)
+def _side_normals(sides):
+    # Inward unit normals of the sides of a polygon at angle 0, whose first
+    # vertex lies on the x axis, so side k faces the angle (k + 1/2) * 360 / sides
+    side_angles = (np.arange(sides) + 0.5) * 2 * np.pi / sides
+    return -np.column_stack([np.cos(side_angles), np.sin(side_angles)])
+
+
+def bounce_in_polygon_frame(position, velocity, radius, center, size, angle, rotation_speed, sides=6,
+                            elasticity=ELASTICITY, clearance=WALL_CLEARANCE):
+    """
+    Bounce one ball off every side of a spinning regular polygon that it touches.
+
+    The ball is turned into the polygon's rotating frame with its velocity
+    taken relative to the moving wall. There it is reflected off each side
+    it touches (if it moves into that side), scaled by the elasticity, and
+    pushed clear of the side by clearance. Turning back, the ball picks up
+    the speed of the wall at its new position.
+
+    Args:
+        position, velocity: The ball's (2,) position and velocity in pixels and pixels per step
+        radius (float): The ball's radius
+        center (tuple): Center of the polygon
+        size (float): Distance from the center to a vertex
+        angle (float): Rotation of the polygon in degrees
+        rotation_speed (float): Spin of the polygon in degrees per step
+        sides (int): Number of sides
+        elasticity (float): Velocity kept when bouncing off a wall
+        clearance (float): Extra distance the ball is pushed away from a wall
+
+    Returns:
+        tuple: (position, velocity, whether the ball touched a side); the
+            inputs are returned unchanged if it didn't
+    """
+    radians = math.radians(angle)
+    cos_angle, sin_angle = math.cos(radians), math.sin(radians)
+    spin = math.radians(rotation_speed)  # Radians per step
+    normals = _side_normals(sides)
+
+    # Position and velocity relative to the moving wall, turned into the polygon's frame
+    offset = position - center
+    relative_vel = velocity - spin * np.array([-offset[1], offset[0]])
+    local_pos = np.array([cos_angle * offset[0] + sin_angle * offset[1],
+                          -sin_angle * offset[0] + cos_angle * offset[1]])
+    local_vel = np.array([cos_angle * relative_vel[0] + sin_angle * relative_vel[1],
+                          -sin_angle * relative_vel[0] + cos_angle * relative_vel[1]])
+
+    # Distance from the center of the ball to every side, negative outside
+    distances = size * math.cos(math.pi / sides) + normals @ local_pos
+    touching = np.flatnonzero(distances <= radius)
+    if not len(touching):
+        return position, velocity, False
+
+    for side in touching:
+        wall_normal = normals[side]
+        approach = np.dot(local_vel, wall_normal)
+        if approach < 0:
+            local_vel = (local_vel - 2 * approach * wall_normal) * elasticity
+        local_pos = local_pos + wall_normal * (radius - distances[side] + clearance)
+
+    # Back to the screen, adding the speed of the wall at the ball's new position
+    offset = np.array([cos_angle * local_pos[0] - sin_angle * local_pos[1],
+                       sin_angle * local_pos[0] + cos_angle * local_pos[1]])
+    velocity = np.array([cos_angle * local_vel[0] - sin_angle * local_vel[1],
+                         sin_angle * local_vel[0] + cos_angle * local_vel[1]])
+    velocity += spin * np.array([-offset[1], offset[0]])
+    return center + offset, velocity, True
@@ -6,21 +6,42 @@ A simple utility to convert PDF files to Base64 encoded strings.
 """
 
 import base64
+import binascii
 import argparse
+import glob
+import hashlib
+import mmap
 import os
+import shutil
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 
-def convert_pdf_to_base64(file_path):
+# Read size for streaming mode. It must be a multiple of 3 so that every
+# block encodes to complete base64 quanta with no padding in the middle.
+DEFAULT_CHUNK_SIZE = 3 * 256 * 1024
+
+# Default size cap for the on-disk encode cache
+DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Output formats: one unbroken line, RFC 2045 lines, a data URI or a JSON string
+OUTPUT_FORMATS = ('raw', 'mime', 'data-uri', 'json')
+MIME_LINE_LENGTH = 76
+DATA_URI_PREFIX = b'data:application/pdf;base64,'
+
+
+def _check_pdf_path(file_path):
     """
-    Convert a PDF file to a Base64 encoded string.
+    Validate that a path points to an existing PDF file.
     
     Args:
         file_path (str): Path to the PDF file
         
     Returns:
-        str: Base64 encoded string of the PDF file
+        Path: The validated path
     
     Raises:
         FileNotFoundError: If the file doesn't exist
@@ -36,24 +57,542 @@ def convert_pdf_to_base64(file_path):
     if file_path.suffix.lower() != '.pdf':
         raise ValueError(f"The file {file_path} is not a PDF file.")
     
+    return file_path
+
+
+def _map_file(file):
+    """Map an open file read-only, hinting the kernel that access is sequential."""
+    mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapping, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mapping.madvise(mmap.MADV_SEQUENTIAL)
+    return mapping
+
+
+def convert_pdf_to_base64(file_path, use_mmap=False, cache=None):
+    """
+    Convert a PDF file to a Base64 encoded string.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        use_mmap (bool): Encode straight from a memory mapping of the file
+            instead of reading it into a bytes object first
+        cache (EncodeCache, optional): Serve repeated encodes from this cache
+        
+    Returns:
+        str: Base64 encoded string of the PDF file
+    
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If the file is not a PDF file
+    """
+    file_path = _check_pdf_path(file_path)
+    
+    if cache is not None:
+        return cache.path_for(file_path, use_mmap=use_mmap).read_text()
+    
     # Read the file in binary mode and encode it
     with open(file_path, 'rb') as file:
+        # Empty files can't be mapped
+        if use_mmap and os.fstat(file.fileno()).st_size:
+            with _map_file(file) as mapping:
+                return binascii.b2a_base64(mapping, newline=False).decode('utf-8')
+        
         pdf_data = file.read()
         base64_data = base64.b64encode(pdf_data).decode('utf-8')
         
     return base64_data
 
 
+def iter_pdf_base64_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, use_mmap=False):
+    """
+    Encode a PDF file to Base64 incrementally.
+    
+    The file is read in blocks of ``chunk_size`` bytes, so memory use stays
+    flat no matter how large the PDF is. Joining the yielded chunks gives
+    exactly the output of ``convert_pdf_to_base64``.
+    
+    With ``use_mmap`` the blocks are ``memoryview`` slices of a read-only
+    mapping, so they are encoded straight from the page cache without
+    being copied into Python objects first.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        chunk_size (int): Bytes to read per block, must be a multiple of 3
+        use_mmap (bool): Encode from a memory mapping of the file
+        
+    Yields:
+        bytes: ASCII Base64 encoded chunks
+    
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If the file is not a PDF file or chunk_size is invalid
+    """
+    if chunk_size <= 0 or chunk_size % 3:
+        raise ValueError("chunk_size must be a positive multiple of 3.")
+    
+    file_path = _check_pdf_path(file_path)
+    
+    with open(file_path, 'rb') as file:
+        if use_mmap and os.fstat(file.fileno()).st_size:
+            yield from _iter_mapped_chunks(file, chunk_size)
+            return
+        
+        while True:
+            block = file.read(chunk_size)
+            if not block:
+                break
+            yield binascii.b2a_base64(block, newline=False)
+
+
+def _iter_mapped_chunks(file, chunk_size):
+    # Pages already encoded are dropped from this process as we go, so its
+    # RSS does not grow with the file size. They stay in the page cache.
+    can_release = hasattr(mmap, 'MADV_DONTNEED')
+    with _map_file(file) as mapping:
+        view = memoryview(mapping)
+        released = 0
+        try:
+            for offset in range(0, len(view), chunk_size):
+                yield binascii.b2a_base64(view[offset:offset + chunk_size], newline=False)
+                
+                done = min(offset + chunk_size, len(view))
+                done -= done % mmap.PAGESIZE
+                if can_release and done > released:
+                    mapping.madvise(mmap.MADV_DONTNEED, released, done - released)
+                    released = done
+        finally:
+            # The mapping can only be closed once no views of it remain
+            view.release()
+
+
+def format_base64_chunks(chunks, output_format='raw'):
+    """
+    Apply an output format to a stream of Base64 chunks.
+    
+    The formatting is done chunk by chunk, so the formatted text is never
+    built up in memory as a whole.
+    
+    Args:
+        chunks (iterable): Base64 encoded ``bytes`` chunks
+        output_format (str): One of ``OUTPUT_FORMATS``: ``raw`` passes the
+            chunks through, ``mime`` wraps lines at 76 characters with CRLF
+            (RFC 2045), ``data-uri`` adds a ``data:application/pdf;base64,``
+            prefix and ``json`` quotes the text as a JSON string
+        
+    Yields:
+        bytes: Formatted chunks
+    
+    Raises:
+        ValueError: If the output format is unknown
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}.")
+    
+    if output_format == 'data-uri':
+        yield DATA_URI_PREFIX
+    elif output_format == 'json':
+        # Base64 needs no escaping inside a JSON string
+        yield b'"'
+    
+    if output_format != 'mime':
+        yield from chunks
+    else:
+        carry = b''
+        for chunk in chunks:
+            text = carry + chunk if carry else chunk
+            full = len(text) - len(text) % MIME_LINE_LENGTH
+            if full:
+                yield b'\r\n'.join([text[i:i + MIME_LINE_LENGTH] for i in range(0, full, MIME_LINE_LENGTH)]) + b'\r\n'
+            carry = text[full:]
+        if carry:
+            yield carry + b'\r\n'
+    
+    if output_format == 'json':
+        yield b'"'
+
+
+def _iter_file_chunks(file_path, chunk_size):
+    with open(file_path, 'rb') as file:
+        while True:
+            block = file.read(chunk_size)
+            if not block:
+                break
+            yield block
+
+
+def stream_pdf_to_base64(file_path, output_stream, chunk_size=DEFAULT_CHUNK_SIZE, use_mmap=False,
+                         cache=None, output_format='raw'):
+    """
+    Encode a PDF file to Base64 and write it to a binary stream as it goes.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        output_stream: Binary file-like object to write the encoded text to
+        chunk_size (int): Bytes to read per block, must be a multiple of 3
+        use_mmap (bool): Encode from a memory mapping of the file
+        cache (EncodeCache, optional): Serve repeated encodes from this cache
+        output_format (str): One of ``OUTPUT_FORMATS``, see ``format_base64_chunks``
+        
+    Returns:
+        int: Number of characters written
+    
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If the file is not a PDF file, chunk_size is invalid or
+            the output format is unknown
+    """
+    if cache is not None:
+        # The cache holds raw encodings; formats are applied on the way out
+        entry = cache.path_for(file_path, chunk_size, use_mmap)
+        if output_format == 'raw':
+            with open(entry, 'rb') as cached:
+                shutil.copyfileobj(cached, output_stream, chunk_size)
+            return entry.stat().st_size
+        chunks = _iter_file_chunks(entry, chunk_size)
+    else:
+        chunks = iter_pdf_base64_chunks(file_path, chunk_size, use_mmap)
+    
+    written = 0
+    for chunk in format_base64_chunks(chunks, output_format):
+        output_stream.write(chunk)
+        written += len(chunk)
+    return written
+
+
+class EncodeCache:
+    """
+    On-disk cache of Base64 encodings, keyed by the SHA-256 of the PDF content.
+    
+    A lookup first tries a key built from the file's resolved path, size and
+    modification time, so an unchanged file is found without being read.
+    Only when that key is unknown is the content hashed, which still finds
+    copies of the same PDF under other names. Entries are evicted least
+    recently used first once the cache grows beyond ``max_bytes``.
+    
+    Layout: ``objects/<sha256>.b64`` holds an encoding and ``keys/<id>``
+    holds the content hash for one (path, size, mtime) key. Eviction also
+    removes the keys of evicted objects and keys unused since the oldest
+    object kept. Every file is written atomically, so several processes can
+    share one cache directory.
+    """
+    
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._objects = self.cache_dir / 'objects'
+        self._keys = self.cache_dir / 'keys'
+        self._objects.mkdir(parents=True, exist_ok=True)
+        self._keys.mkdir(parents=True, exist_ok=True)
+        self._total_bytes = sum(entry.stat().st_size for entry in self._objects.glob('*.b64'))
+    
+    def path_for(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE, use_mmap=False):
+        """
+        Return the cached encoding of a PDF file, encoding it on a miss.
+        
+        Args:
+            file_path (str): Path to the PDF file
+            chunk_size (int): Bytes to read per block when encoding
+            use_mmap (bool): Encode from a memory mapping of the file
+            
+        Returns:
+            Path: File holding the Base64 encoding of the PDF
+        
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            ValueError: If the file is not a PDF file
+        """
+        file_path = _check_pdf_path(file_path)
+        stat = file_path.stat()
+        stat_key = f"{file_path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+        key_path = self._keys / hashlib.sha1(stat_key.encode('utf-8')).hexdigest()
+        
+        try:
+            digest = key_path.read_text()
+            # Keys that go unused are dropped on eviction
+            os.utime(key_path)
+        except FileNotFoundError:
+            digest = self._hash_file(file_path)
+            self._write_atomic(key_path, digest.encode('ascii'))
+        
+        entry = self._objects / f"{digest}.b64"
+        try:
+            # Refresh the modification time, which is the LRU order
+            os.utime(entry)
+            self.hits += 1
+            return entry
+        except FileNotFoundError:
+            pass
+        
+        self.misses += 1
+        with tempfile.NamedTemporaryFile(dir=self._objects, suffix='.tmp', delete=False) as temp_file:
+            try:
+                stream_pdf_to_base64(file_path, temp_file, chunk_size, use_mmap)
+            except BaseException:
+                temp_file.close()
+                os.unlink(temp_file.name)
+                raise
+        os.replace(temp_file.name, entry)
+        self._total_bytes += entry.stat().st_size
+        self._evict(keep=entry)
+        return entry
+    
+    def _evict(self, keep):
+        if self._total_bytes <= self.max_bytes:
+            return
+        
+        # Rescan, since other processes may share the directory
+        entries = []
+        for entry in self._objects.glob('*.b64'):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+        entries.sort()
+        
+        self._total_bytes = sum(size for _, size, _ in entries)
+        kept = []
+        for mtime_ns, size, entry in entries:
+            if self._total_bytes <= self.max_bytes or entry == keep:
+                kept.append((mtime_ns, entry))
+                continue
+            entry.unlink(missing_ok=True)
+            self._total_bytes -= size
+        self._evict_keys(kept)
+    
+    def _evict_keys(self, kept):
+        # Every changed size or mtime of a file leaves a key behind; drop the
+        # keys not used since the oldest object still kept, and the keys of
+        # objects that are gone
+        oldest = min((mtime_ns for mtime_ns, _ in kept), default=float('inf'))
+        digests = {entry.stem for _, entry in kept}
+        for key_path in self._keys.iterdir():
+            if key_path.suffix == '.tmp':
+                continue
+            try:
+                if key_path.stat().st_mtime_ns >= oldest and key_path.read_text() in digests:
+                    continue
+            except FileNotFoundError:
+                continue
+            key_path.unlink(missing_ok=True)
+    
+    @staticmethod
+    def _hash_file(file_path):
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _write_atomic(path, data):
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as temp_file:
+            temp_file.write(data)
+        os.replace(temp_file.name, path)
+    
+    def stats(self):
+        """Return a one-line summary of the hit and miss counters."""
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return f"Cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+
+def expand_pdf_inputs(inputs):
+    """
+    Expand files, glob patterns and directories into a list of PDF files.
+    
+    Args:
+        inputs (list): Paths, glob patterns or directories
+        
+    Returns:
+        list: ``(pdf_path, relative_output_name)`` tuples. Files found in a
+        directory keep their sub-path below it, and glob matches their
+        sub-path below the part of the pattern without wildcards, so that
+        outputs don't collide.
+    """
+    pdf_files = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            for pdf_path in sorted(path.rglob('*')):
+                if pdf_path.is_file() and pdf_path.suffix.lower() == '.pdf':
+                    pdf_files.append((pdf_path, pdf_path.relative_to(path)))
+        elif glob.has_magic(item):
+            parts = path.parts
+            fixed = next(index for index, part in enumerate(parts) if glob.has_magic(part))
+            prefix = Path(*parts[:fixed])
+            for match in sorted(glob.glob(item, recursive=True)):
+                pdf_files.append((Path(match), Path(match).relative_to(prefix)))
+        else:
+            # Missing or non-PDF files are reported by the conversion itself
+            pdf_files.append((path, Path(path.name)))
+    return pdf_files
+
+
+def _batch_output_path(pdf_path, relative_name, output_dir):
+    if output_dir is None:
+        return pdf_path.with_suffix('.b64')
+    return Path(output_dir) / relative_name.with_suffix('.b64')
+
+
+# Cache of the current batch worker process, set up by _init_worker
+_worker_cache = None
+
+
+def _init_worker(cache_dir, cache_max_bytes):
+    global _worker_cache
+    if cache_dir is not None:
+        _worker_cache = EncodeCache(cache_dir, cache_max_bytes)
+
+
+def _convert_to_file(pdf_path, output_path, chunk_size, use_mmap, output_format):
+    # Runs in a worker process, so it only takes and returns picklable values
+    pdf_path = _check_pdf_path(pdf_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    hits_before = _worker_cache.hits if _worker_cache is not None else 0
+    try:
+        with open(output_path, 'wb') as output_file:
+            stream_pdf_to_base64(pdf_path, output_file, chunk_size, use_mmap, _worker_cache, output_format)
+    except BaseException:
+        # Don't leave a truncated output behind
+        output_path.unlink(missing_ok=True)
+        raise
+    cache_hit = _worker_cache.hits > hits_before if _worker_cache is not None else None
+    return pdf_path.stat().st_size, cache_hit
+
+
+def convert_batch(pdf_files, output_dir=None, jobs=None, chunk_size=DEFAULT_CHUNK_SIZE, use_mmap=False,
+                  cache_dir=None, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, output_format='raw'):
+    """
+    Convert many PDF files to Base64 files in parallel.
+    
+    Each output is written next to its input, or into ``output_dir``, with
+    a ``.b64`` suffix. A failing file is reported and skipped; the rest of
+    the batch carries on. So is a file whose output path was already taken
+    by an earlier file of the batch, rather than overwriting it.
+    
+    Args:
+        pdf_files (list): ``(pdf_path, relative_output_name)`` tuples from ``expand_pdf_inputs``
+        output_dir (str, optional): Directory for the outputs
+        jobs (int, optional): Number of worker processes (default: CPU count)
+        chunk_size (int): Bytes to read per block
+        use_mmap (bool): Encode from memory mappings of the files
+        cache_dir (str, optional): Directory of an ``EncodeCache`` shared by the workers
+        cache_max_bytes (int): Size cap of the cache
+        output_format (str): One of ``OUTPUT_FORMATS``
+        
+    Returns:
+        tuple: ``(converted, failures, bytes_read, cache_hits)`` where failures is
+        a list of ``(pdf_path, error message)`` tuples
+    """
+    converted = 0
+    failures = []
+    bytes_read = 0
+    cache_hits = 0
+    
+    # Two files writing the same output at once would lose one of them
+    jobs_to_run = []
+    output_owners = {}
+    for pdf_path, relative_name in pdf_files:
+        output_path = _batch_output_path(pdf_path, relative_name, output_dir)
+        output_key = output_path.resolve()
+        if output_key in output_owners:
+            message = f"output {output_path} is already written for {output_owners[output_key]}"
+            failures.append((pdf_path, message))
+            print(f"Error: {pdf_path}: {message}", file=sys.stderr)
+            continue
+        output_owners[output_key] = pdf_path
+        jobs_to_run.append((pdf_path, output_path))
+    
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(cache_dir, cache_max_bytes)) as executor:
+        futures = {
+            executor.submit(_convert_to_file, pdf_path, output_path, chunk_size, use_mmap,
+                            output_format): pdf_path
+            for pdf_path, output_path in jobs_to_run
+        }
+        for future in as_completed(futures):
+            pdf_path = futures[future]
+            try:
+                size, cache_hit = future.result()
+                bytes_read += size
+                cache_hits += bool(cache_hit)
+                converted += 1
+            except Exception as e:
+                failures.append((pdf_path, str(e)))
+                print(f"Error: {pdf_path}: {str(e)}", file=sys.stderr)
+    
+    return converted, failures, bytes_read, cache_hits
+
+
 def main():
     """Main function to handle command-line arguments and convert PDFs to base64."""
     parser = argparse.ArgumentParser(description='Convert a PDF file to Base64 encoded string.')
-    parser.add_argument('pdf_path', help='Path to the PDF file')
+    parser.add_argument('pdf_paths', nargs='+', metavar='pdf_path',
+                        help='Path to the PDF file. Several files, glob patterns or directories '
+                             'switch to batch mode.')
     parser.add_argument('-o', '--output', help='Output file to save base64 string (optional)')
+    parser.add_argument('--output-dir',
+                        help='Batch mode: directory for the .b64 outputs (default: next to each input)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Batch mode: number of worker processes (default: CPU count)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Encode in fixed-size blocks and write output as it is produced '
+                             '(constant memory, raw output on stdout)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Read size in bytes for --stream, a multiple of 3 (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--mmap', action='store_true',
+                        help='Encode from a memory mapping of the input instead of reading it into memory')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='raw',
+                        help='Output format: raw (default), mime (76-column CRLF lines), data-uri or json '
+                             '(anything but raw implies --stream)')
+    parser.add_argument('--cache-dir',
+                        help='Serve repeated encodes of the same PDF from an on-disk cache in this directory')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_CACHE_MAX_BYTES / (1024 * 1024),
+                        help='Size cap of the cache in MB; least recently used entries are evicted '
+                             f'(default: {DEFAULT_CACHE_MAX_BYTES // (1024 * 1024)})')
     
     args = parser.parse_args()
     
+    batch = (len(args.pdf_paths) > 1 or args.output_dir is not None
+             or Path(args.pdf_paths[0]).is_dir() or glob.has_magic(args.pdf_paths[0]))
+    if batch:
+        if args.output:
+            parser.error('-o/--output takes a single input; use --output-dir in batch mode')
+        run_batch(args)
+        return
+    args.pdf_path = args.pdf_paths[0]
+    if args.format != 'raw':
+        # Formats are applied while streaming, never on a full in-memory copy
+        args.stream = True
+    
     try:
-        base64_string = convert_pdf_to_base64(args.pdf_path)
+        cache = None
+        if args.cache_dir:
+            cache = EncodeCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
+        
+        if args.stream:
+            if args.output:
+                with open(args.output, 'wb') as output_file:
+                    stream_pdf_to_base64(args.pdf_path, output_file, args.chunk_size, args.mmap, cache,
+                                         args.format)
+                print(f"Base64 string saved to {args.output}")
+                if cache is not None:
+                    print(cache.stats())
+            else:
+                # Raw output only, so the result can be piped to another tool
+                stream_pdf_to_base64(args.pdf_path, sys.stdout.buffer, args.chunk_size, args.mmap, cache,
+                                     args.format)
+                if args.format != 'mime':
+                    sys.stdout.buffer.write(b'\n')
+                sys.stdout.flush()
+                if cache is not None:
+                    print(cache.stats(), file=sys.stderr)
+            return
+        
+        base64_string = convert_pdf_to_base64(args.pdf_path, args.mmap, cache)
         
         if args.output:
             # Save to output file
@@ -66,11 +605,36 @@ def main():
             print("-" * 40)
             print(base64_string)
             print("-" * 40)
+        
+        if cache is not None:
+            print(cache.stats())
             
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
 
 
+def run_batch(args):
+    """Convert every input in batch mode and print a throughput summary."""
+    pdf_files = expand_pdf_inputs(args.pdf_paths)
+    if not pdf_files:
+        print("Error: no PDF files found.", file=sys.stderr)
+        sys.exit(1)
+    
+    start = time.perf_counter()
+    converted, failures, bytes_read, cache_hits = convert_batch(
+        pdf_files, args.output_dir, args.jobs, args.chunk_size, args.mmap,
+        args.cache_dir, int(args.cache_max_mb * 1024 * 1024), args.format)
+    elapsed = time.perf_counter() - start
+    
+    print(f"Converted {converted} of {len(pdf_files)} files in {elapsed:.2f}s "
+          f"({converted / elapsed:.1f} files/s, {bytes_read / elapsed / (1024 * 1024):.1f} MB/s)")
+    if args.cache_dir:
+        print(f"Cache: {cache_hits} hits, {converted - cache_hits} misses")
+    if failures:
+        print(f"Failed to convert {len(failures)} file(s)", file=sys.stderr)
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
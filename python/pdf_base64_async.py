@@ -0,0 +1,134 @@
+"""
+Async PDF/Base64 Conversion
+
+asyncio versions of the converters in pdf-to-base64.py and base64-to-pdf.py.
+File I/O and the encoding work run in an executor one chunk at a time, so the
+event loop stays responsive, and the async iterators only read the next chunk
+when the consumer asks for it, which gives natural backpressure.
+"""
+
+import asyncio
+import binascii
+from pathlib import Path
+
+from script_utils import load_script
+
+
+# The converters live in hyphenated scripts, which can't be imported by name
+_encoder = load_script('pdf-to-base64.py')
+_decoder = load_script('base64-to-pdf.py')
+
+ENCODE_CHUNK_SIZE = _encoder.DEFAULT_CHUNK_SIZE
+DECODE_CHUNK_SIZE = _decoder.DEFAULT_CHUNK_SIZE
+
+
+def _read_and_encode(file, chunk_size):
+    block = file.read(chunk_size)
+    return binascii.b2a_base64(block, newline=False) if block else b''
+
+
+def _decode_and_write(decoder, file, chunk):
+    # None marks the end of the input
+    data = decoder.finish() if chunk is None else decoder.decode(chunk)
+    file.write(data)
+    return len(data)
+
+
+async def aiter_pdf_base64_chunks(file_path, chunk_size=ENCODE_CHUNK_SIZE, executor=None):
+    """
+    Encode a PDF file to Base64 without blocking the event loop.
+
+    Args:
+        file_path (str): Path to the PDF file
+        chunk_size (int): Bytes to read per block, must be a multiple of 3
+        executor (Executor, optional): Executor for the blocking work
+            (default: the loop's default thread pool)
+
+    Yields:
+        bytes: ASCII Base64 encoded chunks, read on demand
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If the file is not a PDF file or chunk_size is invalid
+    """
+    if chunk_size <= 0 or chunk_size % 3:
+        raise ValueError("chunk_size must be a positive multiple of 3.")
+
+    loop = asyncio.get_running_loop()
+    file_path = await loop.run_in_executor(executor, _encoder._check_pdf_path, file_path)
+    file = await loop.run_in_executor(executor, open, file_path, 'rb')
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, _read_and_encode, file, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await loop.run_in_executor(executor, file.close)
+
+
+async def async_convert_pdf_to_base64(file_path, chunk_size=ENCODE_CHUNK_SIZE, executor=None):
+    """
+    Convert a PDF file to a Base64 encoded string without blocking the event loop.
+
+    Args:
+        file_path (str): Path to the PDF file
+        chunk_size (int): Bytes to read per block, must be a multiple of 3
+        executor (Executor, optional): Executor for the blocking work
+
+    Returns:
+        str: Base64 encoded string of the PDF file
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If the file is not a PDF file
+    """
+    chunks = [chunk async for chunk in aiter_pdf_base64_chunks(file_path, chunk_size, executor)]
+    return b''.join(chunks).decode('utf-8')
+
+
+async def _aiter_slices(text, chunk_size):
+    for offset in range(0, len(text), chunk_size):
+        yield text[offset:offset + chunk_size]
+
+
+async def async_convert_base64_to_pdf(source, output_path, chunk_size=DECODE_CHUNK_SIZE, executor=None):
+    """
+    Decode Base64 data to a PDF file without blocking the event loop.
+
+    The output is byte-identical to ``convert_base64_to_pdf``. Chunks are
+    pulled from ``source`` only as fast as they can be decoded and written.
+
+    Args:
+        source: Base64 ``str``/``bytes``, or an async iterable of chunks such
+            as ``aiter_pdf_base64_chunks`` or a network stream
+        output_path (str): Path where to save the PDF file
+        chunk_size (int): Characters per decode step when source is a string
+        executor (Executor, optional): Executor for the blocking work
+
+    Returns:
+        Path: The path of the written PDF file
+
+    Raises:
+        ValueError: If the base64 data is invalid
+    """
+    if isinstance(source, (str, bytes)):
+        source = _aiter_slices(source, chunk_size)
+
+    loop = asyncio.get_running_loop()
+    output_path = Path(output_path)
+    decoder = _decoder.Base64StreamDecoder()
+    file = await loop.run_in_executor(executor, open, output_path, 'wb')
+    try:
+        try:
+            async for chunk in source:
+                await loop.run_in_executor(executor, _decode_and_write, decoder, file, chunk)
+            await loop.run_in_executor(executor, _decode_and_write, decoder, file, None)
+        finally:
+            await loop.run_in_executor(executor, file.close)
+    except BaseException:
+        # Don't leave a truncated PDF behind
+        await loop.run_in_executor(executor, lambda: output_path.unlink(missing_ok=True))
+        raise
+
+    return output_path
@@ -1,58 +1,117 @@
+import argparse
 import pygame
 import sys
-import math
-import random
+import time
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import numpy as np
+from ball_engine import DEFAULT_MAX_SUBSTEPS
+from ball_parallel import ParallelBallEngine
+from ball_recording import COUNTERS, Recorder, Recording, load_snapshot, save_snapshot
+from ball_renderer import SpriteBallRenderer
+from ball_scenes import RADIUS_DISTRIBUTIONS, generate_scene
+from frame_profiler import FrameProfiler
 
-# Initialize pygame
-pygame.init()
-
-# Set up the display
+# Window size
 width, height = 800, 600
-pygame.display.set_mode((width, height), DOUBLEBUF | OPENGL)
-pygame.display.set_caption("3D Bouncing Balls on Rotating Spheres")
 
-# Set background color (dark blue)
-glClearColor(0.05, 0.05, 0.2, 1.0)
+# Fixed time step used when none is given on the command line in headless mode
+DEFAULT_DT = 1.0 / 60.0
 
-# Set up the perspective
-gluPerspective(45, (width / height), 0.1, 50.0)
-glTranslatef(0.0, 0.0, -20)  # Move further back to see more of the scene
-glEnable(GL_DEPTH_TEST)
+# Most fixed steps to run per frame before the simulation is allowed to fall behind
+MAX_STEPS_PER_FRAME = 8
 
-# Setup lighting
-glEnable(GL_LIGHTING)
-glEnable(GL_LIGHT0)
-glEnable(GL_COLOR_MATERIAL)
-glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
+# Frames kept when recording in a window: one minute at 60 steps per second
+DEFAULT_RECORD_CAPACITY = 3600
 
-# Light position and properties
-light_position = [10.0, 10.0, 10.0, 1.0]  # Positioned further away
-light_ambient = [0.4, 0.4, 0.4, 1.0]  # Brighter ambient light
-light_diffuse = [1.0, 1.0, 1.0, 1.0]  # Full brightness diffuse
-light_specular = [1.0, 1.0, 1.0, 1.0]
+def init_display():
+    # Initialize pygame
+    pygame.init()
+    
+    # Set up the display
+    pygame.display.set_mode((width, height), DOUBLEBUF | OPENGL)
+    pygame.display.set_caption("3D Bouncing Balls on Rotating Spheres")
+    setup_gl()
 
-glLightfv(GL_LIGHT0, GL_POSITION, light_position)
-glLightfv(GL_LIGHT0, GL_AMBIENT, light_ambient)
-glLightfv(GL_LIGHT0, GL_DIFFUSE, light_diffuse)
-glLightfv(GL_LIGHT0, GL_SPECULAR, light_specular)
+# Set up the camera, lights and materials in the current OpenGL context
+def setup_gl():
+    # Set background color (dark blue)
+    glClearColor(0.05, 0.05, 0.2, 1.0)
+    
+    # Set up the perspective
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    gluPerspective(45, (width / height), 0.1, 50.0)
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+    glTranslatef(0.0, 0.0, -20)  # Move further back to see more of the scene
+    glEnable(GL_DEPTH_TEST)
+    
+    # Setup lighting
+    glEnable(GL_LIGHTING)
+    glEnable(GL_LIGHT0)
+    glEnable(GL_COLOR_MATERIAL)
+    glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
+    glEnable(GL_RESCALE_NORMAL)  # Keep lighting right on the scaled, cached ball mesh
+    
+    # Light position and properties
+    light_position = [10.0, 10.0, 10.0, 1.0]  # Positioned further away
+    light_ambient = [0.4, 0.4, 0.4, 1.0]  # Brighter ambient light
+    light_diffuse = [1.0, 1.0, 1.0, 1.0]  # Full brightness diffuse
+    light_specular = [1.0, 1.0, 1.0, 1.0]
+    
+    glLightfv(GL_LIGHT0, GL_POSITION, light_position)
+    glLightfv(GL_LIGHT0, GL_AMBIENT, light_ambient)
+    glLightfv(GL_LIGHT0, GL_DIFFUSE, light_diffuse)
+    glLightfv(GL_LIGHT0, GL_SPECULAR, light_specular)
+    
+    # Material properties
+    material_specular = [1.0, 1.0, 1.0, 1.0]
+    material_shininess = [50.0]
+    glMaterialfv(GL_FRONT, GL_SPECULAR, material_specular)
+    glMaterialfv(GL_FRONT, GL_SHININESS, material_shininess)
 
-# Material properties
-material_specular = [1.0, 1.0, 1.0, 1.0]
-material_shininess = [50.0]
-glMaterialfv(GL_FRONT, GL_SPECULAR, material_specular)
-glMaterialfv(GL_FRONT, GL_SHININESS, material_shininess)
+# Builds each tessellated sphere once into a display list and replays it, instead of
+# creating a quadric and tessellating it again on every draw
+class MeshCache:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lists = {}  # (radius, slices, stacks, draw style) -> display list
+        self.draw_calls = 0  # Spheres drawn since the counter was last reset
+    
+    def draw_sphere(self, radius, slices, stacks, style=GLU_FILL):
+        self.draw_calls += 1
+        if not self.enabled:
+            self._tessellate(radius, slices, stacks, style)
+            return
+        
+        key = (radius, slices, stacks, style)
+        display_list = self.lists.get(key)
+        if display_list is None:
+            display_list = glGenLists(1)
+            glNewList(display_list, GL_COMPILE)
+            self._tessellate(radius, slices, stacks, style)
+            glEndList()
+            self.lists[key] = display_list
+        glCallList(display_list)
+    
+    def _tessellate(self, radius, slices, stacks, style):
+        sphere = gluNewQuadric()
+        gluQuadricNormals(sphere, GLU_SMOOTH)
+        gluQuadricDrawStyle(sphere, style)
+        gluSphere(sphere, radius, slices, stacks)
+        gluDeleteQuadric(sphere)
+    
+    def release(self):
+        for display_list in self.lists.values():
+            glDeleteLists(display_list, 1)
+        self.lists.clear()
 
 # Function to draw a sphere
-def draw_sphere(radius, slices, stacks, color):
+def draw_sphere(meshes, radius, slices, stacks, color):
     glColor3f(color[0], color[1], color[2])
-    sphere = gluNewQuadric()
-    gluQuadricNormals(sphere, GLU_SMOOTH)
-    gluSphere(sphere, radius, slices, stacks)
-    gluDeleteQuadric(sphere)
+    meshes.draw_sphere(radius, slices, stacks)
 
 # Class for the container sphere
 class ContainerSphere:
@@ -60,252 +119,553 @@ class ContainerSphere:
         self.radius = radius
         self.position = position  # [x, y, z]
         self.rotation_speed = rotation_speed  # [x_rot, y_rot, z_rot]
-        self.rotation = [0, 0, 0]  # Current rotation angles
         self.color = color
     
-    def update(self, dt):
-        # Update rotation
-        self.rotation[0] = (self.rotation[0] + self.rotation_speed[0] * dt) % 360
-        self.rotation[1] = (self.rotation[1] + self.rotation_speed[1] * dt) % 360
-        self.rotation[2] = (self.rotation[2] + self.rotation_speed[2] * dt) % 360
-    
-    def draw(self):
+    def draw(self, rotation, meshes):
         glPushMatrix()
         glTranslatef(self.position[0], self.position[1], self.position[2])
-        glRotatef(self.rotation[0], 1, 0, 0)
-        glRotatef(self.rotation[1], 0, 1, 0)
-        glRotatef(self.rotation[2], 0, 0, 1)
+        glRotatef(rotation[0], 1, 0, 0)
+        glRotatef(rotation[1], 0, 1, 0)
+        glRotatef(rotation[2], 0, 0, 1)
         
         # Draw the container sphere with visible lines
         glDisable(GL_LIGHTING)
         glColor3f(self.color[0], self.color[1], self.color[2])  # Solid color (no alpha)
         glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
-        sphere = gluNewQuadric()
-        gluQuadricDrawStyle(sphere, GLU_LINE)
-        gluSphere(sphere, self.radius, 24, 24)  # More detail
-        gluDeleteQuadric(sphere)
+        meshes.draw_sphere(self.radius, 24, 24, GLU_LINE)  # More detail
         glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
         glEnable(GL_LIGHTING)
         
         glPopMatrix()
 
-# Class for bouncing balls
-class Ball:
-    def __init__(self, radius, position, velocity, color, container):
-        self.radius = radius
-        self.position = np.array(position, dtype=float)
-        self.velocity = np.array(velocity, dtype=float)
-        self.color = color
-        self.container = container
-        self.mass = radius ** 3  # Mass proportional to volume
-        
-        # Ensure ball starts inside the container
-        distance = np.linalg.norm(self.position - np.array(container.position))
-        if distance + self.radius > container.radius:
-            # Adjust position to be inside container
-            direction = (self.position - np.array(container.position)) / distance
-            self.position = np.array(container.position) + direction * (container.radius - self.radius - 0.01)
-    
-    def update(self, dt, balls):
-        # Apply gravity (optional)
-        # self.velocity[1] -= 9.8 * dt  # Gravity in y-direction
-        
-        # Apply container rotation effect
-        # This is a simplified effect - in reality, would need full physics integration
-        container_rot_effect = np.array([
-            self.container.rotation_speed[1] * 0.01,
-            self.container.rotation_speed[0] * -0.01,
-            self.container.rotation_speed[2] * 0.01
-        ])
-        self.velocity += container_rot_effect * dt
-        
-        # Update position
-        self.position += self.velocity * dt
-        
-        # Check for collision with container
-        pos_relative = self.position - np.array(self.container.position)
-        distance = np.linalg.norm(pos_relative)
-        
-        if distance + self.radius > self.container.radius:
-            # Ball hit the container wall
-            normal = pos_relative / distance
-            
-            # Position correction (move ball inside)
-            penetration = distance + self.radius - self.container.radius
-            self.position -= normal * penetration * 1.01  # Move a bit more to avoid floating-point issues
-            
-            # Velocity reflection with damping
-            reflection = self.velocity - 2 * np.dot(self.velocity, normal) * normal
-            damping = 0.8  # Energy loss
-            self.velocity = reflection * damping
+# Draw a bouncing ball; the physics live in ball_engine.BallEngine
+def draw_ball(meshes, position, radius, color):
+    glPushMatrix()
+    glTranslatef(position[0], position[1], position[2])
+    # Add emission component to make the balls brighter
+    emission = [color[0] * 0.3, color[1] * 0.3, color[2] * 0.3, 1.0]
+    glMaterialfv(GL_FRONT, GL_EMISSION, emission)
+    draw_sphere(meshes, radius, 16, 16, color)
+    # Reset emission 
+    glMaterialfv(GL_FRONT, GL_EMISSION, [0.0, 0.0, 0.0, 1.0])
+    glPopMatrix()
+
+# Draw every ball, setting the material once per color instead of once per ball
+def draw_balls(meshes, engine):
+    if not meshes.enabled:
+        for position, radius, color in zip(engine.positions, engine.radii, engine.colors):
+            draw_ball(meshes, position, radius, color)
+        return
+    
+    ball_colors, groups = np.unique(engine.colors, axis=0, return_inverse=True)
+    for index, color in enumerate(ball_colors):
+        # Add emission component to make the balls brighter
+        glMaterialfv(GL_FRONT, GL_EMISSION, [color[0] * 0.3, color[1] * 0.3, color[2] * 0.3, 1.0])
+        glColor3f(color[0], color[1], color[2])
+        for ball in np.flatnonzero(groups == index):
+            position = engine.positions[ball]
+            radius = engine.radii[ball]
+            glPushMatrix()
+            glTranslatef(position[0], position[1], position[2])
+            # Every ball shares one unit sphere, scaled to its radius
+            glScalef(radius, radius, radius)
+            meshes.draw_sphere(1.0, 16, 16)
+            glPopMatrix()
+    # Reset emission
+    glMaterialfv(GL_FRONT, GL_EMISSION, [0.0, 0.0, 0.0, 1.0])
+
+# Frame statistics, and the phase timings of a FrameProfiler, drawn in the corner of the window
+class ProfileOverlay:
+    def __init__(self, interval=0.5):
+        self.font = pygame.font.SysFont(None, 22)
+        self.interval = interval  # Seconds between text updates
+        self.visible = True
+        self.frames = 0
+        self.draw_calls = 0
+        self.frame_time = 0.0
+        self.render_time = 0.0
+        self.started = time.perf_counter()
+        self.image = None
+    
+    def record(self, draw_calls, frame_time, render_time, label, details=()):
+        self.frames += 1
+        self.draw_calls += draw_calls
+        self.frame_time += frame_time
+        self.render_time += render_time
         
-        # Check for collisions with other balls
-        for other in balls:
-            if other is self:
-                continue
-                
-            rel_pos = self.position - other.position
-            distance = np.linalg.norm(rel_pos)
-            
-            if distance < self.radius + other.radius:
-                # Collision response
-                normal = rel_pos / distance if distance > 0 else np.array([1, 0, 0])
-                
-                # Position correction
-                overlap = self.radius + other.radius - distance
-                self.position += normal * overlap * 0.5
-                other.position -= normal * overlap * 0.5
-                
-                # Velocity calculation using conservation of momentum and energy
-                v1 = self.velocity
-                v2 = other.velocity
-                m1 = self.mass
-                m2 = other.mass
-                
-                # Relative velocity along collision normal
-                v1_normal = np.dot(v1, normal)
-                v2_normal = np.dot(v2, normal)
-                
-                # Calculate new velocities using elastic collision formula
-                restitution = 0.9  # Coefficient of restitution (bounciness)
-                
-                # New velocities after collision
-                new_v1_normal = ((m1 - m2) * v1_normal + 2 * m2 * v2_normal) / (m1 + m2)
-                new_v2_normal = ((m2 - m1) * v2_normal + 2 * m1 * v1_normal) / (m1 + m2)
-                
-                # Apply restitution
-                new_v1_normal *= restitution
-                new_v2_normal *= restitution
-                
-                # Update velocities
-                self.velocity += normal * (new_v1_normal - v1_normal)
-                other.velocity += normal * (new_v2_normal - v2_normal)
+        # Average over the interval so the numbers are readable
+        now = time.perf_counter()
+        if now - self.started < self.interval:
+            return
+        fps = self.frames / (now - self.started)
+        text = (f"{label}: {self.draw_calls / self.frames:.0f} draw calls, "
+                f"frame {self.frame_time / self.frames * 1000:.2f} ms, "
+                f"render {self.render_time / self.frames * 1000:.2f} ms, {fps:.0f} fps")
+        lines = [self.font.render(line, True, (255, 255, 255), (0, 0, 0)) for line in [text, *details]]
+        surface = pygame.Surface((max(line.get_width() for line in lines), sum(line.get_height() for line in lines)))
+        y = 0
+        for line in lines:
+            surface.blit(line, (0, y))
+            y += line.get_height()
+        # OpenGL expects the rows bottom to top
+        self.image = (surface.get_width(), surface.get_height(), pygame.image.tostring(surface, 'RGBA', True))
+        self.frames = self.draw_calls = 0
+        self.frame_time = self.render_time = 0.0
+        self.started = now
     
     def draw(self):
-        glPushMatrix()
-        glTranslatef(self.position[0], self.position[1], self.position[2])
-        # Add emission component to make the balls brighter
-        emission = [self.color[0] * 0.3, self.color[1] * 0.3, self.color[2] * 0.3, 1.0]
-        glMaterialfv(GL_FRONT, GL_EMISSION, emission)
-        draw_sphere(self.radius, 16, 16, self.color)
-        # Reset emission 
-        glMaterialfv(GL_FRONT, GL_EMISSION, [0.0, 0.0, 0.0, 1.0])
-        glPopMatrix()
+        if not self.visible or self.image is None:
+            return
+        text_width, text_height, pixels = self.image
+        glDisable(GL_LIGHTING)
+        glDisable(GL_DEPTH_TEST)
+        glWindowPos2i(10, height - 10 - text_height)
+        glDrawPixels(text_width, text_height, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_LIGHTING)
 
-# Create container spheres - position them to be more visible
-containers = [
-    ContainerSphere(5.0, [0, 0, 0], [0.1, 0.2, 0.05], [0.5, 0.5, 1.0]),  # Brighter blue
-    ContainerSphere(3.0, [8, 0, 0], [0.15, -0.1, 0.1], [0.5, 1.0, 0.5])  # Brighter green, moved to the side
-]
+# Wrap the containers of an engine (or a recording) in spheres for drawing
+def make_containers(centers, radii, rotation_speeds, container_colors):
+    return [
+        ContainerSphere(float(radius), list(center), list(speed), list(color))
+        for center, radius, speed, color in zip(centers, radii, rotation_speeds, container_colors)
+    ]
 
-# Create balls with random properties
-balls = []
-colors = [
-    [1.0, 0.0, 0.0],  # Red
-    [0.0, 1.0, 0.0],  # Green
-    [0.0, 0.0, 1.0],  # Blue
-    [1.0, 1.0, 0.0],  # Yellow
-    [1.0, 0.0, 1.0],  # Magenta
-    [0.0, 1.0, 1.0],  # Cyan
-    [1.0, 0.5, 0.0],  # Orange
-    [0.5, 0.0, 1.0]   # Purple
-]
+# Build the containers and the engine with random balls; the same seed gives the same scene
+def create_scene(seed=None, balls_per_container=None, container_count=None, **scene_options):
+    engine, container_colors = generate_scene(container_count, balls_per_container or (5, 8),
+                                              seed=seed, **scene_options)
+    containers = make_containers(engine.container_centers, engine.container_radii,
+                                 engine.container_rotation_speeds, container_colors)
+    return containers, engine
 
-# Add balls to each container
-for container in containers:
-    num_balls = random.randint(5, 8)  # Fewer balls to avoid potential performance issues
-    for i in range(num_balls):
-        # Random position inside container (not too close to the edge)
-        max_radius = container.radius - 0.5
-        theta = random.uniform(0, 2*math.pi)
-        phi = random.uniform(0, math.pi)
-        r = random.uniform(0, max_radius * 0.7)
-        
-        position = [
-            container.position[0] + r * math.sin(phi) * math.cos(theta),
-            container.position[1] + r * math.sin(phi) * math.sin(theta),
-            container.position[2] + r * math.cos(phi)
-        ]
-        
-        # Random velocity (reduced for stability)
-        velocity = [
-            random.uniform(-1.0, 1.0),
-            random.uniform(-1.0, 1.0),
-            random.uniform(-1.0, 1.0)
-        ]
-        
-        # Random size and color
-        radius = random.uniform(0.2, 0.4)
-        color = random.choice(colors)
-        
-        # Create the ball
-        ball = Ball(radius, position, velocity, color, container)
-        balls.append(ball)
-
-# Camera rotation settings
-camera_rotation = [20, 30]  # Start with a different view angle
-rotation_speed = 0.5
+# Run a fixed number of steps as fast as possible, optionally recording every step
+def run_headless(engine, steps, dt, recorder=None, first_step=0):
+    if recorder is not None:
+        recorder.append(engine, first_step, 0.0)
+    
+    candidate_pairs = 0
+    contacts = 0
+    swept_contacts = 0
+    tunnelled = 0
+    substeps = 0
+    slowest_step, slowest_time = None, 0.0
+    start = time.perf_counter()
+    for step in range(first_step + 1, first_step + steps + 1):
+        step_start = time.perf_counter()
+        engine.step(dt)
+        step_time = time.perf_counter() - step_start
+        if step_time > slowest_time:
+            slowest_step, slowest_time = step, step_time
+        candidate_pairs += engine.candidate_pairs
+        contacts += engine.contacts
+        swept_contacts += engine.swept_contacts
+        tunnelled += engine.tunnelled
+        substeps += engine.substeps
+        if recorder is not None:
+            recorder.append(engine, step, dt, step_time)
+    elapsed = time.perf_counter() - start
+    
+    steps_per_second = steps / elapsed if elapsed > 0 else float('inf')
+    print(f"{steps} steps of {dt:g} s with {engine.count} balls in {elapsed:.3f} s "
+          f"({steps_per_second:,.0f} steps/s, {steps * dt / elapsed:,.1f}x real time)")
+    if steps:
+        print(f"Average per step: {candidate_pairs / steps:.1f} candidate pairs, "
+              f"{contacts / steps:.1f} contacts, {swept_contacts / steps:.1f} swept contacts, "
+              f"{substeps / steps:.1f} substeps")
+        print(f"Tunnelled: {tunnelled} missed contacts")
+        print(f"Slowest step: {slowest_step} ({slowest_time * 1000:.2f} ms)")
+    if recorder is not None:
+        print(f"Recorded {min(recorder.frames, recorder.capacity)} frames to {recorder.path}")
 
-# Main game loop
-clock = pygame.time.Clock()
-running = True
+# Print the slowest recorded steps, to find the frames worth a closer look
+def print_slowest_frames(recording, count):
+    slots = recording.slots()
+    frames = recording.frame_numbers()
+    times = recording.frames['step_seconds'][slots]
+    print(f"{'frame':>8} {'step':>8} {'ms':>8} " + " ".join(f"{name:>15}" for name in COUNTERS))
+    for index in np.argsort(times)[::-1][:count]:
+        frame = recording.frame(frames[index])
+        print(f"{frames[index]:>8} {frame['step']:>8} {frame['step_seconds'] * 1000:>8.2f} "
+              + " ".join(f"{value:>15}" for value in frame['counters']))
 
-# Print controls to the console
-print("Controls:")
-print("  Arrow keys: Rotate camera")
-print("  ESC: Exit simulation")
+# Draw one frame of the scene; balls are drawn as sprites when a sprite renderer is given
+def render_scene(containers, engine, meshes, camera_rotation, sprites=None):
+    # Clear the screen
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    
+    # Set camera rotation
+    glLoadIdentity()
+    glTranslatef(0.0, 0.0, -20)  # Keep consistent with initial position
+    glRotatef(camera_rotation[0], 1, 0, 0)
+    glRotatef(camera_rotation[1], 0, 1, 0)
+    
+    # Draw container spheres
+    for container, rotation in zip(containers, engine.container_rotations):
+        container.draw(rotation, meshes)
+    
+    # Draw balls
+    if sprites is None:
+        draw_balls(meshes, engine)
+    else:
+        sprites.draw(engine)
 
-try:
-    while running:
-        dt = min(clock.tick(60) / 1000.0, 0.1)  # Delta time in seconds, limit to avoid physics issues
-        
-        # Handle events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
+# Open the window and show the engine; update(frame_time) advances it every frame
+def run_window(containers, engine, update, on_key=None, controls=(), mesh_cache=True, profiler=None,
+               renderer='spheres'):
+    init_display()
+    meshes = MeshCache(mesh_cache)
+    sprites = SpriteBallRenderer() if renderer == 'sprites' else None
+    if profiler is None:
+        profiler = FrameProfiler(enabled=False)
+    overlay = ProfileOverlay()
+    overlay.visible = profiler.enabled
+    
+    # Camera rotation settings
+    camera_rotation = [20, 30]  # Start with a different view angle
+    rotation_speed = 0.5
+    
+    # Main game loop
+    clock = pygame.time.Clock()
+    running = True
+    
+    # Print controls to the console
+    print("Controls:")
+    print("  Arrow keys: Rotate camera")
+    for control in controls:
+        print(f"  {control}")
+    print("  P: Print collision counters")
+    print("  M: Toggle the mesh cache")
+    print("  O: Toggle the profiling overlay")
+    print("  ESC: Exit simulation")
+    
+    try:
+        while running and not profiler.finished:
+            frame_time = min(clock.tick(60) / 1000.0, 0.1)  # Delta time in seconds, limit to avoid physics issues
+            frame_start = time.perf_counter()
+            
+            # Handle events
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
                     running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        running = False
+                    elif event.key == pygame.K_p:
+                        print(f"{engine.count} balls: {engine.candidate_pairs} candidate pairs, "
+                              f"{engine.contacts} contacts")
+                    elif event.key == pygame.K_m:
+                        meshes.enabled = not meshes.enabled
+                    elif event.key == pygame.K_o:
+                        overlay.visible = not overlay.visible
+                    elif on_key is not None:
+                        on_key(event.key)
+            
+            # Rotate camera with keyboard
+            keys = pygame.key.get_pressed()
+            if keys[pygame.K_LEFT]:
+                camera_rotation[1] -= rotation_speed
+            if keys[pygame.K_RIGHT]:
+                camera_rotation[1] += rotation_speed
+            if keys[pygame.K_UP]:
+                camera_rotation[0] += rotation_speed
+            if keys[pygame.K_DOWN]:
+                camera_rotation[0] -= rotation_speed
+            
+            # Collisions are resolved inside the engine step, so they are part of the update
+            with profiler.phase('update'):
+                update(frame_time)
+            
+            render_start = time.perf_counter()
+            meshes.draw_calls = 0
+            if sprites is not None:
+                sprites.draw_calls = 0
+            with profiler.phase('draw'):
+                render_scene(containers, engine, meshes, camera_rotation, sprites)
+                if overlay.visible or profiler.enabled:
+                    glFinish()  # Count the time the GL takes to draw, not just to queue the calls
+            frame_end = time.perf_counter()
+            
+            if sprites is not None:
+                label = "sprites"
+                draw_calls = meshes.draw_calls + sprites.draw_calls
+            else:
+                label = "cached meshes" if meshes.enabled else "immediate meshes"
+                draw_calls = meshes.draw_calls
+            overlay.record(draw_calls, frame_end - frame_start, frame_end - render_start, label,
+                           profiler.hud_lines())
+            overlay.draw()
+            
+            # Update the display
+            with profiler.phase('flip'):
+                pygame.display.flip()
+            profiler.end_frame()
+            
+    except Exception as e:
+        # Print any errors for debugging
+        print(f"An error occurred: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        # Clean up
+        meshes.release()
+        if sprites is not None:
+            sprites.release()
+        profiler.close()
+        pygame.quit()
+
+# Run the simulation in a window, optionally recording every step
+def run_interactive(containers, engine, dt=None, recorder=None, first_step=0, **options):
+    step = first_step
+    pending_time = 0.0
+    if recorder is not None:
+        recorder.append(engine, step, 0.0)
+    
+    def advance(step_dt):
+        nonlocal step
+        step_start = time.perf_counter()
+        engine.step(step_dt)
+        step += 1
+        if recorder is not None:
+            recorder.append(engine, step, step_dt, time.perf_counter() - step_start)
+    
+    def update(frame_time):
+        nonlocal pending_time
+        # Update the physics for every ball at once
+        if dt is None:
+            advance(frame_time)
+            return
         
-        # Rotate camera with keyboard
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:
-            camera_rotation[1] -= rotation_speed
-        if keys[pygame.K_RIGHT]:
-            camera_rotation[1] += rotation_speed
-        if keys[pygame.K_UP]:
-            camera_rotation[0] += rotation_speed
-        if keys[pygame.K_DOWN]:
-            camera_rotation[0] -= rotation_speed
-        
-        # Clear the screen
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        
-        # Set camera rotation
-        glLoadIdentity()
-        glTranslatef(0.0, 0.0, -20)  # Keep consistent with initial position
-        glRotatef(camera_rotation[0], 1, 0, 0)
-        glRotatef(camera_rotation[1], 0, 1, 0)
-        
-        # Update and draw container spheres
-        for container in containers:
-            container.update(dt)
-            container.draw()
-        
-        # Update and draw balls
-        for ball in balls:
-            ball.update(dt, balls)
-            ball.draw()
+        # Fixed time step: run as many steps as the elapsed time covers
+        pending_time += frame_time
+        steps = 0
+        while pending_time >= dt and steps < MAX_STEPS_PER_FRAME:
+            advance(dt)
+            pending_time -= dt
+            steps += 1
+        if steps == MAX_STEPS_PER_FRAME:
+            pending_time = 0.0
+    
+    run_window(containers, engine, update, **options)
+
+# Rebuild the container spheres of a recording for drawing
+def recorded_containers(recording):
+    return make_containers(recording.static['container_centers'], recording.static['container_radii'],
+                           recording.static['container_rotation_speeds'], recording.static['container_colors'])
+
+# Play a recording back; any frame can be shown without simulating the ones before it
+def run_replay(recording, start_frame=None, **options):
+    containers = recorded_containers(recording)
+    first, last = recording.first_frame, recording.total_frames - 1
+    index = first if start_frame is None else start_frame
+    engine = recording.restore(index)
+    playing = True
+    pending_time = 0.0
+    caption_shown = False
+    
+    def show(new_index):
+        nonlocal index
+        index = min(max(new_index, first), last)
+        recording.restore(index, engine)
+        frame = recording.frame(index)
+        pygame.display.set_caption(
+            f"Replay frame {index}/{last}, step {frame['step']}, "
+            f"{frame['step_seconds'] * 1000:.2f} ms, {engine.contacts} contacts, "
+            f"{engine.tunnelled} tunnelled")
+    
+    def update(frame_time):
+        nonlocal pending_time, caption_shown
+        # The window only exists once the loop runs
+        if not caption_shown:
+            show(index)
+            caption_shown = True
+        if not playing or index == last:
+            return
+        # Play at the recorded speed
+        pending_time += frame_time
+        new_index = index
+        while new_index < last and pending_time >= recording.frame(new_index + 1)['dt']:
+            pending_time -= recording.frame(new_index + 1)['dt']
+            new_index += 1
+        if new_index != index:
+            show(new_index)
+    
+    def on_key(key):
+        nonlocal playing, pending_time
+        pending_time = 0.0
+        if key == pygame.K_SPACE:
+            playing = not playing
+        elif key in (pygame.K_COMMA, pygame.K_PERIOD):
+            playing = False
+            show(index + (1 if key == pygame.K_PERIOD else -1))
+        elif key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+            show(index + (100 if key == pygame.K_PAGEDOWN else -100))
+        elif key == pygame.K_HOME:
+            show(first)
+        elif key == pygame.K_END:
+            show(last)
+        elif key == pygame.K_w:
+            # Jump to the slowest recorded step
+            playing = False
+            slots = recording.slots()
+            show(int(recording.frame_numbers()[np.argmax(recording.frames['step_seconds'][slots])]))
+    
+    controls = [
+        "Space: Pause or resume the replay",
+        ", and .: Previous and next frame",
+        "Page Up/Down: 100 frames back or forward",
+        "Home/End: First and last frame",
+        "W: Jump to the slowest step",
+    ]
+    run_window(containers, engine, update, on_key, controls, **options)
+
+def main():
+    parser = argparse.ArgumentParser(description="3D bouncing balls inside rotating container spheres")
+    parser.add_argument('--headless', action='store_true',
+                        help="Run without a window, as fast as possible, and report steps/s")
+    parser.add_argument('--steps', type=int, default=1000,
+                        help="Number of steps to run in headless mode (default: 1000)")
+    parser.add_argument('--dt', type=float,
+                        help="Fixed time step in seconds (default: frame time in a window, "
+                             f"{DEFAULT_DT:.4f} headless)")
+    parser.add_argument('--seed', type=int, help="Random seed for the scene, for reproducible runs")
+    parser.add_argument('--balls', type=int,
+                        help="Balls per container (default: random between 5 and 8)")
+    parser.add_argument('--containers', type=int,
+                        help="Number of random containers on a grid instead of the two default ones")
+    parser.add_argument('--ball-radius', type=float, nargs=2, metavar=('MIN', 'MAX'), default=(0.2, 0.4),
+                        help="Smallest and largest ball radius (default: 0.2 0.4)")
+    parser.add_argument('--radius-distribution', choices=RADIUS_DISTRIBUTIONS, default='uniform',
+                        help="How ball radii are spread between the smallest and largest (default: uniform)")
+    parser.add_argument('--velocity-spread', type=float, default=1.0,
+                        help="Largest initial ball speed along each axis (default: 1.0)")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Step the containers in this many worker processes "
+                             "(default: 0, step everything in this process)")
+    parser.add_argument('--no-ccd', action='store_true',
+                        help="Turn off the swept time-of-impact tests for fast balls")
+    parser.add_argument('--max-substeps', type=int,
+                        help=f"Most substeps per step for fast balls, 1 turns substepping off "
+                             f"(default: {DEFAULT_MAX_SUBSTEPS})")
+    parser.add_argument('--restore', metavar='PATH',
+                        help="Continue from a snapshot (or the last frame of a recording) "
+                             "instead of building a new scene")
+    parser.add_argument('--record', metavar='PATH',
+                        help="Record the state after every step to a binary recording")
+    parser.add_argument('--record-capacity', type=int,
+                        help="Keep only the last N frames in the recording (default: every step "
+                             f"in headless mode, {DEFAULT_RECORD_CAPACITY} in a window)")
+    parser.add_argument('--replay', metavar='PATH', help="Play back a recording instead of simulating")
+    parser.add_argument('--frame', type=int,
+                        help="Frame of the recording to start the replay at or to snapshot; "
+                             "negative numbers count from the end")
+    parser.add_argument('--slowest', type=int, metavar='N',
+                        help="Print the N slowest steps of the recording and exit")
+    parser.add_argument('--save-snapshot', metavar='PATH',
+                        help="Save --frame of the recording as a snapshot to restore and exit")
+    parser.add_argument('--no-mesh-cache', action='store_true',
+                        help="Tessellate every sphere on every frame, for comparison")
+    parser.add_argument('--renderer', choices=('spheres', 'sprites'), default='spheres',
+                        help="Draw balls as lit spheres one by one, or all at once as "
+                             "shaded point sprites (default: spheres)")
+    FrameProfiler.add_arguments(parser)
+    args = parser.parse_args()
+    
+    if args.steps < 0:
+        parser.error("--steps must not be negative")
+    if args.dt is not None and args.dt <= 0:
+        parser.error("--dt must be positive")
+    if args.balls is not None and args.balls <= 0:
+        parser.error("--balls must be positive")
+    if args.containers is not None and args.containers <= 0:
+        parser.error("--containers must be positive")
+    if not 0 < args.ball_radius[0] <= args.ball_radius[1]:
+        parser.error("--ball-radius must be positive, smallest first")
+    if args.velocity_spread < 0:
+        parser.error("--velocity-spread must not be negative")
+    if args.workers < 0:
+        parser.error("--workers must not be negative")
+    if args.max_substeps is not None and args.max_substeps < 1:
+        parser.error("--max-substeps must be at least 1")
+    if args.record_capacity is not None and args.record_capacity < 1:
+        parser.error("--record-capacity must be at least 1")
+    if (args.frame is not None or args.slowest or args.save_snapshot) and not args.replay:
+        parser.error("--frame, --slowest and --save-snapshot require --replay")
+    if args.replay and (args.record or args.restore):
+        parser.error("--replay can't be combined with --record or --restore")
+    
+    window_options = {
+        'mesh_cache': not args.no_mesh_cache,
+        'profiler': FrameProfiler.from_args(args),
+        'renderer': args.renderer,
+    }
+    
+    if args.replay:
+        try:
+            recording = Recording(args.replay)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        if not len(recording):
+            print(f"Error: {args.replay} has no frames", file=sys.stderr)
+            sys.exit(1)
         
-        # Update the display
-        pygame.display.flip()
+        frame = args.frame
+        if frame is not None and frame < 0:
+            frame += recording.total_frames
+        if frame is not None and not recording.first_frame <= frame < recording.total_frames:
+            print(f"Error: the recording has frames {recording.first_frame} to {recording.total_frames - 1}",
+                  file=sys.stderr)
+            sys.exit(1)
         
-except Exception as e:
-    # Print any errors for debugging
-    print(f"An error occurred: {e}")
-    import traceback
-    traceback.print_exc()
-finally:
-    # Clean up
-    pygame.quit()
-    sys.exit()
\ No newline at end of file
+        if args.slowest:
+            print_slowest_frames(recording, args.slowest)
+        elif args.save_snapshot:
+            if frame is None:
+                frame = recording.total_frames - 1
+            engine = recording.restore(frame)
+            save_snapshot(args.save_snapshot, engine, int(recording.frame(frame)['step']),
+                          float(recording.frame(frame)['dt']), recording.static['container_colors'])
+            print(f"Frame {frame} saved to {args.save_snapshot}")
+        else:
+            run_replay(recording, frame, **window_options)
+        return
+    
+    first_step = 0
+    if args.restore:
+        try:
+            engine, first_step, container_colors = load_snapshot(args.restore)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        containers = make_containers(engine.container_centers, engine.container_radii,
+                                     engine.container_rotation_speeds, container_colors)
+    else:
+        containers, engine = create_scene(args.seed, args.balls, args.containers,
+                                          ball_radius=args.ball_radius,
+                                          radius_distribution=args.radius_distribution,
+                                          velocity_spread=args.velocity_spread)
+    if args.no_ccd:
+        engine.ccd = False
+    if args.max_substeps is not None:
+        engine.max_substeps = args.max_substeps
+    if args.workers:
+        engine = ParallelBallEngine(engine, args.workers)
+    
+    recorder = None
+    try:
+        if args.record:
+            capacity = args.record_capacity or (args.steps + 1 if args.headless else DEFAULT_RECORD_CAPACITY)
+            recorder = Recorder(args.record, engine, capacity, [container.color for container in containers])
+        if args.headless:
+            run_headless(engine, args.steps, args.dt or DEFAULT_DT, recorder, first_step)
+        else:
+            run_interactive(containers, engine, args.dt, recorder, first_step, **window_options)
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if args.workers:
+            engine.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+HUD Text
+
+On-screen text for the pygame demos. Creating a font and rendering text
+with pygame.font are slow next to everything else the demos draw: a
+SysFont() lookup alone can take milliseconds, and the demos used to do both
+for every line on every frame.
+
+get_font() loads every font once. A Hud keeps one rendered surface per
+line and renders a line again only when its text changes, so static lines
+like instructions are rendered once. Lines that change every frame, like
+speeds, can be given an interval so they are rendered a few times a second
+at most.
+"""
+
+import math
+import time
+
+import pygame
+
+
+WHITE = (255, 255, 255)
+
+_fonts = {}
+
+
+def get_font(name=None, size=24):
+    """Return a font, loading each (name, size) only once; None is pygame's default font."""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.Font(None, size) if name is None else pygame.font.SysFont(name, size)
+        _fonts[key] = font
+    return font
+
+
+class HudLine:
+    """One line of text at a fixed position, rendered again only when its text changes."""
+
+    def __init__(self, font, position, text='', color=WHITE, anchor='topleft', interval=0.0, background=None):
+        """
+        Args:
+            font (pygame.font.Font): Font to render with
+            position (tuple): Where the anchor of the text goes
+            text (str): Text to show; empty text isn't drawn
+            color (tuple): Text color
+            anchor (str): pygame.Rect attribute placed at position, like 'topleft' or 'center'
+            interval (float): Least number of seconds between two renders of a changing text
+            background (tuple, optional): Background color, transparent if None
+        """
+        self.font = font
+        self.position = position
+        self.text = text
+        self.color = color
+        self.anchor = anchor
+        self.interval = interval
+        self.background = background
+        self.surface = None
+        self.rect = None
+        self._rendered_text = None
+        self._rendered_at = -math.inf
+
+    def render(self):
+        """Return the rendered text, rendering it again if it changed and the interval is up."""
+        if self.text != self._rendered_text:
+            now = time.perf_counter()
+            if self.surface is None or now - self._rendered_at >= self.interval:
+                self.surface = self.font.render(self.text, True, self.color, self.background)
+                self.rect = self.surface.get_rect(**{self.anchor: self.position})
+                self._rendered_text = self.text
+                self._rendered_at = now
+        return self.surface
+
+
+class Hud:
+    """Named lines of text, drawn together."""
+
+    def __init__(self, font_name=None, size=24, color=WHITE):
+        self.font = get_font(font_name, size)
+        self.color = color
+        self.lines = {}
+
+    def add(self, name, position, text='', anchor='topleft', interval=0.0, color=None, background=None):
+        """Add a line; give text for a static line, or set() it later. See HudLine for the arguments."""
+        line = HudLine(self.font, position, text, color or self.color, anchor, interval, background)
+        self.lines[name] = line
+        return line
+
+    def set(self, name, text):
+        """Change the text of a line; it is rendered the next time it is drawn, interval permitting."""
+        self.lines[name].text = text
+
+    def draw(self, surface):
+        """Draw every line that has text and return the rectangles drawn to."""
+        rects = []
+        for line in self.lines.values():
+            if not line.text:
+                continue
+            surface.blit(line.render(), line.rect)
+            rects.append(line.rect)
+        return rects
@@ -0,0 +1,43 @@
+"""
+Script Utilities
+
+Helpers shared by the benchmarks and the async converters: importing the
+hyphenated scripts in this folder as modules, and measuring and formatting
+the peak memory of a process.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+MB = 1024 * 1024
+
+
+def load_script(filename):
+    """Import one of the hyphenated scripts in this folder as a module."""
+    name = Path(filename).stem.replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, SCRIPT_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss_bytes():
+    """Return the peak resident set size of this process, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def format_mb(value):
+    """Format a number of bytes as megabytes, or 'n/a' for None."""
+    return 'n/a' if value is None else f"{value / MB:.1f}"
@@ -1,7 +1,13 @@
+import argparse
 import pygame
 import math
 import numpy as np
 
+from dirty_rects import DirtyRects
+from frame_profiler import FrameProfiler
+from hexagon_engine import PolygonEngine, bounce_in_polygon_frame
+from pygame_hud import Hud
+
 # Initialize Pygame
 pygame.init()
 WIDTH, HEIGHT = 800, 600
@@ -15,17 +21,17 @@ RED = (255, 0, 0)
 BLACK = (0, 0, 0)
 BLUE = (0, 0, 255)
 
+# Trail points fade in this many steps of size and transparency
+TRAIL_FADE_STEPS = 32
+
 class Hexagon:
     def __init__(self, center, size):
         self.center = center
         self.size = size
         self.angle = 0
         self.rotation_speed = 0.5  # degrees per frame
-        self.points = self._calculate_points()
-        
-        # Store line segments for collision detection
-        self.line_segments = []
-        self._update_line_segments()
+        self._points = None
+        self._line_segments = None
 
     def _calculate_points(self):
         points = []
@@ -36,26 +42,92 @@ class Hexagon:
             points.append((x, y))
         return points
     
-    def _update_line_segments(self):
-        self.line_segments = []
-        for i in range(6):
-            p1 = np.array(self.points[i])
-            p2 = np.array(self.points[(i + 1) % 6])
-            self.line_segments.append((p1, p2))
+    # Corners and line segments are only worked out again when something asks for them after a rotation
+    @property
+    def points(self):
+        if self._points is None:
+            self._points = self._calculate_points()
+        return self._points
+    
+    @property
+    def line_segments(self):
+        if self._line_segments is None:
+            self._line_segments = []
+            for i in range(6):
+                p1 = np.array(self.points[i])
+                p2 = np.array(self.points[(i + 1) % 6])
+                self._line_segments.append((p1, p2))
+        return self._line_segments
 
     def rotate(self):
         self.angle += self.rotation_speed
-        self.points = self._calculate_points()
-        self._update_line_segments()
+        self._points = None
+        self._line_segments = None
 
     def draw(self, screen):
-        pygame.draw.polygon(screen, WHITE, self.points, 2)
+        outline = pygame.draw.polygon(screen, WHITE, self.points, 2)
         
         # Draw center point for reference
-        pygame.draw.circle(screen, BLUE, self.center, 3)
+        return outline.union(pygame.draw.circle(screen, BLUE, self.center, 3))
+
+# Fading trail behind a ball: the last positions in a ring buffer, drawn with cached sprites
+class Trail:
+    # Faded circle sprites shared by all trails, keyed by (color, radius, alpha)
+    sprites = {}
+    
+    def __init__(self, length, color=RED):
+        self.positions = np.zeros((length, 2))
+        self.length = length
+        self.color = color
+        self.count = 0  # Positions recorded so far, up to length
+        self.next = 0  # Slot the next position goes in
+    
+    def append(self, pos):
+        self.positions[self.next] = pos
+        self.next = (self.next + 1) % self.length
+        self.count = min(self.count + 1, self.length)
+    
+    def clear(self):
+        self.count = 0
+        self.next = 0
+    
+    def sprite(self, radius, alpha):
+        key = (self.color, radius, alpha)
+        sprite = Trail.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, (*self.color, alpha), (radius, radius), radius)
+            Trail.sprites[key] = sprite
+        return sprite
+    
+    def draw(self, screen, ball_radius):
+        """Draw the trail and return the rectangle around it, or None if nothing was drawn."""
+        if not self.count:
+            return None
+        
+        # Fade from transparent and small at the oldest point to solid and half the ball's size at the newest
+        fractions = np.arange(TRAIL_FADE_STEPS) / TRAIL_FADE_STEPS
+        radii = (ball_radius * 0.5 * fractions).astype(int)
+        sprites = [self.sprite(radius, int(255 * fraction)) for radius, fraction in zip(radii.tolist(), fractions)]
+        
+        # Oldest point first, so newer points are drawn on top; points too small to see are skipped
+        ages = np.arange(self.count)
+        steps = ages * TRAIL_FADE_STEPS // self.count
+        visible = radii[steps] > 0
+        steps = steps[visible]
+        slots = (self.next - self.count + ages[visible]) % self.length
+        if not len(steps):
+            return None
+        corners = self.positions[slots].astype(int) - radii[steps, None]
+        screen.blits(zip(map(sprites.__getitem__, steps.tolist()), corners.tolist()), doreturn=False)
+        
+        # Bounds of all sprites at once, instead of one rectangle per point
+        top_left = corners.min(axis=0)
+        bottom_right = (corners + 2 * radii[steps, None]).max(axis=0)
+        return pygame.Rect(top_left.tolist(), (bottom_right - top_left).tolist())
 
 class Ball:
-    def __init__(self, x, y):
+    def __init__(self, x, y, trail_length=20):
         self.pos = np.array([x, y], dtype=float)
         self.vel = np.array([2.0, 0.0])  # Initial velocity
         self.radius = 15
@@ -63,8 +135,7 @@ class Ball:
         self.elasticity = 0.8  # Bounce coefficient (0-1)
         self.gravity = np.array([0.0, 0.2])  # Gravity effect
         self.friction = 0.99  # Friction coefficient
-        self.trail = []  # Store positions for trail effect
-        self.trail_length = 20
+        self.trail = Trail(trail_length)  # Store positions for trail effect
         
     def update(self):
         # Apply gravity
@@ -77,9 +148,7 @@ class Ball:
         self.pos += self.vel
         
         # Record position for trail
-        self.trail.append(tuple(self.pos.copy()))
-        if len(self.trail) > self.trail_length:
-            self.trail.pop(0)
+        self.trail.append(self.pos)
 
     def collide_with_segment(self, p1, p2):
         """Handle collision with a line segment defined by p1 and p2"""
@@ -132,32 +201,116 @@ class Ball:
         
         return False
 
-    def draw(self, screen):
+    def collide_with_hexagon(self, hexagon, rotating_frame=False):
+        if rotating_frame:
+            # Against sides that stand still in the hexagon's rotating frame, bouncing off the moving walls
+            self.pos, self.vel, _ = bounce_in_polygon_frame(
+                self.pos, self.vel, self.radius, hexagon.center, hexagon.size, hexagon.angle,
+                hexagon.rotation_speed, elasticity=self.elasticity)
+            return
+        for p1, p2 in hexagon.line_segments:
+            self.collide_with_segment(p1, p2)
+
+    def draw(self, screen, show_trail=True):
         # Draw trail
-        for i, pos in enumerate(self.trail):
-            # Fade the trail from transparent to solid
-            alpha = int(255 * i / len(self.trail))
-            trail_color = (255, 0, 0, alpha)
-            trail_radius = int(self.radius * 0.5 * i / len(self.trail))
-            
-            # Create a surface for the trail circle with transparency
-            trail_surface = pygame.Surface((trail_radius*2, trail_radius*2), pygame.SRCALPHA)
-            pygame.draw.circle(trail_surface, trail_color, (trail_radius, trail_radius), max(1, trail_radius))
-            screen.blit(trail_surface, (int(pos[0])-trail_radius, int(pos[1])-trail_radius))
+        trail_rect = self.trail.draw(screen, self.radius) if show_trail else None
         
         # Draw main ball
-        pygame.draw.circle(screen, RED, self.pos.astype(int), self.radius)
+        ball_rect = pygame.draw.circle(screen, RED, self.pos.astype(int), self.radius)
+        return ball_rect if trail_rect is None else ball_rect.union(trail_rect)
+
+# Many balls in the hexagon, simulated together by hexagon_engine and drawn without trails
+class BallSwarm:
+    def __init__(self, hexagon, count, radius=4, seed=None, moving_walls=False):
+        rng = np.random.default_rng(seed)
+        self.hexagon = hexagon
+        self.radius = radius
+        self.engine = PolygonEngine([hexagon.center], hexagon.size, 6, hexagon.rotation_speed, hexagon.angle,
+                                    moving_walls=moving_walls)
+        
+        # Start anywhere inside the circle that fits in the hexagon, moving in random directions
+        inner_radius = hexagon.size * math.cos(math.pi / 6) - radius
+        angles = rng.uniform(0, 2 * math.pi, count)
+        distances = inner_radius * np.sqrt(rng.random(count))
+        offsets = np.column_stack([np.cos(angles), np.sin(angles)]) * distances[:, None]
+        self.engine.add_balls(np.array(hexagon.center) + offsets, rng.uniform(-2.0, 2.0, (count, 2)), radius)
+    
+    def update(self):
+        # The engine turns its own copy of the hexagon; keep it at the speed set with the arrow keys
+        self.engine.polygon_rotation_speeds[0] = self.hexagon.rotation_speed
+        self.engine.advance()
+    
+    def collide_with_hexagon(self, hexagon, rotating_frame=False):
+        self.engine.collide()
+    
+    def mean_speed(self):
+        return np.linalg.norm(self.engine.velocities, axis=1).mean()
+    
+    def draw(self, screen, show_trail=True):
+        positions = self.engine.positions.astype(int)
+        for position in positions:
+            pygame.draw.circle(screen, RED, position, self.radius)
+        if not len(positions):
+            return None
+        top_left = positions.min(axis=0) - self.radius
+        return pygame.Rect(top_left.tolist(), (positions.max(axis=0) + self.radius + 1 - top_left).tolist())
 
 def main():
+    parser = argparse.ArgumentParser(description="Ball bouncing in a spinning hexagon")
+    parser.add_argument('--balls', type=int, default=1,
+                        help="Number of balls; more than one are simulated together by hexagon_engine (default: 1)")
+    parser.add_argument('--ball-radius', type=int,
+                        help="Radius of the balls (default: 15 for one ball, 4 for more)")
+    parser.add_argument('--seed', type=int, help="Random seed for the starting positions of many balls")
+    parser.add_argument('--trail-length', type=int, default=20,
+                        help="Positions kept in the trail of a single ball (default: 20)")
+    parser.add_argument('--collision', choices=('segments', 'rotating'), default='segments',
+                        help="Test the ball against the six rebuilt line segments, or against fixed "
+                             "sides in the hexagon's rotating frame, bouncing off the moving walls "
+                             "(default: segments)")
+    DirtyRects.add_arguments(parser)
+    FrameProfiler.add_arguments(parser)
+    args = parser.parse_args()
+    if args.balls < 1:
+        parser.error("--balls must be at least 1")
+    if args.ball_radius is not None and args.ball_radius < 1:
+        parser.error("--ball-radius must be at least 1")
+    if args.trail_length < 1:
+        parser.error("--trail-length must be at least 1")
+    profiler = FrameProfiler.from_args(args)
+    dirty = DirtyRects.from_args(screen, args, BLACK)
+
     hexagon = Hexagon((WIDTH//2, HEIGHT//2), 200)
-    ball = Ball(WIDTH//2, HEIGHT//2 - 50)  # Start the ball slightly above center
+    
+    def new_ball():
+        if args.balls > 1:
+            return BallSwarm(hexagon, args.balls, args.ball_radius or 4, args.seed,
+                             moving_walls=args.collision == 'rotating')
+        ball = Ball(WIDTH//2, HEIGHT//2 - 50, args.trail_length)  # Start the ball slightly above center
+        ball.radius = args.ball_radius or ball.radius
+        return ball
+    
+    ball = new_ball()
+    
+    # Controls are rendered once; the ball speed changes every frame, so it is rendered ten times a second
+    hud = Hud(size=24)
+    instructions = [
+        "SPACE: Pause/Resume",
+        "R: Reset ball",
+        "T: Toggle trail",
+        "UP/DOWN: Change rotation speed"
+    ]
+    for i, instruction in enumerate(instructions):
+        hud.add(f"instruction {i}", (10, 10 + i * 25), instruction)
+    hud.add('speed', (WIDTH - 200, 10), interval=0.1)
+    hud.add('rotation', (WIDTH - 200, 35))
     
     # Initialize variables for user controls
     paused = False
     show_trail = True
     
     running = True
-    while running:
+    while running and not profiler.finished:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
@@ -167,53 +320,46 @@ def main():
                 elif event.key == pygame.K_t:
                     show_trail = not show_trail
                 elif event.key == pygame.K_r:  # Reset
-                    ball = Ball(WIDTH//2, HEIGHT//2 - 50)
+                    ball = new_ball()
                 elif event.key == pygame.K_UP:
                     hexagon.rotation_speed += 0.1
                 elif event.key == pygame.K_DOWN:
                     hexagon.rotation_speed -= 0.1
         
         if not paused:
-            # Clear screen
-            screen.fill(BLACK)
-            
             # Update physics
-            hexagon.rotate()
-            ball.update()
+            with profiler.phase('update'):
+                hexagon.rotate()
+                ball.update()
             
             # Check for collisions with all hexagon sides
-            for p1, p2 in hexagon.line_segments:
-                ball.collide_with_segment(p1, p2)
-            
-            # Draw everything
-            hexagon.draw(screen)
-            ball.draw(screen)
+            with profiler.phase('collision'):
+                ball.collide_with_hexagon(hexagon, args.collision == 'rotating')
             
-            # Display controls
-            font = pygame.font.Font(None, 24)
-            instructions = [
-                "SPACE: Pause/Resume",
-                "R: Reset ball",
-                "T: Toggle trail",
-                "UP/DOWN: Change rotation speed"
-            ]
-            
-            y_pos = 10
-            for instruction in instructions:
-                text = font.render(instruction, True, WHITE)
-                screen.blit(text, (10, y_pos))
-                y_pos += 25
+            with profiler.phase('draw'):
+                # Clear screen
+                dirty.clear()
+                
+                # Draw everything
+                dirty.add(hexagon.draw(screen))
+                dirty.add(ball.draw(screen, show_trail))
                 
-            # Display physics data
-            speed_text = font.render(f"Ball Speed: {np.linalg.norm(ball.vel):.1f}", True, WHITE)
-            rotation_text = font.render(f"Rotation: {hexagon.rotation_speed:.1f} deg/frame", True, WHITE)
-            screen.blit(speed_text, (WIDTH - 200, 10))
-            screen.blit(rotation_text, (WIDTH - 200, 35))
+                # Display controls and physics data
+                if args.balls > 1:
+                    hud.set('speed', f"Mean Speed: {ball.mean_speed():.1f}")
+                else:
+                    hud.set('speed', f"Ball Speed: {np.linalg.norm(ball.vel):.1f}")
+                hud.set('rotation', f"Rotation: {hexagon.rotation_speed:.1f} deg/frame")
+                dirty.add(*hud.draw(screen))
+                dirty.add(*profiler.draw_hud(screen))
             
-            pygame.display.flip()
+            with profiler.phase('flip'):
+                dirty.update()
         
         clock.tick(60)
+        profiler.end_frame()
 
+    profiler.close()
     pygame.quit()
 
 if __name__ == "__main__":